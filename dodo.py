@@ -24,7 +24,7 @@ from colorama import Fore, Style, init
 # to easily see the task lines printed by PyDoit. I want them to stand out
 # from among all the other lines printed to the console.
 from doit.reporter import ConsoleReporter
-from settings import config
+from settings import cast_bool, config
 
 try:
     in_slurm = environ["SLURM_JOB_ID"] is not None
@@ -67,6 +67,33 @@ OS_TYPE = config("OS_TYPE")
 USER = config("USER")
 START_DATE = config("START_DATE")
 END_DATE = config("END_DATE")
+RAVENPACK_PULL_WORKERS = config("RAVENPACK_PULL_WORKERS", default=1, cast=int)
+RAVENPACK_INCREMENTAL = config("RAVENPACK_INCREMENTAL", default=False, cast=cast_bool)
+
+## RAVENPACK.parquet is a directory when pulled in parallel or incrementally;
+## depend on its manifest
+if RAVENPACK_PULL_WORKERS > 1 or RAVENPACK_INCREMENTAL:
+    RAVENPACK_DEP = DATA_DIR / "RAVENPACK.parquet" / "_manifest.json"
+else:
+    RAVENPACK_DEP = DATA_DIR / "RAVENPACK.parquet"
+
+## CRSP_stock_daily.parquet is a year=/month= dataset when pulled in parallel
+CRSP_PULL_WORKERS = config("CRSP_PULL_WORKERS", default=1, cast=int)
+if CRSP_PULL_WORKERS > 1:
+    CRSP_DAILY_DEP = DATA_DIR / "CRSP_stock_daily.parquet" / "_manifest.json"
+else:
+    CRSP_DAILY_DEP = DATA_DIR / "CRSP_stock_daily.parquet"
+
+## Full-universe CRSP pulls write CRSP_unique_tickers.parquet from the same scan
+STREAMING_PULL = config("STREAMING_PULL", default=False, cast=cast_bool)
+CRSP_PULL_WRITES_TICKERS = CRSP_PULL_WORKERS > 1 or STREAMING_PULL
+
+## Uploading the CRSP ticker universe with the RavenPack query needs it pulled first
+RAVENPACK_CRSP_FILTER = config("RAVENPACK_CRSP_FILTER", default="none", cast=str)
+if RAVENPACK_CRSP_FILTER == "upload":
+    RAVENPACK_PULL_EXTRA_DEPS = [DATA_DIR / "CRSP_unique_tickers.parquet"]
+else:
+    RAVENPACK_PULL_EXTRA_DEPS = []
 
 ## Helpers for handling Jupyter Notebook tasks
 environ["PYDEVD_DISABLE_FILE_VALIDATION"] = "1"
@@ -135,8 +162,16 @@ def task_pull():
             "ipython ./src/settings.py",
             "ipython ./src/pull_CRSP_stock.py",
         ],
-        "targets": [DATA_DIR / "CRSP_stock_daily.parquet"],
-        "file_dep": ["./src/settings.py", "./src/pull_CRSP_stock.py"],
+        "targets": [
+            CRSP_DAILY_DEP,
+            *([DATA_DIR / "CRSP_unique_tickers.parquet"] if CRSP_PULL_WRITES_TICKERS else []),
+        ],
+        "file_dep": [
+            "./src/settings.py",
+            "./src/pull_CRSP_stock.py",
+            "./src/pull_crsp_unique_tickers.py",
+            "./src/wrds_tools.py",
+        ],
         "clean": [],
     }
     yield {
@@ -146,21 +181,33 @@ def task_pull():
             "ipython ./src/settings.py",
             "ipython ./src/pull_ravenpack.py",
         ],
-        "targets": [DATA_DIR / "RAVENPACK.parquet"],
-        "file_dep": ["./src/settings.py", "./src/pull_ravenpack.py"],
-        "clean": [],
-    }
-    yield {
-        "name": "CRSP_unique_tickers",
-        "doc": "Pull unique CRSP tickers from WRDS",
-        "actions": [
-            "ipython ./src/settings.py",
-            "ipython ./src/pull_crsp_unique_tickers.py",
+        "targets": [RAVENPACK_DEP],
+        "file_dep": [
+            "./src/settings.py",
+            "./src/pull_ravenpack.py",
+            "./src/wrds_tools.py",
+            "./src/time_tools.py",
+            *RAVENPACK_PULL_EXTRA_DEPS,
         ],
-        "targets": [DATA_DIR / "CRSP_unique_tickers.parquet"],
-        "file_dep": ["./src/settings.py", "./src/pull_crsp_unique_tickers.py"],
         "clean": [],
     }
+    if not CRSP_PULL_WRITES_TICKERS:
+        yield {
+            "name": "CRSP_unique_tickers",
+            "doc": "Derive unique CRSP tickers from the daily file, or pull them from WRDS",
+            "actions": [
+                "ipython ./src/settings.py",
+                "ipython ./src/pull_crsp_unique_tickers.py",
+            ],
+            "targets": [DATA_DIR / "CRSP_unique_tickers.parquet"],
+            "file_dep": [
+                "./src/settings.py",
+                "./src/pull_crsp_unique_tickers.py",
+                "./src/pull_CRSP_stock.py",
+            ],
+            "task_dep": ["pull:crsp_stock"],
+            "clean": [],
+        }
 
 def task_process():
     """Data cleaning and processing steps"""
@@ -176,7 +223,7 @@ def task_process():
         "file_dep": [
             "./src/settings.py",
             "./src/clean_ravenpack.py",
-            DATA_DIR / "RAVENPACK.parquet",
+            RAVENPACK_DEP,
             DATA_DIR / "CRSP_unique_tickers.parquet",
         ],
         "task_dep": [
@@ -199,6 +246,7 @@ def task_process():
         "file_dep": [
             "./src/settings.py",
             "./src/submit_headlines_to_openai.py",
+            "./src/openai_response_cache.py",
             DATA_DIR / "RAVENPACK_cleaned.parquet",
         ],
         "task_dep": [
@@ -241,7 +289,7 @@ def task_charts():
         "file_dep": [
             "./src/settings.py",
             "./src/plot_CRSP_data.py",
-            DATA_DIR / "CRSP_stock_daily.parquet",
+            CRSP_DAILY_DEP,
         ],
         "clean": True,
     }
@@ -256,7 +304,7 @@ def task_charts():
         "file_dep": [
             "./src/settings.py",
             "./src/plot_ravenpack_data.py",
-            DATA_DIR / "RAVENPACK.parquet",
+            RAVENPACK_DEP,
         ],
         "clean": True,
     }
@@ -1,10 +1,31 @@
+import hashlib
+import os
+import shutil
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from itertools import pairwise
 from pathlib import Path
-import re
 
+import numpy as np
 import pandas as pd
+import polars as pl
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from rapidfuzz import process
 from rapidfuzz.distance import OSA
 
-from settings import config
+from pull_ravenpack import load_ravenpack
+from settings import cast_bool, config
+from time_tools import (
+    ET_COLUMNS,
+    ET_SCHEMA_FIELDS,
+    ensure_et_columns,
+    ensure_et_columns_polars,
+    overnight_mask,
+)
+from wrds_tools import peak_rss_mb
 
 DATA_DIR = Path(config("DATA_DIR"))
 
@@ -12,6 +33,46 @@ CRSP_TICKERS_FILE = DATA_DIR / "CRSP_unique_tickers.parquet"
 RAVENPACK_FILE = DATA_DIR / "RAVENPACK.parquet"
 OUTPUT_FILE = DATA_DIR / "RAVENPACK_cleaned.parquet"
 
+SWEEP_OUTPUT_FILE = DATA_DIR / "RAVENPACK_cleaned_sweep.parquet"
+EDGES_FILE = DATA_DIR / "RAVENPACK_osa_edges.parquet"
+OSA_STATE_FILE = DATA_DIR / "RAVENPACK_cleaned_osa_state.parquet"
+
+# Reuse keep decisions of firm-days whose content is unchanged since the last run
+OSA_INCREMENTAL = config("OSA_INCREMENTAL", default=False, cast=cast_bool)
+
+# Comma-separated thresholds (e.g. 0.5,0.6,0.7) switch to sweep mode: one
+# similarity pass, one kept_at_<t> column per threshold
+OSA_SWEEP_THRESHOLDS = [
+    float(t) for t in config("OSA_SWEEP_THRESHOLDS", default="", cast=str).split(",") if t.strip()
+]
+# Lowest similarity stored in the edge list; sweep thresholds must be >= this
+OSA_SWEEP_FLOOR = config("OSA_SWEEP_FLOOR", default=0.40, cast=float)
+
+# > 0 adds a per-entity sliding-window near-duplicate pass (catches repeats
+# across UTC midnight or a day later) after the firm-day dedupe
+OSA_WINDOW_HOURS = config("OSA_WINDOW_HOURS", default=0, cast=float)
+# Default window of `window_near_duplicate_mask`; 24h when the pass is off
+OSA_WINDOW = pd.Timedelta(hours=OSA_WINDOW_HOURS or 24)
+# MinHash/LSH banding for the window pass: more bands = higher recall, more candidates
+LSH_BANDS = 32
+LSH_ROWS = 2
+SHINGLE_CHARS = 4
+MINHASH_PRIME = (1 << 31) - 1
+
+# "pandas", "polars" to run steps 1-3 as a lazy Polars plan that only
+# materializes the columns the dedupe needs, or "streaming" to clean out of
+# core one entity bucket at a time. OSA_SWEEP_THRESHOLDS needs "pandas"
+CLEAN_ENGINE = config("CLEAN_ENGINE", default="pandas", cast=str)
+# Entity-hash buckets spilled to disk by the streaming engine; peak memory is
+# about one bucket, so raise this for longer histories
+CLEAN_BUCKETS = config("CLEAN_BUCKETS", default=64, cast=int)
+CLEAN_BATCH_ROWS = config("CLEAN_BATCH_ROWS", default=250_000, cast=int)
+
+# Processes for the firm-day OSA dedupe (also --OSA_DEDUPE_WORKERS=N); 1 runs in-process
+OSA_DEDUPE_WORKERS = config("OSA_DEDUPE_WORKERS", default=1, cast=int)
+# Entity-hash shards per worker, so one heavy-news shard does not idle the others
+SHARDS_PER_WORKER = 4
+
 #clean tickers
 
 def _norm_ticker_series(s: pd.Series) -> pd.Series:
@@ -21,10 +82,586 @@ def _norm_ticker_series(s: pd.Series) -> pd.Series:
     return s
 
 #clean headlines for OSA dedupe
-def _norm_headline(s: str) -> str:
-    s = (s or "").lower().strip()
-    s = re.sub(r"\s+", " ", s)
-    return s
+def _norm_headlines(s: pd.Series) -> pd.Series:
+    """Lowercase, strip and collapse whitespace; missing headlines become ""."""
+    s = s.astype("string").fillna("").str.lower().str.strip()
+    return s.str.replace(r"\s+", " ", regex=True)
+
+
+FIRM_DAY_COLS = ["rp_entity_id", "rpa_date_utc"]
+# Bins of the character bag used to bound OSA similarity before computing it
+BAG_BINS = 64
+OSA_STATS_KEYS = [
+    "pairs_considered",
+    "pairs_pruned_length",
+    "pairs_pruned_bag",
+    "pairs_computed",
+    "kept",
+    "dropped",
+]
+
+
+def _priority_cols(columns) -> tuple[list[str], list[bool]]:
+    # Prefer highest relevance if present; otherwise sort by timestamp
+    if "event_relevance" in columns:
+        return ["event_relevance", "timestamp_utc"], [False, True]
+    if "relevance" in columns:
+        return ["relevance", "timestamp_utc"], [False, True]
+    return ["timestamp_utc"], [True]
+
+
+def _char_bags(headlines: list[str]) -> np.ndarray:
+    """Character counts per headline, folded into BAG_BINS bins."""
+    bags = np.zeros((len(headlines), BAG_BINS), dtype=np.int32)
+    for i, h in enumerate(headlines):
+        if h:
+            codes = np.frombuffer(h.encode("utf-32-le"), dtype=np.uint32) % BAG_BINS
+            bags[i] = np.bincount(codes, minlength=BAG_BINS)
+    return bags
+
+
+def osa_keep_mask(headlines, threshold: float = 0.60, stats: dict | None = None) -> np.ndarray:
+    """
+    Greedy OSA dedupe over normalized headlines given in priority order.
+
+    A headline is kept unless it is empty or has similarity > threshold to an
+    already kept headline. Before any edit distance is computed, kept
+    headlines are pruned with two upper bounds on the normalized similarity
+    1 - d / max(len): the length difference, and the character bag distance
+    (both are lower bounds on the OSA distance d, so pruning never changes
+    the result). The survivors are scored in one `rapidfuzz.process.cdist`
+    call.
+
+    Parameters:
+    - headlines: Normalized headlines in priority order.
+    - threshold (float): Similarity above which a headline is a duplicate.
+    - stats (dict): Optional counters to add to (see OSA_STATS_KEYS).
+
+    Returns:
+    - numpy bool array, True for kept headlines.
+    """
+    headlines = list(headlines)
+    n = len(headlines)
+    keep = np.zeros(n, dtype=bool)
+    lengths = np.fromiter(map(len, headlines), dtype=np.int64, count=n)
+    bags = _char_bags(headlines)
+    kept = np.empty(n, dtype=np.intp)
+    n_kept = 0
+    considered = pruned_length = pruned_bag = computed = 0
+
+    for i in range(n):
+        if not lengths[i]:
+            continue
+        cand = kept[:n_kept]
+        considered += n_kept
+
+        longest = np.maximum(lengths[cand], lengths[i])
+        ok = 1.0 - np.abs(lengths[cand] - lengths[i]) / longest > threshold
+        pruned_length += n_kept - int(ok.sum())
+        cand, longest = cand[ok], longest[ok]
+
+        if len(cand):
+            diff = bags[cand] - bags[i]
+            bag_dist = np.maximum(np.clip(diff, 0, None).sum(axis=1), np.clip(-diff, 0, None).sum(axis=1))
+            ok = 1.0 - bag_dist / longest > threshold
+            pruned_bag += len(cand) - int(ok.sum())
+            cand = cand[ok]
+
+        duplicate = False
+        if len(cand):
+            computed += len(cand)
+            sim = process.cdist(
+                [headlines[i]],
+                [headlines[j] for j in cand],
+                scorer=OSA.normalized_similarity,
+                score_cutoff=threshold,
+                dtype=np.float64,
+            )
+            duplicate = bool((sim > threshold).any())
+
+        if not duplicate:
+            keep[i] = True
+            kept[n_kept] = i
+            n_kept += 1
+
+    if stats is not None:
+        for key, value in zip(
+            OSA_STATS_KEYS,
+            (considered, pruned_length, pruned_bag, computed, n_kept, n - n_kept),
+        ):
+            stats[key] = stats.get(key, 0) + value
+    return keep
+
+
+def _multi_firm_days(df: pd.DataFrame, group_cols=FIRM_DAY_COLS) -> pd.DataFrame:
+    """
+    Row positions (`_pos`) and firm-day codes (`_group`) of the rows in
+    multi-headline firm-days, sorted by firm-day and then priority.
+    """
+    cols, ascending = _priority_cols(df.columns)
+    work = pd.DataFrame(
+        {
+            "_pos": np.arange(len(df)),
+            "_group": df.groupby(group_cols, sort=False, dropna=True).ngroup().to_numpy(),
+            **{c: df[c].to_numpy() for c in cols},
+        }
+    )
+    work = work[work["_group"] >= 0]
+    work = work[work.groupby("_group")["_group"].transform("size").to_numpy() > 1]
+    work = work.sort_values(["_group", *cols], ascending=[True, *ascending], kind="stable")
+    return work[["_pos", "_group"]]
+
+
+def _dedupe_shard(shard, positions, bounds, headlines, threshold):
+    """
+    Dedupe one shard of firm-days. `positions`/`headlines` are the shard's rows
+    in priority order and `bounds` the start offsets of each firm-day (plus the
+    end). Returns the kept row positions, timing and comparison counters.
+    """
+    start = time.perf_counter()
+    stats = {}
+    kept = []
+    for lo, hi in pairwise(bounds):
+        mask = osa_keep_mask(headlines[lo:hi], threshold, stats=stats)
+        kept.append(positions[lo:hi][mask])
+    kept = np.concatenate(kept) if kept else np.array([], dtype=np.int64)
+    return shard, kept, len(positions), len(bounds) - 1, time.perf_counter() - start, stats
+
+
+def osa_dedupe_mask(
+    df: pd.DataFrame,
+    threshold: float = 0.60,
+    group_cols=FIRM_DAY_COLS,
+    workers: int = 1,
+    verbose: bool = False,
+    stats: dict | None = None,
+) -> pd.Series:
+    """
+    Firm-day OSA dedupe as a boolean keep-mask aligned with `df`.
+
+    Within each firm-day, headlines are ranked by relevance (then timestamp) and
+    deduped with `osa_keep_mask`. Firm-days with a single headline, and rows
+    with a missing firm-day key, are always kept.
+
+    With `workers` > 1, multi-headline firm-days are sharded by a hash of the
+    first group column (the entity) across a process pool. Workers only receive
+    row positions, firm-day offsets and normalized headlines, already in
+    priority order, and send back the kept positions.
+
+    `stats`, if given, accumulates the `osa_keep_mask` comparison counters over
+    the multi-headline firm-days.
+    """
+    keep = np.ones(len(df), dtype=bool)
+    if len(df) == 0:
+        return pd.Series(keep, index=df.index)
+
+    work = _multi_firm_days(df, group_cols)
+    n_shards = workers * SHARDS_PER_WORKER if workers > 1 else 1
+    entity = df[group_cols[0]].to_numpy()[work["_pos"].to_numpy()]
+    work["_shard"] = (pd.util.hash_array(entity) % n_shards).astype(np.int64)
+    work = work.sort_values("_shard", kind="stable")
+
+    shards = work["_shard"].to_numpy()
+    groups = work["_group"].to_numpy()
+    positions = work["_pos"].to_numpy()
+    headlines = _norm_headlines(df["headline"]).to_numpy(dtype=object)[positions]
+    keep[positions] = False
+
+    tasks = []
+    shard_bounds = np.flatnonzero(np.r_[True, shards[1:] != shards[:-1], True]) if len(work) else []
+    for lo, hi in pairwise(shard_bounds):
+        g = groups[lo:hi]
+        bounds = np.flatnonzero(np.r_[True, g[1:] != g[:-1], True])
+        tasks.append((int(shards[lo]), positions[lo:hi], bounds, headlines[lo:hi], threshold))
+
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_dedupe_shard, *zip(*tasks)))
+    else:
+        results = [_dedupe_shard(*task) for task in tasks]
+
+    for shard, kept, n_rows, n_groups, seconds, shard_stats in results:
+        keep[kept] = True
+        if stats is not None:
+            for key, value in shard_stats.items():
+                stats[key] = stats.get(key, 0) + value
+        if verbose and workers > 1:
+            print(f"  shard {shard:>3}: {n_rows:>10,} rows, {n_groups:>9,} firm-days, {seconds:8.2f}s")
+    if verbose and workers > 1 and results:
+        seconds = np.array([r[4] for r in results])
+        print(
+            f"  {len(results)} shards on {workers} workers: "
+            f"max {seconds.max():.2f}s, median {np.median(seconds):.2f}s"
+        )
+
+    return pd.Series(keep, index=df.index)
+
+
+def _sweep_fingerprint(df: pd.DataFrame, group_cols=FIRM_DAY_COLS) -> str:
+    """Hash of the columns the dedupe depends on, to tell if stored edges are stale."""
+    cols, _ = _priority_cols(df.columns)
+    hashed = pd.util.hash_pandas_object(df[[*group_cols, *cols, "headline"]], index=False)
+    return hashlib.sha256(hashed.to_numpy().tobytes()).hexdigest()
+
+
+def osa_similarity_edges(df: pd.DataFrame, floor: float = 0.40, group_cols=FIRM_DAY_COLS) -> pd.DataFrame:
+    """
+    Pairwise OSA similarities above `floor` within each multi-headline firm-day.
+
+    Returns:
+    - pandas.DataFrame with `a` and `b` (row positions in `df`, `a` ranked
+      before `b` in its firm-day) and their `similarity`. Empty headlines,
+      which the dedupe always drops, get no edges.
+    """
+    work = _multi_firm_days(df, group_cols)
+    groups = work["_group"].to_numpy()
+    positions = work["_pos"].to_numpy()
+    headlines = _norm_headlines(df["headline"]).to_numpy(dtype=object)
+
+    a_parts, b_parts, sim_parts = [], [], []
+    bounds = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1], True]) if len(work) else []
+    for lo, hi in pairwise(bounds):
+        pos = positions[lo:hi]
+        pos = pos[headlines[pos] != ""]
+        if len(pos) < 2:
+            continue
+        texts = list(headlines[pos])
+        sim = process.cdist(texts, texts, scorer=OSA.normalized_similarity, score_cutoff=floor, dtype=np.float64)
+        i, j = np.nonzero(np.triu(sim > floor, k=1))
+        a_parts.append(pos[i])
+        b_parts.append(pos[j])
+        sim_parts.append(sim[i, j])
+
+    def _cat(parts, dtype):
+        return np.concatenate(parts).astype(dtype) if parts else np.array([], dtype=dtype)
+
+    return pd.DataFrame(
+        {
+            "a": _cat(a_parts, np.int64),
+            "b": _cat(b_parts, np.int64),
+            "similarity": _cat(sim_parts, np.float64),
+        }
+    )
+
+
+def load_or_build_similarity_edges(
+    df: pd.DataFrame, path: Path = EDGES_FILE, floor: float = OSA_SWEEP_FLOOR
+) -> pd.DataFrame:
+    """
+    Return the similarity edges of `df`, reading them from `path` when it was
+    built from the same rows with the same floor, and building and saving
+    them otherwise.
+    """
+    fingerprint = _sweep_fingerprint(df)
+    if Path(path).exists():
+        metadata = pq.read_schema(path).metadata or {}
+        if (
+            metadata.get(b"osa_fingerprint", b"").decode() == fingerprint
+            and float(metadata.get(b"osa_floor", b"nan")) == floor
+        ):
+            print(f"Reusing OSA similarity edges from {path}")
+            return pd.read_parquet(path)
+
+    print(f"Computing OSA similarity edges above {floor:.2f}...")
+    edges = osa_similarity_edges(df, floor=floor)
+    table = pa.Table.from_pandas(edges, preserve_index=False)
+    table = table.replace_schema_metadata(
+        {
+            **(table.schema.metadata or {}),
+            b"osa_fingerprint": fingerprint.encode(),
+            b"osa_floor": str(floor).encode(),
+        }
+    )
+    pq.write_table(table, path, compression="zstd")
+    print(f"Saved {len(edges):,} edges to {path}")
+    return edges
+
+
+def keep_masks_from_edges(
+    df: pd.DataFrame, edges: pd.DataFrame, thresholds, group_cols=FIRM_DAY_COLS
+) -> dict[float, np.ndarray]:
+    """
+    Greedy firm-day dedupe for each threshold, replayed from stored edges.
+
+    Matches `osa_dedupe_mask(df, t)` for every t >= the floor the edges were
+    built with: a row is dropped if it is empty or an edge with similarity > t
+    links it to an earlier kept row of its firm-day.
+    """
+    work = _multi_firm_days(df, group_cols)
+    positions = work["_pos"].to_numpy()
+    rank = np.full(len(df), -1, dtype=np.int64)
+    rank[positions] = np.arange(len(positions))
+    empty = (_norm_headlines(df["headline"]) == "").to_numpy()
+
+    by_b = edges.assign(_rank=rank[edges["b"].to_numpy()]).sort_values("_rank", kind="stable")
+    a_all = by_b["a"].to_numpy()
+    b_all = by_b["b"].to_numpy()
+    sim_all = by_b["similarity"].to_numpy()
+
+    masks = {}
+    for t in thresholds:
+        keep = np.ones(len(df), dtype=bool)
+        keep[positions[empty[positions]]] = False
+        strong = sim_all > t
+        masks[t] = _replay_greedy(keep, a_all[strong], b_all[strong])
+    return masks
+
+
+def _replay_greedy(keep: np.ndarray, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Drop `b` wherever its duplicate `a` is kept. Edges must be ordered so every
+    edge into a row comes before any edge out of it.
+    """
+    for i, j in zip(a, b):
+        if keep[i]:
+            keep[j] = False
+    return keep
+
+
+def _minhash_signatures(headlines, num_perm: int, shingle: int = SHINGLE_CHARS, seed: int = 0) -> np.ndarray:
+    """MinHash signatures of character shingles, one row per headline (empty rows stay 0)."""
+    rng = np.random.default_rng(seed)
+    prime = np.uint64(MINHASH_PRIME)
+    a = rng.integers(1, MINHASH_PRIME, num_perm, dtype=np.uint64)
+    b = rng.integers(0, MINHASH_PRIME, num_perm, dtype=np.uint64)
+    sigs = np.zeros((len(headlines), num_perm), dtype=np.uint64)
+    for i, h in enumerate(headlines):
+        if not h:
+            continue
+        shingles = {h[k : k + shingle] for k in range(max(1, len(h) - shingle + 1))}
+        x = np.fromiter((zlib.crc32(sh.encode("utf-8")) for sh in shingles), dtype=np.uint64)
+        x %= prime
+        sigs[i] = ((a[:, None] * x[None, :] + b[:, None]) % prime).min(axis=1)
+    return sigs
+
+
+def window_candidate_pairs(
+    entities: np.ndarray,
+    seconds: np.ndarray,
+    sigs: np.ndarray,
+    window_seconds: int,
+    bands: int = LSH_BANDS,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Pairs (a, b) of row indices for the same entity, at most `window_seconds`
+    apart, that share at least one LSH band bucket. `a` is the earlier row.
+    Rows are bucketed per (entity, band, band hash) and, within a bucket,
+    matched to later rows through sorted timestamps, so the work grows with
+    the number of near-duplicates rather than with all pairs in the window.
+    """
+    rows = sigs.shape[1] // bands
+    idx = np.arange(len(entities))
+    entity_codes = pd.factorize(entities)[0]
+    a_parts, b_parts = [], []
+    for band in range(bands):
+        band_hash = pd.util.hash_pandas_object(
+            pd.DataFrame(sigs[:, band * rows : (band + 1) * rows]), index=False
+        ).to_numpy()
+        buckets = (
+            pd.DataFrame({"entity": entity_codes, "band_hash": band_hash})
+            .groupby(["entity", "band_hash"], sort=False)
+            .ngroup()
+            .to_numpy()
+        )
+        order = np.lexsort((idx, seconds, buckets))
+        key = (buckets[order].astype(np.int64) << 32) | seconds[order]
+        hi = np.searchsorted(key, key + window_seconds, side="right")
+        counts = hi - np.arange(len(key)) - 1
+        starts = np.repeat(np.arange(len(key)), counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        a_parts.append(order[starts])
+        b_parts.append(order[starts + 1 + offsets])
+
+    if not a_parts:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+    pairs = np.unique(np.column_stack([np.concatenate(a_parts), np.concatenate(b_parts)]), axis=0)
+    return pairs[:, 0], pairs[:, 1]
+
+
+def window_near_duplicate_mask(
+    df: pd.DataFrame,
+    window: pd.Timedelta = OSA_WINDOW,
+    threshold: float = 0.60,
+    entity_col: str = "rp_entity_id",
+    time_col: str = "timestamp_utc",
+    stats: dict | None = None,
+) -> pd.Series:
+    """
+    Per-entity near-duplicate dedupe over a sliding time window, so repeats
+    straddling UTC midnight or arriving a day later are caught.
+
+    Candidate pairs come from MinHash/LSH banding on character shingles
+    (`window_candidate_pairs`) and are confirmed with OSA similarity >
+    threshold. In time order, a headline is dropped if a confirmed duplicate
+    within `window` before it was kept. LSH is approximate: pairs whose
+    shingle overlap is far below the OSA threshold can be missed.
+
+    Returns:
+    - pandas.Series of bool aligned with `df`, True for kept rows. Rows with a
+      missing entity, timestamp or headline are kept.
+    """
+    keep = np.ones(len(df), dtype=bool)
+    headlines = _norm_headlines(df["headline"]).to_numpy(dtype=object)
+    ts = pd.to_datetime(df[time_col], utc=True)
+    valid = df[entity_col].notna().to_numpy() & ts.notna().to_numpy() & (headlines != "")
+    rows = np.flatnonzero(valid)
+    if len(rows) < 2:
+        return pd.Series(keep, index=df.index)
+
+    ts_s = ts.dt.tz_convert(None).to_numpy()[rows].astype("datetime64[s]").astype(np.int64)
+    seconds = ts_s - ts_s.min()
+    sigs = _minhash_signatures(headlines[rows], num_perm=LSH_BANDS * LSH_ROWS)
+    a, b = window_candidate_pairs(
+        df[entity_col].to_numpy()[rows], seconds, sigs, int(window.total_seconds())
+    )
+
+    sim = process.cpdist(
+        list(headlines[rows[a]]),
+        list(headlines[rows[b]]),
+        scorer=OSA.normalized_similarity,
+        score_cutoff=threshold,
+        dtype=np.float64,
+    ) if len(a) else np.array([], dtype=np.float64)
+    confirmed = sim > threshold
+    a, b = a[confirmed], b[confirmed]
+
+    # Time order of `b` within the valid rows (ties by position), so each row's
+    # own status is settled before it can suppress a later one
+    rank = np.empty(len(rows), dtype=np.int64)
+    rank[np.lexsort((np.arange(len(rows)), seconds))] = np.arange(len(rows))
+    order = np.argsort(rank[b], kind="stable")
+    kept_valid = _replay_greedy(np.ones(len(rows), dtype=bool), a[order], b[order])
+    keep[rows] = kept_valid
+
+    if stats is not None:
+        for key, value in (
+            ("window_candidate_pairs", len(sim)),
+            ("window_confirmed_pairs", int(confirmed.sum())),
+            ("window_dropped", int((~kept_valid).sum())),
+        ):
+            stats[key] = stats.get(key, 0) + value
+    return pd.Series(keep, index=df.index)
+
+
+def run_threshold_sweep(rp_filt: pd.DataFrame, thresholds, floor: float = OSA_SWEEP_FLOOR) -> pd.DataFrame:
+    """
+    Dedupe at several thresholds from one similarity pass and save the
+    overnight rows with a `kept_at_<t>` column per threshold. `<t>` is the
+    shortest repr of the threshold, so e.g. 0.605 and 0.61 get distinct columns.
+    """
+    thresholds = sorted({float(t) for t in thresholds})
+    if thresholds[0] < floor:
+        raise ValueError(f"Sweep thresholds must be >= the edge floor {floor}: {thresholds}")
+
+    rp_filt = rp_filt.reset_index(drop=True)
+    edges = load_or_build_similarity_edges(rp_filt, path=EDGES_FILE, floor=floor)
+    masks = keep_masks_from_edges(rp_filt, edges, thresholds)
+    for t, keep in masks.items():
+        rp_filt[f"kept_at_{t!r}"] = keep
+
+    rp_filt = ensure_et_columns(rp_filt)
+    overnight = overnight_mask(rp_filt)
+    print("\n=== Threshold sweep: rows kept (after OSA / after dropping intraday) ===")
+    for t, keep in masks.items():
+        print(f"  > {t!r:<6}: {keep.sum():>12,} / {(keep & overnight).sum():>12,}")
+
+    out = rp_filt.loc[overnight]
+    out.to_parquet(SWEEP_OUTPUT_FILE, index=False)
+    print(f"\nSaved threshold sweep to: {SWEEP_OUTPUT_FILE}")
+    return out
+
+
+def _firm_day_fingerprints(df: pd.DataFrame, work: pd.DataFrame) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Rank within firm-day and a per-firm-day content fingerprint for the rows of
+    `work` (as returned by `_multi_firm_days`). The fingerprint hashes the
+    normalized headlines and sort keys in priority order, so equal fingerprints
+    mean the greedy dedupe sees exactly the same sequence.
+    """
+    cols, _ = _priority_cols(df.columns)
+    positions = work["_pos"].to_numpy()
+    groups = work["_group"].to_numpy()
+    starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+    rank = np.arange(len(positions)) - np.repeat(starts, np.diff(np.r_[starts, len(positions)]))
+    rows = pd.DataFrame(
+        {
+            "rank": rank,
+            "headline": _norm_headlines(df["headline"]).to_numpy(dtype=object)[positions],
+            **{c: df[c].to_numpy()[positions] for c in cols},
+        }
+    )
+    row_hash = pd.util.hash_pandas_object(rows, index=False).to_numpy()
+    group_hash = np.add.reduceat(row_hash, starts) if len(starts) else row_hash
+    return rank, np.repeat(group_hash, np.diff(np.r_[starts, len(positions)]))
+
+
+def incremental_osa_dedupe_mask(
+    df: pd.DataFrame,
+    threshold: float = 0.60,
+    state_path: Path = OSA_STATE_FILE,
+    workers: int = 1,
+    verbose: bool = False,
+    stats: dict | None = None,
+) -> pd.Series:
+    """
+    `osa_dedupe_mask` that only dedupes firm-days that changed since the last run.
+
+    Keep decisions of every multi-headline firm-day are saved to `state_path`
+    together with its content fingerprint. On the next run, firm-days with the
+    same fingerprint (and the same threshold) reuse their saved decisions and
+    only new or changed firm-days go through the OSA dedupe.
+    """
+    keep = np.ones(len(df), dtype=bool)
+    work = _multi_firm_days(df)
+    positions = work["_pos"].to_numpy()
+    rank, fingerprint = _firm_day_fingerprints(df, work)
+    current = pd.DataFrame(
+        {
+            **{c: df[c].to_numpy()[positions] for c in FIRM_DAY_COLS},
+            "rank": rank,
+            "fingerprint": fingerprint,
+            "_pos": positions,
+            "_group": work["_group"].to_numpy(),
+        }
+    )
+
+    reused = np.zeros(len(current), dtype=bool)
+    if Path(state_path).exists():
+        metadata = pq.read_schema(state_path).metadata or {}
+        if float(metadata.get(b"osa_threshold", b"nan")) == threshold:
+            prior = pd.read_parquet(state_path).rename(columns={"fingerprint": "_prior", "keep": "_keep"})
+            merged = current[[*FIRM_DAY_COLS, "rank", "fingerprint"]].merge(
+                prior, on=[*FIRM_DAY_COLS, "rank"], how="left"
+            )
+            match = (merged["_prior"].to_numpy() == fingerprint) & merged["_keep"].notna().to_numpy()
+            # A firm-day is reused only if all of its rows match
+            match = pd.Series(match).groupby(current["_group"].to_numpy()).transform("all").to_numpy()
+            reused = match
+            keep[positions[reused]] = merged["_keep"].to_numpy()[reused].astype(bool)
+
+    changed = positions[~reused]
+    if len(changed):
+        sub = df.iloc[changed]
+        keep[changed] = osa_dedupe_mask(
+            sub, threshold=threshold, workers=workers, verbose=verbose, stats=stats
+        ).to_numpy()
+
+    state = current[[*FIRM_DAY_COLS, "rank", "fingerprint"]].assign(keep=keep[positions])
+    table = pa.Table.from_pandas(state, preserve_index=False)
+    table = table.replace_schema_metadata(
+        {**(table.schema.metadata or {}), b"osa_threshold": str(threshold).encode()}
+    )
+    tmp = Path(state_path).with_name(f"_{Path(state_path).name}.tmp")
+    pq.write_table(table, tmp, compression="zstd")
+    os.replace(tmp, state_path)
+
+    if stats is not None:
+        n_groups = current["_group"].nunique()
+        n_changed = current.loc[~reused, "_group"].nunique()
+        stats["firm_days_reused"] = stats.get("firm_days_reused", 0) + n_groups - n_changed
+        stats["firm_days_deduped"] = stats.get("firm_days_deduped", 0) + n_changed
+    return pd.Series(keep, index=df.index)
+
 
 # OSA dedupe function for firm-day headlines
 # this is based on the filtering procedure in the paper where they remove headlines with OSA similarity > 0.60 to a higher-relevance headline for the same firm-day
@@ -34,53 +671,359 @@ def osa_dedupe_firm_day(g: pd.DataFrame, threshold: float = 0.60) -> pd.DataFram
     Firm-day headline dedupe using Optimal String Alignment similarity (0..1).
     Keeps the first headline, drops subsequent ones with similarity > threshold.
     """
-    # Prefer highest relevance if present; otherwise sort by timestamp
-    if "event_relevance" in g.columns:
-        g = g.sort_values(["event_relevance", "timestamp_utc"], ascending=[False, True])
-    elif "relevance" in g.columns:
-        g = g.sort_values(["relevance", "timestamp_utc"], ascending=[False, True])
-    else:
-        g = g.sort_values(["timestamp_utc"], ascending=[True])
+    cols, ascending = _priority_cols(g.columns)
+    g = g.sort_values(cols, ascending=ascending)
+    return g.loc[osa_keep_mask(_norm_headlines(g["headline"]), threshold)]
 
-    kept_rows = []
-    kept_texts = []
 
-    for _, row in g.iterrows():
-        h = _norm_headline(row.get("headline", ""))
-        if not h:
-            continue
+def _print_dedupe_report(
+    n_rows_before: int,
+    n_rows_after_osa: int,
+    n_tickers_after_osa: int,
+    osa_stats: dict,
+    threshold: float = 0.60,
+    window_stats: dict | None = None,
+    n_rows_after_window: int | None = None,
+) -> None:
+    """Print the Step 2 (and 2b, when the window pass ran) block, the same for every engine."""
+    print("\n=== Step 2: After OSA Dedupe ===")
+    print(f"Rows before OSA (after CRSP filter): {n_rows_before:,}")
+    print(f"Rows after OSA dedupe: {n_rows_after_osa:,}")
+    print(f"Unique tickers after OSA dedupe: {n_tickers_after_osa:,}")
+    print(f"Headline pairs considered: {osa_stats.get('pairs_considered', 0):,}")
+    print(f"  pruned by length bound: {osa_stats.get('pairs_pruned_length', 0):,}")
+    print(f"  pruned by character-bag bound: {osa_stats.get('pairs_pruned_bag', 0):,}")
+    print(f"  OSA similarity computed: {osa_stats.get('pairs_computed', 0):,}")
+    print(
+        f"Multi-headline firm-day rows kept / dropped: "
+        f"{osa_stats.get('kept', 0):,} / {osa_stats.get('dropped', 0):,}"
+    )
+    if OSA_INCREMENTAL:
+        print(
+            f"Firm-days reused from {OSA_STATE_FILE.name} / re-deduped: "
+            f"{osa_stats.get('firm_days_reused', 0):,} / {osa_stats.get('firm_days_deduped', 0):,}"
+        )
 
-        if not any(OSA.normalized_similarity(h, kh) > threshold for kh in kept_texts):
-            kept_rows.append(row)
-            kept_texts.append(h)
+    if window_stats is not None:
+        print(f"\n=== Step 2b: After {OSA_WINDOW_HOURS:g}h Window Near-Duplicate Dedupe ===")
+        print(f"LSH candidate pairs: {window_stats.get('window_candidate_pairs', 0):,}")
+        print(f"Confirmed by OSA > {threshold:.2f}: {window_stats.get('window_confirmed_pairs', 0):,}")
+        print(f"Rows dropped: {window_stats.get('window_dropped', 0):,}")
+        print(f"Rows after window dedupe: {n_rows_after_window:,}")
 
-    if not kept_rows:
-        return g.iloc[0:0].copy()
 
-    return pd.DataFrame(kept_rows)
+def _pl_norm_ticker(expr: pl.Expr) -> pl.Expr:
+    """Polars version of `_norm_ticker_series`."""
+    s = expr.cast(pl.String).str.to_uppercase().str.replace_all(r"\s+", "")
+    return pl.when(s.is_in(["", "NAN", "NONE", "NULL"])).then(None).otherwise(s)
 
 
-def main():
-    if not CRSP_TICKERS_FILE.exists():
-        raise FileNotFoundError(f"Missing CRSP tickers file: {CRSP_TICKERS_FILE}")
-    if not RAVENPACK_FILE.exists():
-        raise FileNotFoundError(f"Missing RavenPack file: {RAVENPACK_FILE}")
+def _scan_ravenpack(data_dir: Path = DATA_DIR) -> pl.LazyFrame:
+    """Lazy counterpart of `load_ravenpack`."""
+    path = Path(data_dir) / "RAVENPACK.parquet"
+    if path.is_dir():
+        return pl.scan_parquet(path / "**" / "*.parquet", hive_partitioning=True).drop(
+            "year", strict=False
+        )
+    return pl.scan_parquet(path)
 
-    print("Loading CRSP tickers...")
+
+def _load_crsp_ticker_set() -> set[str]:
     crsp = pd.read_parquet(CRSP_TICKERS_FILE)
     if "ticker" not in crsp.columns:
         raise KeyError(
             f"CRSP tickers parquet must contain column 'ticker'. "
             f"Available columns: {list(crsp.columns)}"
         )
+    return set(_norm_ticker_series(crsp["ticker"]).dropna().unique())
+
+
+def clean_ravenpack_out_of_core(
+    data_dir: Path = DATA_DIR,
+    output_file: Path = OUTPUT_FILE,
+    threshold: float = 0.60,
+    n_buckets: int = CLEAN_BUCKETS,
+    batch_rows: int = CLEAN_BATCH_ROWS,
+    workers: int = OSA_DEDUPE_WORKERS,
+) -> dict:
+    """
+    Steps 1-3 of `main()` without loading RavenPack into memory.
+
+    Pass 1 streams the raw data in record batches, normalizes tickers, applies
+    the CRSP filter and spills the surviving rows to `n_buckets` temporary
+    parquet files by a hash of `rp_entity_id`, so every entity (and therefore
+    every firm-day) lands whole in one bucket. Pass 2 loads one bucket at a
+    time, runs the OSA dedupe (and the window pass, if enabled) and the
+    overnight filter, and appends the result to a single ParquetWriter.
+    Peak memory is one bucket rather than the full history. Rows come out
+    grouped by bucket instead of in source order. With OSA_INCREMENTAL each
+    bucket keeps its own state file next to OSA_STATE_FILE; buckets are
+    stable for a given `n_buckets`, so reruns reuse unchanged firm-days.
+
+    Returns:
+    - dict: Stage row counts, unique ticker counts and the OSA / window dedupe
+      counters summed over buckets, also printed at the end.
+    """
+    crsp_ticker_set = _load_crsp_ticker_set()
+
+    path = Path(data_dir) / "RAVENPACK.parquet"
+    dataset = ds.dataset(path, format="parquet", partitioning="hive" if path.is_dir() else None)
+    columns = [c for c in dataset.schema.names if c != "year"]
+    if "map_ticker" not in columns:
+        raise KeyError(f"'map_ticker' not found in RavenPack file. Available columns: {columns}")
+    missing = {"rp_entity_id", "rpa_date_utc", "timestamp_utc", "headline"} - set(columns)
+    if missing:
+        raise KeyError(
+            f"Cannot OSA-dedupe because RavenPack is missing columns: {sorted(missing)}"
+        )
+    schema = pa.schema(
+        [
+            pa.field(f.name, pa.string()) if f.name == "map_ticker" else f
+            for f in dataset.schema
+            if f.name in columns
+        ]
+    )
+    # Raw files written before the pull added the ET columns get them in pass 2
+    out_schema = schema
+    if not all(c in columns for c in ET_COLUMNS):
+        out_schema = pa.schema([*[f for f in schema if f.name not in ET_COLUMNS], *ET_SCHEMA_FIELDS])
+
+    counts = {"rows_original": 0, "rows_after_crsp": 0, "rows_after_osa": 0, "rows_after_timing": 0}
+    osa_stats = {}
+    window_stats = {} if OSA_WINDOW_HOURS > 0 else None
+    if window_stats is not None:
+        counts["rows_after_window"] = 0
+    tickers = {"original": set(), "after_crsp": set(), "after_osa": set(), "after_timing": set()}
+
+    output_file = Path(output_file)
+    spill_dir = output_file.with_name(f"_{output_file.stem}_buckets")
+    if spill_dir.exists():
+        shutil.rmtree(spill_dir)
+    spill_dir.mkdir(parents=True)
+    tmp_output = output_file.with_name(f"_{output_file.name}.tmp")
+    writers = {}
+    try:
+        # Pass 1: CRSP filter and spill by entity bucket
+        print(f"Spilling CRSP-filtered RavenPack rows into {n_buckets} entity buckets...", flush=True)
+        for batch in dataset.to_batches(columns=columns, batch_size=batch_rows):
+            df = batch.to_pandas()
+            df["map_ticker"] = _norm_ticker_series(df["map_ticker"])
+            counts["rows_original"] += len(df)
+            tickers["original"].update(df["map_ticker"].dropna().unique())
+
+            df = df[df["map_ticker"].isin(crsp_ticker_set)]
+            counts["rows_after_crsp"] += len(df)
+            tickers["after_crsp"].update(df["map_ticker"].dropna().unique())
+            if df.empty:
+                continue
+
+            bucket = pd.util.hash_array(df["rp_entity_id"].to_numpy(dtype=object)) % n_buckets
+            for b, part in df.groupby(bucket, sort=False):
+                if b not in writers:
+                    writers[b] = pq.ParquetWriter(spill_dir / f"bucket={b}.parquet", schema)
+                writers[b].write_table(pa.Table.from_pandas(part, schema=schema, preserve_index=False))
+        for writer in writers.values():
+            writer.close()
+        writers.clear()
+
+        # Pass 2: dedupe and timing filter one bucket at a time
+        print(f"Deduping {len(list(spill_dir.iterdir()))} buckets...", flush=True)
+        with pq.ParquetWriter(tmp_output, out_schema) as out:
+            for bucket_file in sorted(spill_dir.iterdir()):
+                df = pq.read_table(bucket_file, schema=schema).to_pandas()
+                if OSA_INCREMENTAL:
+                    state_path = OSA_STATE_FILE.with_name(
+                        f"{OSA_STATE_FILE.stem}_{bucket_file.stem}_of_{n_buckets}.parquet"
+                    )
+                    keep = incremental_osa_dedupe_mask(
+                        df, threshold=threshold, state_path=state_path, workers=workers, stats=osa_stats
+                    )
+                else:
+                    keep = osa_dedupe_mask(df, threshold=threshold, workers=workers, stats=osa_stats)
+                df = df.loc[keep.to_numpy()]
+                counts["rows_after_osa"] += len(df)
+                tickers["after_osa"].update(df["map_ticker"].dropna().unique())
+                if window_stats is not None:
+                    df = df.loc[
+                        window_near_duplicate_mask(
+                            df,
+                            window=pd.Timedelta(hours=OSA_WINDOW_HOURS),
+                            threshold=threshold,
+                            stats=window_stats,
+                        ).to_numpy()
+                    ]
+                    counts["rows_after_window"] += len(df)
 
-    crsp["ticker"] = _norm_ticker_series(crsp["ticker"])
-    crsp = crsp.dropna(subset=["ticker"])
-    crsp_ticker_set = set(crsp["ticker"].unique())
+                df = ensure_et_columns(df)
+                df = df.loc[overnight_mask(df)]
+                counts["rows_after_timing"] += len(df)
+                tickers["after_timing"].update(df["map_ticker"].dropna().unique())
+                out.write_table(pa.Table.from_pandas(df, schema=out_schema, preserve_index=False))
+                bucket_file.unlink()
+        os.replace(tmp_output, output_file)
+    finally:
+        for writer in writers.values():
+            writer.close()
+        shutil.rmtree(spill_dir, ignore_errors=True)
+        if tmp_output.exists():
+            tmp_output.unlink()
+
+    for stage, seen in tickers.items():
+        counts[f"tickers_{stage}"] = len(seen)
+    counts.update(osa_stats)
+    counts.update(window_stats or {})
+    peak = peak_rss_mb()
+
+    print("\n=== Step 1: CRSP Ticker Filter ===")
+    print(f"RavenPack rows (original): {counts['rows_original']:,}")
+    print(f"RavenPack rows (after CRSP ticker filter): {counts['rows_after_crsp']:,}")
+    print(f"CRSP unique tickers: {len(crsp_ticker_set):,}")
+    print(f"RavenPack unique tickers (original): {counts['tickers_original']:,}")
+    print(f"RavenPack unique tickers (after CRSP filter): {counts['tickers_after_crsp']:,}")
+    _print_dedupe_report(
+        counts["rows_after_crsp"],
+        counts["rows_after_osa"],
+        counts["tickers_after_osa"],
+        osa_stats,
+        threshold=threshold,
+        window_stats=window_stats,
+        n_rows_after_window=counts.get("rows_after_window"),
+    )
+    print("\n=== Step 3: After Dropping Intraday News ===")
+    print(f"Rows after dropping intraday: {counts['rows_after_timing']:,}")
+    print(f"Unique tickers after dropping intraday: {counts['tickers_after_timing']:,}")
+    if peak is not None:
+        print(f"\nPeak RSS: {peak:,.0f} MB")
+    print(f"\nSaved final cleaned RavenPack parquet to: {output_file}")
+    return counts
+
+
+def clean_ravenpack_polars(
+    data_dir: Path = DATA_DIR,
+    output_file: Path = OUTPUT_FILE,
+    threshold: float = 0.60,
+    workers: int = OSA_DEDUPE_WORKERS,
+) -> None:
+    """
+    Steps 1-3 of `main()` as lazy Polars plans.
+
+    Only the row id, keys, sort columns and headline of the CRSP-filtered rows
+    are materialized for the OSA dedupe (the same keep-mask functions as the
+    pandas engine); the full rows are then streamed from the source straight
+    to `output_file`, filtered to the kept ids, without an in-memory copy.
+    """
+    tickers = (
+        pl.scan_parquet(CRSP_TICKERS_FILE)
+        .select(_pl_norm_ticker(pl.col("ticker")).alias("ticker"))
+        .drop_nulls()
+        .unique()
+        .collect()["ticker"]
+    )
+
+    rp = ensure_et_columns_polars(_scan_ravenpack(data_dir))
+    schema = rp.collect_schema()
+    if "map_ticker" not in schema:
+        raise KeyError(
+            f"'map_ticker' not found in RavenPack file. Available columns: {schema.names()}"
+        )
+    missing = {"rp_entity_id", "rpa_date_utc", "timestamp_utc", "headline"} - set(schema.names())
+    if missing:
+        raise KeyError(
+            f"Cannot OSA-dedupe because RavenPack is missing columns: {sorted(missing)}"
+        )
+    rp = rp.with_row_index("_row").with_columns(_pl_norm_ticker(pl.col("map_ticker")).alias("map_ticker"))
+    filtered = rp.filter(pl.col("map_ticker").is_in(tickers.implode()))
+
+    original = rp.select(
+        pl.len().alias("rows"), pl.col("map_ticker").drop_nulls().n_unique().alias("tickers")
+    ).collect()
+    cols, _ = _priority_cols(schema.names())
+    work = (
+        filtered.select(
+            "_row",
+            "map_ticker",
+            *FIRM_DAY_COLS,
+            *[c for c in cols if c not in FIRM_DAY_COLS],
+            "headline",
+            "date_et",
+            "minute_of_day_et",
+            "is_overnight",
+        )
+        .collect()
+        .to_pandas()
+    )
+
+    print("\n=== Step 1: CRSP Ticker Filter ===")
+    print(f"RavenPack rows (original): {original['rows'][0]:,}")
+    print(f"RavenPack rows (after CRSP ticker filter): {len(work):,}")
+    print(f"CRSP unique tickers: {len(tickers):,}")
+    print(f"RavenPack unique tickers (original): {original['tickers'][0]:,}")
+    print(f"RavenPack unique tickers (after CRSP filter): {work['map_ticker'].dropna().nunique():,}")
+
+    print(f"\nApplying firm-day OSA headline dedupe (threshold > {threshold:.2f}, {workers} worker(s))...")
+    osa_stats = {}
+    dedupe = incremental_osa_dedupe_mask if OSA_INCREMENTAL else osa_dedupe_mask
+    keep = dedupe(work, threshold=threshold, workers=workers, verbose=True, stats=osa_stats).to_numpy()
+    n_rows_after_osa = int(keep.sum())
+    n_tickers_after_osa = work.loc[keep, "map_ticker"].dropna().nunique()
+    window_stats = None
+    if OSA_WINDOW_HOURS > 0:
+        window_stats = {}
+        window_keep = window_near_duplicate_mask(
+            work.loc[keep],
+            window=pd.Timedelta(hours=OSA_WINDOW_HOURS),
+            threshold=threshold,
+            stats=window_stats,
+        )
+        keep[np.flatnonzero(keep)[~window_keep.to_numpy()]] = False
+
+    _print_dedupe_report(
+        len(work),
+        n_rows_after_osa,
+        n_tickers_after_osa,
+        osa_stats,
+        threshold=threshold,
+        window_stats=window_stats,
+        n_rows_after_window=int(keep.sum()),
+    )
+
+    keep &= overnight_mask(work)
+    print("\n=== Step 3: After Dropping Intraday News ===")
+    print(f"Rows after dropping intraday: {keep.sum():,}")
+    print(f"Unique tickers after dropping intraday: {work.loc[keep, 'map_ticker'].dropna().nunique():,}")
+
+    kept_rows = pl.Series("_row", work.loc[keep, "_row"].to_numpy()).cast(rp.collect_schema()["_row"])
+    filtered.filter(pl.col("_row").is_in(kept_rows.implode())).drop("_row").sink_parquet(output_file)
+    print(f"\nSaved final cleaned RavenPack parquet to: {output_file}")
+
+
+def main():
+    if CLEAN_ENGINE not in {"pandas", "polars", "streaming"}:
+        raise ValueError(f"CLEAN_ENGINE must be 'pandas', 'polars' or 'streaming', got {CLEAN_ENGINE!r}")
+    if OSA_SWEEP_THRESHOLDS and CLEAN_ENGINE != "pandas":
+        # The sweep reads the similarity edges of the whole filtered file at once
+        raise ValueError(
+            f"OSA_SWEEP_THRESHOLDS runs on the in-memory pandas path only; "
+            f"unset it or use CLEAN_ENGINE=pandas (got {CLEAN_ENGINE!r})"
+        )
+    if not CRSP_TICKERS_FILE.exists():
+        raise FileNotFoundError(f"Missing CRSP tickers file: {CRSP_TICKERS_FILE}")
+    if not RAVENPACK_FILE.exists():
+        raise FileNotFoundError(f"Missing RavenPack file: {RAVENPACK_FILE}")
+
+    if CLEAN_ENGINE == "polars":
+        clean_ravenpack_polars()
+        return
+    if CLEAN_ENGINE == "streaming":
+        clean_ravenpack_out_of_core()
+        return
+
+    print("Loading CRSP tickers...")
+    crsp_ticker_set = _load_crsp_ticker_set()
     n_crsp_tickers = len(crsp_ticker_set)
 
     print("Loading RavenPack...")
-    rp = pd.read_parquet(RAVENPACK_FILE)
+    rp = load_ravenpack(DATA_DIR)
     if "map_ticker" not in rp.columns:
         raise KeyError(
             f"'map_ticker' not found in RavenPack file. Available columns: {list(rp.columns)}"
@@ -113,44 +1056,49 @@ def main():
             f"Cannot OSA-dedupe because RavenPack is missing columns: {sorted(missing)}"
         )
 
-    print("\nApplying firm-day OSA headline dedupe (threshold > 0.60)...")
+    if OSA_SWEEP_THRESHOLDS:
+        run_threshold_sweep(rp_filt, OSA_SWEEP_THRESHOLDS)
+        return
 
-    # Optional speed-up: only apply to firm-days with >1 headline
-    sizes = rp_filt.groupby(["rp_entity_id", "rpa_date_utc"]).size()
-    multi_keys = sizes[sizes > 1].index
+    print(f"\nApplying firm-day OSA headline dedupe (threshold > 0.60, {OSA_DEDUPE_WORKERS} worker(s))...")
 
-    rp_single = rp_filt.merge(
-        pd.DataFrame(index=multi_keys).reset_index(),
-        on=["rp_entity_id", "rpa_date_utc"],
-        how="left",
-        indicator=True,
-    )
-    rp_multi = rp_single[rp_single["_merge"] == "both"].drop(columns=["_merge"])
-    rp_single = rp_single[rp_single["_merge"] == "left_only"].drop(columns=["_merge"])
-
-    # Dedupe only multi-headline firm-days
-    rp_multi_deduped = (
-        rp_multi.groupby(["rp_entity_id", "rpa_date_utc"], group_keys=False)
-               .apply(osa_dedupe_firm_day)
-               .reset_index(drop=True)
-    )
-
-    rp_final = pd.concat([rp_single, rp_multi_deduped], ignore_index=True)
+    osa_stats = {}
+    if OSA_INCREMENTAL:
+        keep = incremental_osa_dedupe_mask(
+            rp_filt, threshold=0.60, workers=OSA_DEDUPE_WORKERS, verbose=True, stats=osa_stats
+        )
+    else:
+        keep = osa_dedupe_mask(
+            rp_filt, threshold=0.60, workers=OSA_DEDUPE_WORKERS, verbose=True, stats=osa_stats
+        )
+    rp_final = rp_filt.loc[keep.to_numpy()]
 
     n_rows_after_osa = len(rp_final)
     n_unique_tickers_after_osa = rp_final["map_ticker"].dropna().nunique()
 
-    print("\n=== Step 2: After OSA Dedupe ===")
-    print(f"Rows before OSA (after CRSP filter): {n_rows_after_crsp:,}")
-    print(f"Rows after OSA dedupe: {n_rows_after_osa:,}")
-    print(f"Unique tickers after OSA dedupe: {n_unique_tickers_after_osa:,}")
+    window_stats = None
+    if OSA_WINDOW_HOURS > 0:
+        window_stats = {}
+        keep = window_near_duplicate_mask(
+            rp_final, window=pd.Timedelta(hours=OSA_WINDOW_HOURS), threshold=0.60, stats=window_stats
+        )
+        rp_final = rp_final.loc[keep.to_numpy()]
+
+    _print_dedupe_report(
+        n_rows_after_crsp,
+        n_rows_after_osa,
+        n_unique_tickers_after_osa,
+        osa_stats,
+        window_stats=window_stats,
+        n_rows_after_window=len(rp_final),
+    )
 
-    # Step 3: Drop intraday (keep overnight only)
+    # Step 3: Drop intraday (keep overnight only; OVERNIGHT_RULE picks 9:00-16:00 or the NYSE session)
     n_rows_before_timing = len(rp_final)
     n_unique_tickers_before_timing = rp_final["map_ticker"].dropna().nunique()
 
-    ts_et = pd.to_datetime(rp_final["timestamp_utc"], utc=True).dt.tz_convert("America/New_York")
-    rp_final = rp_final.loc[(ts_et.dt.hour < 9) | (ts_et.dt.hour >= 16)]
+    rp_final = ensure_et_columns(rp_final)
+    rp_final = rp_final.loc[overnight_mask(rp_final)]
 
     n_rows_after_timing = len(rp_final)
     n_unique_tickers_after_timing = rp_final["map_ticker"].dropna().nunique()
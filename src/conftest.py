@@ -0,0 +1,31 @@
+import os
+
+import pandas as pd
+import pytest
+
+import local_wrds
+import pull_ravenpack
+import wrds_tools
+
+# The openai modules read these at import time; their tests only use a fake client
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("OPENAI_MODEL", "test-model")
+
+
+@pytest.fixture(scope="session")
+def local_db(tmp_path_factory):
+    db_path = tmp_path_factory.mktemp("wrds") / "local_wrds.duckdb"
+    local_wrds.generate_local_wrds(
+        db_path=db_path, n_rows=20_000, start_date="2021-10-01", end_date="2023-06-30"
+    )
+    return db_path
+
+
+@pytest.fixture
+def local_backend(local_db, tmp_path, monkeypatch):
+    monkeypatch.setattr(wrds_tools, "WRDS_BACKEND", "local")
+    monkeypatch.setattr(wrds_tools, "SCHEMA_CACHE_FILE", tmp_path / "schema.json")
+    monkeypatch.setattr(local_wrds, "LOCAL_WRDS_DB", local_db)
+    monkeypatch.setattr(pull_ravenpack, "START_DATE", pd.Timestamp("2021-10-01"))
+    monkeypatch.setattr(pull_ravenpack, "END_DATE", pd.Timestamp("2023-06-30"))
+    return tmp_path
@@ -0,0 +1,336 @@
+"""
+Local, DuckDB-backed stand-in for `wrds.Connection`, plus a generator of
+synthetic WRDS tables to run it against.
+
+The pull scripts only need `raw_sql(query, date_cols=...)` and `close()` from a
+WRDS connection, so `LocalWRDSConnection` runs the same SQL against a DuckDB file
+holding tables with the WRDS names:
+
+- ravenpack_dj.rpa_djpr_equities_YYYY
+- ravenpack_common.wrds_rpa_company_mappings
+- CRSPM.DSF_V2
+- information_schema.columns / information_schema.tables (built into DuckDB)
+
+This lets the pull layer be benchmarked and regression-tested without WRDS
+access. Set `WRDS_BACKEND=local` to make the pull scripts use it (see
+`wrds_tools.connect_wrds`), and build the database with:
+```
+python src/local_wrds.py --LOCAL_WRDS_ROWS=1000000
+```
+"""
+
+from pathlib import Path
+
+import duckdb
+import numpy as np
+import pandas as pd
+from settings import config
+
+DATA_DIR = Path(config("DATA_DIR"))
+START_DATE = config("START_DATE")
+END_DATE = config("END_DATE")
+LOCAL_WRDS_DB = config("LOCAL_WRDS_DB", default=DATA_DIR / "local_wrds.duckdb", cast=Path)
+# Number of synthetic RavenPack rows (across all yearly tables), 10**5 to 10**8
+LOCAL_WRDS_ROWS = config("LOCAL_WRDS_ROWS", default=100_000, cast=int)
+LOCAL_WRDS_SEED = config("LOCAL_WRDS_SEED", default=0, cast=int)
+
+HEADLINE_VERBS = [
+    "Reports",
+    "Announces",
+    "Completes",
+    "Raises",
+    "Cuts",
+    "Launches",
+    "Expands",
+    "Receives",
+    "Prices",
+    "Declares",
+]
+HEADLINE_OBJECTS = [
+    "Fourth Quarter Results",
+    "Quarterly Dividend",
+    "Full-Year Guidance",
+    "Acquisition of Regional Rival",
+    "New Product Line",
+    "Share Repurchase Program",
+    "FDA Approval for Lead Candidate",
+    "Offering of Senior Notes",
+    "Strategic Partnership",
+    "Leadership Transition",
+]
+HEADLINE_SUFFIXES = ["", "", "", " -- Update", " - Correction", ": Sources", " (Revised)"]
+NAME_SUFFIXES = ["Inc.", "Corp.", "Holdings", "Group", "Co.", "Technologies", "Ltd."]
+
+
+class LocalWRDSConnection:
+    """
+    Drop-in replacement for `wrds.Connection` that queries a local DuckDB file.
+
+    Only the parts of the WRDS API used by the pull scripts are provided.
+    Connections are read-only, so several can be open at once (e.g. from
+    `WRDSConnectionPool`).
+    """
+
+    def __init__(self, db_path=None, **kwargs):
+        db_path = Path(db_path or LOCAL_WRDS_DB)
+        if not db_path.exists():
+            raise FileNotFoundError(
+                f"Local WRDS database not found: {db_path}. "
+                f"Create it with `python src/local_wrds.py`."
+            )
+        self.db_path = db_path
+        self.connection = duckdb.connect(str(db_path), read_only=True)
+
+    def raw_sql(
+        self,
+        sql,
+        coerce_float=True,
+        date_cols=None,
+        index_col=None,
+        params=None,
+        chunksize=500000,
+        return_iter=False,
+        dtype=None,
+        dtype_backend="numpy_nullable",
+    ):
+        """Run `sql` and return a DataFrame (or an iterator of them), like `wrds.Connection.raw_sql`."""
+
+        def _finish(df):
+            for col in date_cols or []:
+                df[col] = pd.to_datetime(df[col])
+            if dtype is not None:
+                df = df.astype(dtype)
+            if index_col is not None:
+                df = df.set_index(index_col)
+            return df
+
+        result = self.connection.execute(sql, params)
+        if return_iter and chunksize is not None:
+            reader = result.to_arrow_reader(chunksize)
+            return (_finish(batch.to_pandas()) for batch in reader)
+        return _finish(result.fetch_df())
+
+    def close(self):
+        self.connection.close()
+
+
+def _tickers(n):
+    """`n` distinct 1-4 letter tickers (A, B, ..., Z, AA, AB, ...)."""
+    letters = np.array(list("ABCDEFGHIJKLMNOPQRSTUVWXYZ"))
+    out = []
+    width = 1
+    while len(out) < n:
+        for i in range(min(26**width, n - len(out))):
+            digits = []
+            for _ in range(width):
+                i, r = divmod(i, 26)
+                digits.append(letters[r])
+            out.append("".join(reversed(digits)))
+        width += 1
+    return out
+
+
+def _sql_list(values):
+    return "[" + ", ".join("'" + v.replace("'", "''") + "'" for v in values) + "]"
+
+
+def generate_local_wrds(
+    db_path=LOCAL_WRDS_DB,
+    n_rows=LOCAL_WRDS_ROWS,
+    start_date=START_DATE,
+    end_date=END_DATE,
+    seed=LOCAL_WRDS_SEED,
+):
+    """
+    Build a DuckDB file with synthetic versions of the WRDS tables the pull
+    scripts query.
+
+    Rows are generated inside DuckDB from `range(n_rows)` with hash-based
+    pseudo-random draws, so the output is deterministic for a given `seed`
+    and 10**8 rows never pass through Python. News volume is skewed toward a
+    few heavy-news entities, headlines come from a small set of templates so
+    firm-days contain near-duplicates, and CRSP prices follow a random walk
+    with occasional splits.
+
+    Parameters:
+    - db_path (str or Path): DuckDB file to (re)create.
+    - n_rows (int): Number of RavenPack rows across all yearly tables.
+    - start_date, end_date (str or datetime): Date span of the data.
+    - seed (int): Seed for the hash-based random draws.
+
+    Returns:
+    - dict: Row counts per created table.
+    """
+    db_path = Path(db_path)
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    if db_path.exists():
+        db_path.unlink()
+
+    start = pd.Timestamp(start_date).normalize()
+    end = pd.Timestamp(end_date).normalize()
+    span_seconds = int((end - start).total_seconds()) + 86400
+    n_entities = int(min(max(50, n_rows // 2000), 10_000))
+
+    # Entities / company mappings: small, so built in pandas
+    rng = np.random.default_rng(seed)
+    entity_idx = np.arange(n_entities)
+    tickers = _tickers(n_entities)
+    mappings = pd.DataFrame(
+        {
+            "rp_entity_id": [f"{i:06X}" for i in rng.permutation(16**6)[:n_entities]],
+            "entity_type": np.where(rng.random(n_entities) < 0.95, "COMP", "ORGA"),
+            "ticker": tickers,
+            "entity_name": [
+                f"{t.title()}{['ex', 'on', 'ia', 'ar', 'is'][i % 5]} {NAME_SUFFIXES[i % len(NAME_SUFFIXES)]}"
+                for i, t in zip(entity_idx, tickers)
+            ],
+            "in_crsp": rng.random(n_entities) < 0.8,
+            "entity_idx": entity_idx,
+        }
+    )
+
+    con = duckdb.connect(str(db_path))
+    counts = {}
+    try:
+        con.execute("CREATE SCHEMA ravenpack_common")
+        con.execute("CREATE SCHEMA ravenpack_dj")
+        con.execute("CREATE SCHEMA CRSPM")
+        con.register("mappings_df", mappings)
+        con.execute("CREATE TEMP TABLE entities AS SELECT * FROM mappings_df")
+        con.execute(
+            """
+            CREATE TABLE ravenpack_common.wrds_rpa_company_mappings AS
+            SELECT rp_entity_id, entity_type, ticker, entity_name
+            FROM entities
+            """
+        )
+
+        def u(k):
+            # Uniform [0, 1) draw number k for row i
+            return f"((hash(i, {k}, {seed}) % 1000000) / 1000000.0)"
+
+        con.execute(
+            f"""
+            CREATE TEMP TABLE rp_all AS
+            WITH draws AS (
+              SELECT
+                i,
+                -- squared uniform skews volume toward low entity indexes (heavy-news names)
+                CAST(floor({n_entities} * {u(1)} * {u(1)}) AS BIGINT) AS entity_idx,
+                TIMESTAMP '{start:%Y-%m-%d}' + to_seconds(CAST(hash(i, 2, {seed}) % {span_seconds} AS BIGINT)) AS timestamp_utc,
+                {u(3)} AS u_rel,
+                {u(4)} AS u_days,
+                hash(i, 5, {seed}) AS h_story,
+                {u(6)} AS u_type,
+                {u(7)} AS u_cat
+              FROM range({int(n_rows)}) t(i)
+            )
+            SELECT
+              e.rp_entity_id,
+              CAST(d.timestamp_utc AS DATE) AS rpa_date_utc,
+              d.timestamp_utc,
+              e.entity_name || ' '
+                || {_sql_list(HEADLINE_VERBS)}[1 + CAST(d.h_story % {len(HEADLINE_VERBS)} AS INTEGER)] || ' '
+                || {_sql_list(HEADLINE_OBJECTS)}[1 + CAST((d.h_story // 7) % {len(HEADLINE_OBJECTS)} AS INTEGER)]
+                || {_sql_list(HEADLINE_SUFFIXES)}[1 + CAST(hash(d.i, 8, {seed}) % {len(HEADLINE_SUFFIXES)} AS INTEGER)]
+                AS headline,
+              CASE WHEN d.u_rel < 0.7 THEN 100 ELSE 20 + CAST(d.u_rel * 100 AS INTEGER) % 80 END AS relevance,
+              md5(e.rp_entity_id || '-' || CAST(d.h_story % 500 AS VARCHAR)) AS event_similarity_key,
+              CAST(CASE WHEN d.u_days < 0.7 THEN 365 ELSE floor(d.u_days * 90) END AS DOUBLE) AS event_similarity_days,
+              CASE
+                WHEN d.u_type < 0.45 THEN 'PRESS-RELEASE'
+                WHEN d.u_type < 0.80 THEN 'FULL-ARTICLE'
+                WHEN d.u_type < 0.95 THEN 'HOT-NEWS-FLASH'
+                ELSE 'TABULAR-MATERIAL'
+              END AS news_type,
+              CASE
+                WHEN d.u_cat < 0.60 THEN NULL
+                WHEN d.u_cat < 0.70 THEN 'stock-gain'
+                WHEN d.u_cat < 0.80 THEN 'stock-loss'
+                WHEN d.u_cat < 0.90 THEN 'earnings'
+                ELSE 'product-release'
+              END AS category,
+              CASE
+                WHEN d.u_cat < 0.60 THEN NULL
+                WHEN d.u_cat < 0.80 THEN 'stock-prices'
+                WHEN d.u_cat < 0.90 THEN 'earnings'
+                ELSE 'products-services'
+              END AS "group"
+            FROM draws d
+            JOIN entities e USING (entity_idx)
+            """
+        )
+        for year in range(start.year, end.year + 1):
+            table = f"ravenpack_dj.rpa_djpr_equities_{year}"
+            con.execute(
+                f"""
+                CREATE TABLE {table} AS
+                SELECT * FROM rp_all
+                WHERE year(rpa_date_utc) = {year}
+                ORDER BY timestamp_utc
+                """
+            )
+            counts[table] = con.execute(f"SELECT count(*) FROM {table}").fetchone()[0]
+
+        con.execute(
+            f"""
+            CREATE TABLE CRSPM.DSF_V2 AS
+            WITH days AS (
+              SELECT CAST(d AS DATE) AS dlycaldt
+              FROM range(TIMESTAMP '{start:%Y-%m-%d}', TIMESTAMP '{end:%Y-%m-%d}' + INTERVAL 1 DAY, INTERVAL 1 DAY) t(d)
+              WHERE dayofweek(d) BETWEEN 1 AND 5
+            ),
+            panel AS (
+              SELECT
+                10000 + e.entity_idx AS permno,
+                20000 + e.entity_idx AS permco,
+                e.ticker,
+                e.entity_idx,
+                d.dlycaldt,
+                CAST(((hash(e.entity_idx, d.dlycaldt, 9, {seed}) % 1000000) / 1000000.0 - 0.5) * 0.04 AS DOUBLE) AS ret,
+                CAST(CASE WHEN hash(e.entity_idx, d.dlycaldt, 10, {seed}) % 2500 = 0 THEN 2 ELSE 1 END AS DOUBLE) AS dlyfacprc
+              FROM entities e
+              CROSS JOIN days d
+              WHERE e.in_crsp
+            ),
+            priced AS (
+              SELECT
+                *,
+                CAST((10 + e_base) * exp(sum(ret) OVER (PARTITION BY permno ORDER BY dlycaldt)) AS DOUBLE) AS dlyprc
+              FROM (SELECT *, (hash(entity_idx, 11, {seed}) % 200) AS e_base FROM panel)
+            )
+            SELECT
+              permno,
+              permco,
+              ticker,
+              ['N', 'Q', 'Q', 'A', 'B'][1 + CAST(hash(entity_idx, 12, {seed}) % 5 AS INTEGER)] AS primaryexch,
+              CASE WHEN hash(entity_idx, 13, {seed}) % 20 = 0 THEN 'NW' ELSE 'RW' END AS conditionaltype,
+              CASE WHEN hash(permno, dlycaldt, 14, {seed}) % 200 = 0 THEN 'H' ELSE 'A' END AS tradingstatusflg,
+              dlycaldt,
+              dlyprc * (1000000 + hash(entity_idx, 15, {seed}) % 100000000) AS dlycap,
+              dlyprc,
+              dlyprc / (1 + ret) AS dlyopen,
+              greatest(dlyprc, dlyprc / (1 + ret)) * 1.01 AS dlyhigh,
+              least(dlyprc, dlyprc / (1 + ret)) * 0.99 AS dlylow,
+              dlyprc AS dlyclose,
+              dlyfacprc,
+              ret AS dlyret,
+              ret AS dlyretx
+            FROM priced
+            ORDER BY permno, dlycaldt
+            """
+        )
+        counts["CRSPM.DSF_V2"] = con.execute("SELECT count(*) FROM CRSPM.DSF_V2").fetchone()[0]
+        counts["ravenpack_common.wrds_rpa_company_mappings"] = len(mappings)
+    finally:
+        con.close()
+
+    return counts
+
+
+if __name__ == "__main__":
+    print(f"Generating local WRDS database with {LOCAL_WRDS_ROWS:,} RavenPack rows...")
+    counts = generate_local_wrds()
+    for table, n in counts.items():
+        print(f"{table}: {n:,} rows")
+    print(f"Saved: {LOCAL_WRDS_DB}")
@@ -0,0 +1,178 @@
+"""
+SQLite cache of OpenAI chat completion responses, shared by
+submit_headlines_to_openai (lookups before building the batch, inserts after
+downloading it) and process_openai_responses (cached responses are written in
+the batch output line format, so they merge with fresh ones).
+
+A response is keyed by a hash of (model, system prompt, user message,
+temperature), so the same headline asked the same way is only paid for once
+across reruns, date-range extensions and threshold experiments.
+"""
+
+import hashlib
+import json
+import sqlite3
+import time
+from pathlib import Path
+
+from settings import cast_bool, config
+
+DATA_DIR = Path(config("DATA_DIR"))
+
+# Reuse stored responses instead of sending the same request again
+OPENAI_RESPONSE_CACHE = config("OPENAI_RESPONSE_CACHE", default=True, cast=cast_bool)
+OPENAI_CACHE_MAX_GB = config("OPENAI_CACHE_MAX_GB", default=2, cast=float)
+OPENAI_CACHE_DB = DATA_DIR / "_cache" / "openai_responses.sqlite"
+
+# SQLite's default limit on bound parameters per statement is 999
+_SQL_BATCH = 900
+
+
+def response_cache_key(model: str, system_prompt: str, user_message: str, temperature: float) -> str:
+    """Content hash of one chat completion request.
+
+    Args:
+        model (str): The OpenAI model.
+        system_prompt (str): The system message.
+        user_message (str): The user message.
+        temperature (float): The sampling temperature.
+
+    Returns:
+        str: Hex SHA-256 of the four fields.
+    """
+    payload = json.dumps([model, system_prompt, user_message, temperature], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Responses stored by `response_cache_key`, with least-recently-used eviction
+    once the stored responses exceed `max_gb`.
+
+    Args:
+        path (Path): SQLite database file.
+        max_gb (float): Size budget for the stored response bodies.
+    """
+
+    def __init__(self, path: Path = OPENAI_CACHE_DB, max_gb: float = OPENAI_CACHE_MAX_GB):
+        self.path = Path(path)
+        self.max_bytes = int(max_gb * 1024**3)
+        self.hits = 0
+        self.misses = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                n_bytes INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get_many(self, keys: list[str]) -> dict[str, str]:
+        """Look up many keys at once and mark the hits as recently used.
+
+        Args:
+            keys (list[str]): Cache keys, duplicates allowed.
+
+        Returns:
+            dict[str, str]: The stored response JSON of every key that was found.
+        """
+        unique = list(dict.fromkeys(keys))
+        found: dict[str, str] = {}
+        for i in range(0, len(unique), _SQL_BATCH):
+            chunk = unique[i : i + _SQL_BATCH]
+            marks = ",".join("?" * len(chunk))
+            found.update(
+                self._conn.execute(f"SELECT key, response FROM responses WHERE key IN ({marks})", chunk)
+            )
+        now = time.time()
+        self._conn.executemany("UPDATE responses SET last_used = ? WHERE key = ?", [(now, k) for k in found])
+
+        hits = sum(1 for k in keys if k in found)
+        self.hits += hits
+        self.misses += len(keys) - hits
+        self._bump("hits", hits)
+        self._bump("misses", len(keys) - hits)
+        self._conn.commit()
+        return found
+
+    def put_many(self, items: list[tuple[str, str, str]]) -> None:
+        """Store responses, then evict down to the size budget.
+
+        Args:
+            items (list[tuple[str, str, str]]): (key, model, response JSON) triples.
+        """
+        now = time.time()
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+            [(key, model, response, len(response.encode("utf-8")), now, now) for key, model, response in items],
+        )
+        self._conn.commit()
+        self.evict()
+
+    def evict(self) -> int:
+        """Delete the least recently used responses until the rest fit in the budget.
+
+        Returns:
+            int: Number of responses deleted.
+        """
+        total = self._conn.execute("SELECT COALESCE(SUM(n_bytes), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return 0
+        doomed = []
+        for key, n_bytes in self._conn.execute("SELECT key, n_bytes FROM responses ORDER BY last_used"):
+            if total <= self.max_bytes:
+                break
+            doomed.append((key,))
+            total -= n_bytes
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", doomed)
+        self._conn.commit()
+        print(f"Evicted {len(doomed):,} cached responses to stay under {self.max_bytes / 1024**3:g} GB")
+        return len(doomed)
+
+    def stats(self) -> dict:
+        """Entries and stored bytes, plus this run's and all-time hit counts."""
+        entries, n_bytes = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(n_bytes), 0) FROM responses"
+        ).fetchone()
+        totals = dict(self._conn.execute("SELECT name, value FROM counters"))
+        return {
+            "entries": entries,
+            "bytes": n_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "total_hits": totals.get("hits", 0),
+            "total_misses": totals.get("misses", 0),
+        }
+
+    def report(self) -> None:
+        """Print the hit rate of this run and of the cache's lifetime."""
+        s = self.stats()
+
+        def _rate(hits, misses):
+            return hits / (hits + misses) if hits + misses else 0.0
+
+        print(
+            f"Response cache: {s['hits']:,} hits / {s['misses']:,} misses "
+            f"({_rate(s['hits'], s['misses']):.1%} hit rate this run, "
+            f"{_rate(s['total_hits'], s['total_misses']):.1%} all-time); "
+            f"{s['entries']:,} responses, {s['bytes'] / 1024**2:,.1f} MB"
+        )
+
+    def _bump(self, name: str, value: int) -> None:
+        self._conn.execute(
+            "INSERT INTO counters VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, value),
+        )
+
+    def close(self) -> None:
+        self._conn.close()
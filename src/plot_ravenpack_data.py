@@ -1,28 +1,21 @@
 from pathlib import Path
 
-import pandas as pd
 import plotly.express as px
 
+from pull_ravenpack import load_ravenpack
 from settings import config
+from time_tools import OVERNIGHT_RULE, ensure_et_columns, overnight_mask
 
 DATA_DIR = Path(config("DATA_DIR"))
 OUTPUT_DIR = Path(config("OUTPUT_DIR"))
 
-MARKET_OPEN_HOUR = 9
-MARKET_CLOSE_HOUR = 16
 ROLLING_DAYS = 7  # can make zero or none to not use rolling avg
 
 
-df = pd.read_parquet(DATA_DIR / "RAVENPACK.parquet")
-
-ts = pd.to_datetime(df["timestamp_utc"], errors="coerce")
-if ts.dt.tz is None:
-    ts = ts.dt.tz_localize("UTC")
-ts_et = ts.dt.tz_convert("America/New_York")
-
-df["date_et"] = ts_et.dt.date
-hour_et = ts_et.dt.hour + ts_et.dt.minute / 60.0 + ts_et.dt.second / 3600.0
-df["is_overnight"] = (hour_et < MARKET_OPEN_HOUR) | (hour_et >= MARKET_CLOSE_HOUR)
+# date_et / is_overnight (<9am or >=4pm ET) come from the pull; older files get them here
+df = ensure_et_columns(load_ravenpack(DATA_DIR))
+# Same overnight definition as the clean_ravenpack filter
+df["is_overnight"] = overnight_mask(df)
 
 daily = (
     df.groupby("date_et")["is_overnight"]
@@ -41,10 +34,16 @@ plot_long = (
           .melt(id_vars="date_et", var_name="series", value_name="proportion")
 )
 
-series_name = {
-    "p_overnight": "Overnight (<9am or ≥4pm ET)",
-    "p_intraday": "Intraday (9am–4pm ET)",
-}
+if OVERNIGHT_RULE == "calendar":
+    series_name = {
+        "p_overnight": "Overnight (outside the NYSE regular session)",
+        "p_intraday": "Intraday (NYSE regular session)",
+    }
+else:
+    series_name = {
+        "p_overnight": "Overnight (<9am or ≥4pm ET)",
+        "p_intraday": "Intraday (9am–4pm ET)",
+    }
 plot_long["series"] = plot_long["series"].map(series_name)
 
 avg_overnight = plot_df["p_overnight"].mean()
@@ -15,6 +15,9 @@ OUTPUT_DIR = Path(config("OUTPUT_DIR"))
 
 SCORES_PARQUET = DATA_DIR / "daily_headline_polarity.parquet"
 BATCH_OUTPUT_JSONL = OUTPUT_DIR / "openai_headline_batch_output.jsonl"
+CACHED_OUTPUT_JSONL = OUTPUT_DIR / "openai_headline_cached_output.jsonl"
+ID_ROW_PARQUET = OUTPUT_DIR / "id_to_row_mapping.parquet"
+# Mapping written by older runs of submit_headlines_to_openai
 ID_ROW_JSON = OUTPUT_DIR / "id_to_row_mapping.json"
 
 
@@ -58,56 +61,93 @@ def response_to_score(label: str) -> int:
     return 0
 
 
-def build_scores_df(id_to_row: dict[str, dict[str, str]]) -> pd.DataFrame:
+def iter_response_lines():
+    """Yield the lines of the fresh batch output, then those of the responses
+    that submit_headlines_to_openai answered from the response cache."""
+    with BATCH_OUTPUT_JSONL.open("r", encoding="utf-8") as f:
+        yield from f
+    if CACHED_OUTPUT_JSONL.exists():
+        with CACHED_OUTPUT_JSONL.open("r", encoding="utf-8") as f:
+            yield from f
+
+
+def source_rows_df(id_to_row: dict[str, list[dict[str, str]]]) -> pd.DataFrame:
+    """Flatten the id to row mapping into one row per source headline.
+
+    Args:
+        id_to_row (dict): Mapping of custom_id to the source rows (ticker, date, entity_name)
+            that share its prompt. A single row dict per custom_id (older mapping files) also works.
+
+    Returns:
+        pd.DataFrame: DataFrame with columns [custom_id, ticker, date].
+    """
+    custom_ids, tickers, dates = [], [], []
+    for custom_id, rows in id_to_row.items():
+        for row in [rows] if isinstance(rows, dict) else rows:
+            custom_ids.append(custom_id)
+            tickers.append(row["ticker"])
+            dates.append(row["date"])
+    return pd.DataFrame({"custom_id": custom_ids, "ticker": tickers, "date": dates})
+
+
+def load_source_rows() -> pd.DataFrame:
+    """Load the id to row mapping of the last submission as one row per source headline.
+
+    Returns:
+        pd.DataFrame: DataFrame with columns [custom_id, ticker, date].
+    """
+    if ID_ROW_PARQUET.exists():
+        return pd.read_parquet(ID_ROW_PARQUET, columns=["custom_id", "ticker", "date"])
+    return source_rows_df(json.loads(ID_ROW_JSON.read_text(encoding="utf-8")))
+
+
+def build_scores_df(source_rows: pd.DataFrame) -> pd.DataFrame:
     """Build a DataFrame of daily headline scores per ticker from OpenAI batch output.
-    This method reads the batch output JSONL file, extracts the YES/NO/UNKNOWN labels,
-    converts them to scores, and aggregates to daily ticker-level polarity scores.
+    This method reads the batch output JSONL file (and the cached responses), extracts the YES/NO/UNKNOWN labels,
+    fans each label out to every source row of its prompt, converts them to scores,
+    and aggregates to daily ticker-level polarity scores.
     
     Args:
-        id_to_row (dict): Mapping of custom_id to original row data (ticker, date, entity_name).
+        source_rows (pd.DataFrame): One row per source headline, with columns [custom_id, ticker, date].
         
     Returns:
         pd.DataFrame: DataFrame with columns [ticker, date, n_headlines, score_sum].
     """
-    rows = []
-    with BATCH_OUTPUT_JSONL.open("r", encoding="utf-8") as f:
-        for line in f:
-            obj = json.loads(line)
-            custom_id = obj.get("custom_id")
-            if custom_id not in id_to_row.index:
-                print(f"Custom ID {custom_id} not found in id_to_row mapping")
-                continue
-
-            response = obj.get("response", {})
-            body = response.get("body", {})
-            choices = body.get("choices", [])
-            if not choices:
-                print(f"No choices found in response for Custom ID {custom_id}")
-                continue
-
-            message = choices[0].get("message", {})
-            content = message.get("content", "")
-            if not content:
-                print(f"No content found in message for Custom ID {custom_id}")
-                continue
-
-            label = extract_response(content)
-            if label is None:
-                print(f"Could not extract response from content for Custom ID {custom_id}: {content}")
-                continue
-
-            rows.append(
-                {
-                    "ticker": id_to_row.loc[custom_id]["ticker"],
-                    "date": id_to_row.loc[custom_id]["date"],
-                    "headline_label": label,
-                    "headline_score": response_to_score(label),
-                }
-            )
-
-    scored = pd.DataFrame(rows)
+    known_ids = set(source_rows["custom_id"].unique())
+    labels = {}
+    for line in iter_response_lines():
+        obj = json.loads(line)
+        custom_id = obj.get("custom_id")
+        if custom_id not in known_ids:
+            print(f"Custom ID {custom_id} not found in id_to_row mapping")
+            continue
+
+        response = obj.get("response", {})
+        body = response.get("body", {})
+        choices = body.get("choices", [])
+        if not choices:
+            print(f"No choices found in response for Custom ID {custom_id}")
+            continue
+
+        message = choices[0].get("message", {})
+        content = message.get("content", "")
+        if not content:
+            print(f"No content found in message for Custom ID {custom_id}")
+            continue
+
+        label = extract_response(content)
+        if label is None:
+            print(f"Could not extract response from content for Custom ID {custom_id}: {content}")
+            continue
+
+        labels[custom_id] = label
+
+    labels = pd.Series(labels, name="headline_label", dtype=object)
+    scored = source_rows.merge(labels, left_on="custom_id", right_index=True)
     if scored.empty:
         raise ValueError("No parseable batch outputs found. Check output/error jsonl files.")
+    scored["headline_score"] = scored["headline_label"].map(response_to_score)
+    print(f"Scored {len(scored):,} headlines from {len(labels):,} responses")
 
     scored["date"] = pd.to_datetime(scored["date"]).dt.date
 
@@ -130,8 +170,7 @@ def build_scores_df(id_to_row: dict[str, dict[str, str]]) -> pd.DataFrame:
 
 def main():
     """Main method to drive processing of data"""
-    id_to_row = pd.read_json(ID_ROW_JSON, orient="index")
-    scores_df = build_scores_df(id_to_row)
+    scores_df = build_scores_df(load_source_rows())
     scores_df.to_parquet(SCORES_PARQUET, index=False)
     print(f"Saved daily headline scores to {SCORES_PARQUET}")    
     
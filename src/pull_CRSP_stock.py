@@ -3,38 +3,79 @@ Function(s) to pull Daily Stock data from CRSP via WRDS.
 
 """
 
+import hashlib
+import json
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
+from itertools import pairwise
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
-import wrds
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
 from settings import config
+from wrds_tools import (
+    PULL_CHUNK_ROWS,
+    STREAMING_PULL,
+    WRDSConnectionPool,
+    connect_wrds,
+    is_query_cached,
+    stream_query_to_parquet,
+    upload_temp_int_table,
+)
 
 DATA_DIR = Path(config("DATA_DIR"))
 WRDS_USERNAME = config("WRDS_USERNAME")
 START_DATE = config("START_DATE")
 END_DATE = config("END_DATE")
+## Concurrent month-window queries; > 1 writes a year=/month= partitioned dataset
+CRSP_PULL_WORKERS = config("CRSP_PULL_WORKERS", default=1, cast=int)
 
-def pull_crsp_daily_file(
-    start_date=START_DATE, end_date=END_DATE, permnos=None, wrds_username=WRDS_USERNAME
-):
-    """
-    Pulls daily CRSP stock data from a specified start date to end date.
-    Optionally, can filter by a list of permnos.
+MANIFEST_NAME = "_manifest.json"
+## Parquet schema metadata key recording the window / universe a single-file pull covers
+COVERAGE_KEY = b"crsp_coverage"
+## Dtype of the cumulative factor / adjusted price columns; float32 halves their size
+CRSP_ADJ_DTYPE = np.dtype(config("CRSP_ADJ_DTYPE", default="float64", cast=str))
+## Permno lists longer than this are loaded into a temp table instead of an IN list
+PERMNO_TEMP_TABLE_MIN = 500
 
-    Parameters:
-    - start_date (str or datetime): The start date for the data pull (inclusive).
-    - end_date (str or datetime): The end date for the data pull (inclusive).
-    - permnos (list of int): A list of permnos to filter the data. If None, pulls all stocks.
-    - wrds_username (str): The WRDS username for authentication, pulled from .env file by default
+PRICE_COLS = ["dlyprc", "dlyopen", "dlyhigh", "dlylow", "dlyclose"]
+CRSP_DAILY_SCHEMA = pa.schema(
+    [
+        ("permno", pa.int64()),
+        ("permco", pa.int64()),
+        ("ticker", pa.string()),
+        ("primaryexch", pa.string()),
+        ("dlycaldt", pa.timestamp("ns")),
+        ("dlycap", pa.float64()),
+        ("dlyprc", pa.float64()),
+        ("dlyopen", pa.float64()),
+        ("dlyhigh", pa.float64()),
+        ("dlylow", pa.float64()),
+        ("dlyclose", pa.float64()),
+        ("dlyfacprc", pa.float64()),
+        ("dlyret", pa.float64()),
+        ("dlyretx", pa.float64()),
+        ("daily_cum_price_adj_factor", pa.from_numpy_dtype(CRSP_ADJ_DTYPE)),
+        *[(f"{c}_adj", pa.from_numpy_dtype(CRSP_ADJ_DTYPE)) for c in PRICE_COLS],
+    ]
+)
 
-    Returns:
-    - pandas.DataFrame: A DataFrame containing the pulled CRSP daily stock data.
-    """
 
+def _crsp_daily_query(start_date, end_date, permnos=None, permno_table=None, order_by=False, verbose=True):
     start_date = start_date.date() if isinstance(start_date, datetime) else start_date
     end_date = end_date.date() if isinstance(end_date, datetime) else end_date
-    permno_filter = f"AND PERMNO IN ({', '.join(map(str, permnos))})" if permnos else ""
+    if permno_table:
+        permno_filter = f"AND PERMNO IN (SELECT permno FROM {permno_table})"
+    elif permnos:
+        permno_filter = f"AND PERMNO IN ({', '.join(map(str, permnos))})"
+    else:
+        permno_filter = ""
+    order_clause = "ORDER BY permno, dlycaldt" if order_by else ""
 
     query = f"""
     SELECT
@@ -61,44 +102,504 @@ def pull_crsp_daily_file(
         dlycaldt >= '{start_date}' AND
         dlycaldt <= '{end_date}'
         {permno_filter}
-    ) ; 
+    )
+    {order_clause} ; 
+    """
+
+    if verbose:
+        print(f"Start date: {start_date}, End date: {end_date}")
+        print(f"Permnos filter: {permno_filter if permnos else 'None'}")
+    return query
+
+
+def _coverage(start_date, end_date, permnos=None):
+    return {
+        "start": str(pd.Timestamp(start_date).date()),
+        "end": str(pd.Timestamp(end_date).date()),
+        "permnos": _permnos_key(permnos),
+    }
+
+
+def crsp_daily_coverage(data_dir=DATA_DIR):
+    """
+    Return the {"start", "end", "permnos"} window recorded with the saved CRSP
+    daily data, or None if there is no data or it predates coverage tracking.
+    `permnos` is None for a full-universe pull.
+    """
+    path = Path(data_dir) / "CRSP_stock_daily.parquet"
+    if path.is_dir():
+        manifest = _read_manifest(path)
+        if "start" not in manifest:
+            return None
+        return {k: manifest.get(k) for k in ("start", "end", "permnos")}
+    if not path.exists():
+        return None
+    metadata = pq.read_schema(path).metadata or {}
+    if COVERAGE_KEY not in metadata:
+        return None
+    return json.loads(metadata[COVERAGE_KEY])
+
+
+def save_crsp_daily_file(df, path, start_date=START_DATE, end_date=END_DATE, permnos=None):
+    """Write an in-memory CRSP daily pull to parquet, recording the window it covers."""
+    path = Path(path)
+    if path.is_dir():
+        shutil.rmtree(path)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    metadata = {**(table.schema.metadata or {}), COVERAGE_KEY: json.dumps(_coverage(start_date, end_date, permnos))}
+    pq.write_table(table.replace_schema_metadata(metadata), path)
+
+
+def _segment_cumprod(values, starts):
+    """
+    Cumulative product of `values` restarting at each index in `starts`.
+    NaN factors are skipped like `Series.cumprod()`: they stay NaN in the
+    output and do not reset the running product.
+    """
+    missing = np.isnan(values)
+    out = np.where(missing, 1.0, values)
+    bounds = np.append(starts, len(out))
+    for lo, hi in pairwise(bounds):
+        np.multiply.accumulate(out[lo:hi], out=out[lo:hi])
+    out[missing] = np.nan
+    return out
+
+
+def add_adjusted_prices(df, initial_factors=None, dtype=CRSP_ADJ_DTYPE):
+    """
+    Add the cumulative price adjustment factor and adjusted OHLC columns.
+
+    Rows are sorted once by (permno, dlycaldt) and the cumulative product of
+    `dlyfacprc` restarts at every permno. The adjusted columns are written
+    straight into `dtype` buffers (use np.float32 to halve their memory).
+
+    Parameters:
+    - df (pandas.DataFrame): CRSP daily rows with permno, dlycaldt, dlyfacprc
+      and the raw price columns.
+    - initial_factors (dict): Optional permno -> cumulative factor reached
+      before `df`, so consecutive date windows or chunks can be adjusted one at
+      a time. Permnos not in the dict start at 1.
+    - dtype: Floating dtype of the factor and adjusted price columns.
+
+    Returns:
+    - pandas.DataFrame: `df` sorted by (permno, dlycaldt) with the adjusted columns.
+    """
+    permno = df["permno"].to_numpy()
+    dates = df["dlycaldt"].to_numpy()
+    same = permno[1:] == permno[:-1]
+    if not ((permno[1:] > permno[:-1]) | (same & (dates[1:] >= dates[:-1]))).all():
+        order = np.lexsort((dates, permno))
+        df = df.take(order)
+        permno = permno[order]
+        same = permno[1:] == permno[:-1]
+    df = df.reset_index(drop=True)
+
+    starts = np.flatnonzero(np.r_[True, ~same]) if len(df) else np.array([], dtype=np.intp)
+    factor = _segment_cumprod(df["dlyfacprc"].to_numpy(dtype=np.float64, na_value=np.nan), starts)
+    if initial_factors:
+        first = pd.Series(permno[starts]).map(initial_factors).fillna(1.0).to_numpy()
+        factor *= np.repeat(first, np.diff(np.append(starts, len(df))))
+
+    df["daily_cum_price_adj_factor"] = factor.astype(dtype, copy=False)
+    for col in PRICE_COLS:
+        adjusted = np.empty(len(df), dtype=dtype)
+        np.multiply(df[col].to_numpy(dtype=np.float64, na_value=np.nan), factor, out=adjusted, casting="same_kind")
+        df[f"{col}_adj"] = adjusted
+    return df
+
+
+def last_adjustment_factors(df):
+    """permno -> last cumulative factor in an adjusted frame, for `initial_factors`."""
+    if not len(df):
+        return {}
+    last = df.groupby("permno", sort=False)["daily_cum_price_adj_factor"].last()
+    return last.dropna().to_dict()
+
+
+def pull_crsp_daily_file(
+    start_date=START_DATE, end_date=END_DATE, permnos=None, wrds_username=WRDS_USERNAME
+):
+    """
+    Pulls daily CRSP stock data from a specified start date to end date.
+    Optionally, can filter by a list of permnos.
+
+    Parameters:
+    - start_date (str or datetime): The start date for the data pull (inclusive).
+    - end_date (str or datetime): The end date for the data pull (inclusive).
+    - permnos (list of int): A list of permnos to filter the data. If None, pulls all stocks.
+    - wrds_username (str): The WRDS username for authentication, pulled from .env file by default
+
+    Returns:
+    - pandas.DataFrame: A DataFrame containing the pulled CRSP daily stock data.
     """
 
     print("Pulling CRSP daily data from WRDS...")
-    print(f"Start date: {start_date}, End date: {end_date}")
-    print(f"Permnos filter: {permno_filter if permnos else 'None'}")
+    query = _crsp_daily_query(start_date, end_date, permnos)
 
-    db = wrds.Connection(wrds_username=wrds_username)
+    db = connect_wrds(wrds_username=wrds_username)
     df = db.raw_sql(query, date_cols=["dlycaldt"])
-    
-    df['daily_cum_price_adj_factor'] = df['dlyfacprc'].cumprod()
-    df['dlyprc_adj'] = df['dlyprc'] * df['daily_cum_price_adj_factor']
-    df['dlyopen_adj'] = df['dlyopen'] * df['daily_cum_price_adj_factor']
-    df['dlyhigh_adj'] = df['dlyhigh'] * df['daily_cum_price_adj_factor']
-    df['dlylow_adj'] = df['dlylow'] * df['daily_cum_price_adj_factor']
-    df['dlyclose_adj'] = df['dlyclose'] * df['daily_cum_price_adj_factor']
-    
+    df = add_adjusted_prices(df)
+
     db.close()
     return df
 
 
-def load_crsp_daily_file(data_dir=DATA_DIR):
+def pull_crsp_daily_file_streaming(
+    path=DATA_DIR / "CRSP_stock_daily.parquet",
+    start_date=START_DATE,
+    end_date=END_DATE,
+    permnos=None,
+    chunk_rows=PULL_CHUNK_ROWS,
+    wrds_username=WRDS_USERNAME,
+    on_chunk=None,
+):
+    """
+    Streams daily CRSP stock data straight to a parquet file.
+
+    Runs the same query as `pull_crsp_daily_file()`, ordered by (permno,
+    dlycaldt), on a server-side cursor, adjusts prices chunk by chunk and
+    appends each chunk as a row group, so memory stays bounded by `chunk_rows`
+    even for the full universe.
+
+    Parameters:
+    - path (str or Path): Destination parquet file.
+    - start_date (str or datetime): The start date for the data pull (inclusive).
+    - end_date (str or datetime): The end date for the data pull (inclusive).
+    - permnos (list of int): A list of permnos to filter the data. If None, pulls all stocks.
+    - chunk_rows (int): Rows fetched per chunk / written per row group.
+    - wrds_username (str): The WRDS username for authentication, pulled from .env file by default
+    - on_chunk (callable): Optional function called with each adjusted chunk,
+      e.g. to build other outputs from the same result stream.
+
+    Returns:
+    - dict: Row count, rows/sec and peak RSS of the pull.
+    """
+
+    print("Streaming CRSP daily data from WRDS...")
+    query = _crsp_daily_query(start_date, end_date, permnos, order_by=True)
+
+    # Rows arrive ordered by (permno, dlycaldt), so only the last permno of a
+    # chunk can continue into the next one
+    carry = {}
+
+    def _adjust(chunk):
+        chunk = add_adjusted_prices(chunk, initial_factors=carry)
+        if len(chunk):
+            # NaN factors do not reset the running product, so a permno whose
+            # rows in this chunk are all NaN keeps the factor it came in with
+            factors = {**carry, **last_adjustment_factors(chunk)}
+            last_permno = chunk["permno"].iloc[-1]
+            carry.clear()
+            if last_permno in factors:
+                carry[last_permno] = factors[last_permno]
+        if on_chunk is not None:
+            on_chunk(chunk)
+        return chunk
+
+    if Path(path).is_dir():
+        # Replacing a dataset written by pull_crsp_daily_sharded()
+        shutil.rmtree(path)
+    db = connect_wrds(wrds_username=wrds_username)
+    try:
+        return stream_query_to_parquet(
+            db,
+            query,
+            path,
+            schema=CRSP_DAILY_SCHEMA.with_metadata(
+                {COVERAGE_KEY: json.dumps(_coverage(start_date, end_date, permnos))}
+            ),
+            chunk_rows=chunk_rows,
+            date_cols=["dlycaldt"],
+            transform=_adjust,
+            label="crsp daily",
+        )
+    finally:
+        db.close()
+
+
+def _month_windows(start_date, end_date):
+    """Split start_date..end_date (inclusive) into (year, month, start, end) windows."""
+    start = pd.Timestamp(start_date).normalize()
+    end = pd.Timestamp(end_date).normalize()
+    windows = []
+    for month_start in pd.date_range(start.replace(day=1), end, freq="MS"):
+        month_end = month_start + pd.offsets.MonthEnd(0)
+        windows.append(
+            (
+                month_start.year,
+                month_start.month,
+                max(month_start, start).date(),
+                min(month_end, end).date(),
+            )
+        )
+    return windows
+
+
+def _month_file(path, year, month):
+    return Path(path) / f"year={year}" / f"month={month}" / "part-0.parquet"
+
+
+def _permnos_key(permnos):
+    if not permnos:
+        return None
+    joined = ",".join(map(str, sorted({int(p) for p in permnos})))
+    return hashlib.sha256(joined.encode("utf-8")).hexdigest()[:12]
+
+
+def _read_manifest(path):
+    manifest_path = Path(path) / MANIFEST_NAME
+    if not manifest_path.exists():
+        return {}
+    return json.loads(manifest_path.read_text(encoding="utf-8"))
+
+
+def _write_manifest(path, manifest):
+    (Path(path) / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+
+
+def _write_month(path, year, month, df):
+    out = _month_file(path, year, month)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out.with_name(f"_{out.name}.tmp")
+    df.to_parquet(tmp, index=False)
+    os.replace(tmp, out)
+
+
+def pull_crsp_daily_sharded(
+    data_dir=DATA_DIR,
+    start_date=START_DATE,
+    end_date=END_DATE,
+    permnos=None,
+    max_workers=CRSP_PULL_WORKERS,
+    retries=1,
+    wrds_username=WRDS_USERNAME,
+):
+    """
+    Pulls daily CRSP stock data one calendar month at a time, running the month
+    queries concurrently over a pool of WRDS connections, and writes a hive
+    partitioned dataset at `data_dir/CRSP_stock_daily.parquet/year=YYYY/month=M/`.
+
+    Permno lists longer than PERMNO_TEMP_TABLE_MIN are loaded once per pooled
+    connection into a temp table and joined, rather than spelled out as an
+    `IN (...)` literal. Months already recorded in the manifest for the same
+    window and permnos are skipped on rerun. The cumulative price adjustment is
+    applied after all months are in, walking the partitions in date order and
+    carrying each permno's factor across months, so the adjusted columns match
+    `pull_crsp_daily_file()`.
+
+    Parameters:
+    - data_dir (str or Path): Directory holding CRSP_stock_daily.parquet.
+    - start_date (str or datetime): The start date for the data pull (inclusive).
+    - end_date (str or datetime): The end date for the data pull (inclusive).
+    - permnos (list of int): A list of permnos to filter the data. If None, pulls all stocks.
+    - max_workers (int): Number of concurrent queries / pooled connections.
+    - retries (int): Extra attempts per month, each on a fresh connection.
+    - wrds_username (str): The WRDS username for authentication, pulled from .env file by default
+
+    Returns:
+    - Path: The dataset directory.
+    """
+    windows = _month_windows(start_date, end_date)
+    start = str(windows[0][2]) if windows else str(pd.Timestamp(start_date).date())
+    end = str(windows[-1][3]) if windows else str(pd.Timestamp(end_date).date())
+    permnos_key = _permnos_key(permnos)
+
+    path = Path(data_dir) / "CRSP_stock_daily.parquet"
+    if path.is_file():
+        path.unlink()
+    manifest = _read_manifest(path) if path.is_dir() else {}
+    if (
+        manifest.get("start") != start
+        or manifest.get("end") != end
+        or manifest.get("permnos") != permnos_key
+    ):
+        # Partitions from a different window or universe are stale
+        if path.is_dir():
+            shutil.rmtree(path)
+        manifest = {"start": start, "end": end, "permnos": permnos_key, "months": {}}
+    path.mkdir(parents=True, exist_ok=True)
+
+    todo = [
+        w
+        for w in windows
+        if f"{w[0]}-{w[1]:02d}" not in manifest["months"]
+        or not _month_file(path, w[0], w[1]).exists()
+    ]
+    if len(todo) < len(windows):
+        print(f"{len(windows) - len(todo)} month(s) already pulled for this window, skipping", flush=True)
+
+    permno_table = None
+    if permnos and len(permnos) > PERMNO_TEMP_TABLE_MIN:
+        permno_table = f"_crsp_permnos_{permnos_key}"
+
+    if todo:
+        print(
+            f"Pulling CRSP daily data for {len(todo)} month(s) with {max_workers} WRDS connection(s)...",
+            flush=True,
+        )
+        with WRDSConnectionPool(size=max_workers, wrds_username=wrds_username) as pool:
+
+            def _pull_month(window):
+                year, month, month_start, month_end = window
+                for attempt in range(retries + 1):
+                    try:
+                        with pool.connection() as db:
+                            query = _crsp_daily_query(
+                                month_start,
+                                month_end,
+                                permnos=permnos,
+                                permno_table=permno_table,
+                                order_by=True,
+                                verbose=False,
+                            )
+                            # A cached month needs no temp table, and uploading one would log in
+                            if permno_table and not is_query_cached(db, query, date_cols=["dlycaldt"]):
+                                upload_temp_int_table(db, permno_table, "permno", permnos)
+                            df = db.raw_sql(query, date_cols=["dlycaldt"])
+                        _write_month(path, year, month, df)
+                        return year, month, len(df)
+                    except Exception as e:
+                        if attempt == retries:
+                            raise
+                        print(f"Month {year}-{month:02d} failed ({e!r}); retrying on a new connection...", flush=True)
+
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = [executor.submit(_pull_month, w) for w in todo]
+                for future in as_completed(futures):
+                    year, month, n_rows = future.result()
+                    manifest["months"][f"{year}-{month:02d}"] = n_rows
+                    _write_manifest(path, manifest)
+                    print(f"Saved year={year}/month={month}: {n_rows:,} rows", flush=True)
+
+    _adjust_partitions(path, windows)
+    return path
+
+
+def _adjust_partitions(path, windows, dtype=CRSP_ADJ_DTYPE):
+    """
+    (Re)compute the adjusted price columns across month partitions in date order,
+    carrying each permno's cumulative factor from one month into the next.
+    Recomputes from the raw columns, so rerunning after a partial pull is safe.
+    """
+    factors = {}
+    for year, month, _, _ in windows:
+        out = _month_file(path, year, month)
+        if not out.exists():
+            continue
+        df = add_adjusted_prices(pd.read_parquet(out), initial_factors=factors, dtype=dtype)
+        factors.update(last_adjustment_factors(df))
+        _write_month(path, year, month, df)
+
+
+def adjust_crsp_daily_file(data_dir=DATA_DIR, dtype=CRSP_ADJ_DTYPE):
     """
-    Method to load the CRSP daily stock data from a parquet file.
+    Recompute the per-permno adjustment columns of already-saved CRSP daily
+    data in place, without re-pulling from WRDS. Works on both the single
+    parquet file and the year=/month= dataset.
+
+    Parameters:
+    - data_dir (str or Path): Directory holding CRSP_stock_daily.parquet.
+    - dtype: Floating dtype of the factor and adjusted price columns.
+
+    Returns:
+    - Path: The adjusted file or dataset directory.
+    """
+    path = Path(data_dir) / "CRSP_stock_daily.parquet"
+    if path.is_dir():
+        manifest = _read_manifest(path)
+        _adjust_partitions(path, _month_windows(manifest["start"], manifest["end"]), dtype=dtype)
+        return path
+
+    table = pq.read_table(path)
+    coverage = (table.schema.metadata or {}).get(COVERAGE_KEY)
+    df = add_adjusted_prices(table.to_pandas(), dtype=dtype)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if coverage is not None:
+        table = table.replace_schema_metadata({**table.schema.metadata, COVERAGE_KEY: coverage})
+    tmp = path.with_name(f"_{path.name}.tmp")
+    pq.write_table(table, tmp)
+    os.replace(tmp, path)
+    return path
+
+
+def _month_filter(start_date=None, end_date=None):
+    """Partition filter on year/month so only months in the range are read."""
+    expr = None
+    if start_date is not None:
+        start = pd.Timestamp(start_date)
+        expr = (ds.field("year") > start.year) | (
+            (ds.field("year") == start.year) & (ds.field("month") >= start.month)
+        )
+    if end_date is not None:
+        end = pd.Timestamp(end_date)
+        upper = (ds.field("year") < end.year) | (
+            (ds.field("year") == end.year) & (ds.field("month") <= end.month)
+        )
+        expr = upper if expr is None else expr & upper
+    return expr
+
+
+def load_crsp_daily_file(data_dir=DATA_DIR, start_date=None, end_date=None, permnos=None, columns=None):
+    """
+    Method to load the CRSP daily stock data from a parquet file, or from the
+    year=/month= partitioned dataset written by `pull_crsp_daily_sharded()`.
     
     Parameters:
     - data_dir (str or Path): The directory where the CRSP daily stock parquet file is located.
+    - start_date (str or datetime): Optional first dlycaldt to keep (inclusive).
+    - end_date (str or datetime): Optional last dlycaldt to keep (inclusive).
+    - permnos (list of int): Optional permnos to keep.
+    - columns (list of str): Optional subset of columns to read.
 
     Returns:
     - pandas.DataFrame: A DataFrame containing the CRSP daily stock data loaded from the parquet file.
     """
     path = Path(data_dir) / "CRSP_stock_daily.parquet"
-    df = pd.read_parquet(path)
-    return df
+
+    row_filter = None
+    if start_date is not None:
+        row_filter = ds.field("dlycaldt") >= pd.Timestamp(start_date)
+    if end_date is not None:
+        upper = ds.field("dlycaldt") <= pd.Timestamp(end_date)
+        row_filter = upper if row_filter is None else row_filter & upper
+    if permnos is not None:
+        in_permnos = ds.field("permno").isin([int(p) for p in permnos])
+        row_filter = in_permnos if row_filter is None else row_filter & in_permnos
+
+    if path.is_dir():
+        dataset = ds.dataset(path, format="parquet", partitioning="hive", exclude_invalid_files=True)
+        partition_filter = _month_filter(start_date, end_date)
+        if partition_filter is not None:
+            row_filter = partition_filter if row_filter is None else partition_filter & row_filter
+        if columns is None:
+            columns = [c for c in dataset.schema.names if c not in ("year", "month")]
+        table = dataset.to_table(columns=columns, filter=row_filter)
+        return table.to_pandas()
+
+    if row_filter is None:
+        return pd.read_parquet(path, columns=columns)
+    table = ds.dataset(path, format="parquet").to_table(columns=columns, filter=row_filter)
+    return table.to_pandas()
 
 
 if __name__ == "__main__":
-    # hardcoding these three permnos for now (HW3), but will want to pull all stocks for replication
-    crsp_df = pull_crsp_daily_file(permnos=[10107, 93436, 14593])
+    from pull_crsp_unique_tickers import (
+        pull_crsp_daily_and_tickers,
+        write_crsp_unique_tickers,
+    )
+
     crsp_path = Path(DATA_DIR) / "CRSP_stock_daily.parquet"
-    crsp_df.to_parquet(crsp_path)
+    if CRSP_PULL_WORKERS > 1:
+        # Month windows run concurrently, so pull the full universe and
+        # derive the ticker universe from it locally
+        pull_crsp_daily_sharded()
+        write_crsp_unique_tickers()
+    elif STREAMING_PULL:
+        # Memory is bounded by the chunk size, so pull the full universe and
+        # collect the ticker universe from the same stream
+        pull_crsp_daily_and_tickers()
+    else:
+        # hardcoding these three permnos for now (HW3), but will want to pull all stocks for replication
+        permnos = [10107, 93436, 14593]
+        crsp_df = pull_crsp_daily_file(permnos=permnos)
+        save_crsp_daily_file(crsp_df, crsp_path, permnos=permnos)
@@ -2,8 +2,15 @@ from datetime import datetime
 from pathlib import Path
 
 import pandas as pd
-import wrds
+from pull_CRSP_stock import (
+    crsp_daily_coverage,
+    load_crsp_daily_file,
+    pull_crsp_daily_file_streaming,
+)
+from pull_CRSP_stock import END_DATE as DAILY_END_DATE
+from pull_CRSP_stock import START_DATE as DAILY_START_DATE
 from settings import config
+from wrds_tools import PULL_CHUNK_ROWS, connect_wrds
 
 DATA_DIR = Path(config("DATA_DIR"))
 WRDS_USERNAME = config("WRDS_USERNAME")
@@ -47,22 +54,133 @@ def pull_crsp_unique_tickers(
     print("Pulling unique CRSP tickers from WRDS...")
     print(f"Start date: {start_date}, End date: {end_date}")
 
-    db = wrds.Connection(wrds_username=wrds_username)
+    db = connect_wrds(wrds_username=wrds_username)
     df = db.raw_sql(query)
 
     db.close()
 
-    df["ticker"] = df["ticker"].str.strip().str.upper()
+    return _clean_tickers(df["ticker"])
 
-    return df
 
+def _clean_tickers(tickers):
+    tickers = pd.Series(tickers, dtype="object").dropna().str.strip().str.upper()
+    return pd.DataFrame({"ticker": tickers.drop_duplicates().sort_values().reset_index(drop=True)})
 
-if __name__ == "__main__":
-    tickers_df = pull_crsp_unique_tickers()
-    path = Path(DATA_DIR) / "CRSP_unique_tickers.parquet"
+
+def _covers(coverage, start_date, end_date):
+    return (
+        coverage is not None
+        and coverage.get("permnos") is None
+        and coverage["start"] <= str(pd.Timestamp(start_date).date())
+        and coverage["end"] >= str(pd.Timestamp(end_date).date())
+    )
+
+
+def derive_crsp_unique_tickers(data_dir=DATA_DIR, start_date=START_DATE, end_date=END_DATE):
+    """
+    Derive the unique ticker universe from the saved CRSP daily data, without
+    touching WRDS. The daily pull applies the same exchange, conditional-type
+    and trading-status filters as `pull_crsp_unique_tickers()`.
+
+    Parameters:
+    - data_dir (str or Path): Directory holding CRSP_stock_daily.parquet.
+    - start_date (str or datetime): Start date (inclusive)
+    - end_date (str or datetime): End date (inclusive)
+
+    Returns:
+    - pandas.DataFrame with unique tickers, or None if the saved daily data is
+      missing, filtered to a permno list, or does not cover the window.
+    """
+    if not _covers(crsp_daily_coverage(data_dir), start_date, end_date):
+        return None
+    df = load_crsp_daily_file(
+        data_dir, start_date=start_date, end_date=end_date, columns=["ticker"]
+    )
+    return _clean_tickers(df["ticker"])
+
+
+def pull_crsp_daily_and_tickers(
+    data_dir=DATA_DIR,
+    daily_start_date=DAILY_START_DATE,
+    daily_end_date=DAILY_END_DATE,
+    start_date=START_DATE,
+    end_date=END_DATE,
+    chunk_rows=PULL_CHUNK_ROWS,
+    wrds_username=WRDS_USERNAME,
+):
+    """
+    Stream the full-universe CRSP daily pull to CRSP_stock_daily.parquet and
+    write CRSP_unique_tickers.parquet from the same result stream, so DSF_V2 is
+    scanned once for both.
+
+    Parameters:
+    - data_dir (str or Path): Directory for both parquet files.
+    - daily_start_date (str or datetime): Start of the daily pull (inclusive).
+    - daily_end_date (str or datetime): End of the daily pull (inclusive).
+    - start_date (str or datetime): Start of the ticker window (inclusive).
+    - end_date (str or datetime): End of the ticker window (inclusive).
+    - chunk_rows (int): Rows fetched per chunk / written per row group.
+    - wrds_username (str): WRDS username
+
+    Returns:
+    - pandas.DataFrame with unique tickers
+    """
+    daily_coverage = {
+        "start": str(pd.Timestamp(daily_start_date).date()),
+        "end": str(pd.Timestamp(daily_end_date).date()),
+        "permnos": None,
+    }
+    if not _covers(daily_coverage, start_date, end_date):
+        raise ValueError(
+            f"Ticker window {start_date}..{end_date} is not inside the daily pull "
+            f"window {daily_start_date}..{daily_end_date}"
+        )
+
+    start = pd.Timestamp(start_date)
+    end = pd.Timestamp(end_date)
+    seen = set()
+
+    def _collect(chunk):
+        in_window = chunk["dlycaldt"].between(start, end)
+        seen.update(chunk.loc[in_window, "ticker"].dropna().unique())
+
+    pull_crsp_daily_file_streaming(
+        Path(data_dir) / "CRSP_stock_daily.parquet",
+        start_date=daily_start_date,
+        end_date=daily_end_date,
+        chunk_rows=chunk_rows,
+        wrds_username=wrds_username,
+        on_chunk=_collect,
+    )
+    tickers_df = _clean_tickers(list(seen))
+    save_crsp_unique_tickers(tickers_df, data_dir)
+    return tickers_df
+
+
+def write_crsp_unique_tickers(data_dir=DATA_DIR, start_date=START_DATE, end_date=END_DATE):
+    """
+    Save the ticker universe, deriving it from the local CRSP daily data when
+    that covers the window and querying WRDS otherwise.
+    """
+    tickers_df = derive_crsp_unique_tickers(data_dir, start_date, end_date)
+    if tickers_df is None:
+        tickers_df = pull_crsp_unique_tickers(start_date, end_date)
+    else:
+        print("Derived unique CRSP tickers from the saved daily data", flush=True)
+    save_crsp_unique_tickers(tickers_df, data_dir)
+    return tickers_df
+
+
+def save_crsp_unique_tickers(tickers_df, data_dir=DATA_DIR):
+    path = Path(data_dir) / "CRSP_unique_tickers.parquet"
     tickers_df.to_parquet(path)
 
+
 def load_crsp_unique_tickers(data_dir=DATA_DIR):
     path = Path(data_dir) / "CRSP_unique_tickers.parquet"
     df = pd.read_parquet(path)
-    return df
\ No newline at end of file
+    return df
+
+
+if __name__ == "__main__":
+    write_crsp_unique_tickers()
\ No newline at end of file
@@ -1,52 +1,99 @@
 # src/pull_ravenpack.py
-from datetime import datetime
+import json
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
 from pathlib import Path
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
 import wrds
 
-from settings import config
+from pull_crsp_unique_tickers import load_crsp_unique_tickers
+from settings import cast_bool, config
+from time_tools import ET_SCHEMA_FIELDS, add_et_columns, ensure_et_columns
+from wrds_tools import (
+    PULL_CHUNK_ROWS,
+    STREAMING_PULL,
+    WRDSConnectionPool,
+    connect_wrds,
+    get_schema_tables,
+    get_table_columns,
+    stream_query_to_parquet,
+)
 
 DATA_DIR = Path(config("DATA_DIR"))
 WRDS_USERNAME = config("WRDS_USERNAME")
+# > 1 pulls each yearly table concurrently into a partitioned dataset
+RAVENPACK_PULL_WORKERS = config("RAVENPACK_PULL_WORKERS", default=1, cast=int)
+# Only pull rows newer than what RAVENPACK.parquet already holds
+RAVENPACK_INCREMENTAL = config("RAVENPACK_INCREMENTAL", default=False, cast=cast_bool)
+RAVENPACK_OVERLAP_DAYS = config("RAVENPACK_OVERLAP_DAYS", default=3, cast=int)
+# Earlier yearly tables checked for already-seen event similarity keys by the
+# per-year and incremental queries. 0 checks every earlier year, which matches
+# the single query exactly but re-scans all of history for each year pulled
+# (quadratic in the number of years); N > 0 bounds that to the N years before.
+RAVENPACK_PRIOR_YEARS = config("RAVENPACK_PRIOR_YEARS", default=0, cast=int)
+# Restrict mapped tickers to the CRSP universe in SQL:
+# "none" (filter later in clean_ravenpack), "upload" (send CRSP_unique_tickers.parquet
+# with the query) or "join" (compute the universe from CRSPM.DSF_V2 in the same query)
+RAVENPACK_CRSP_FILTER = config("RAVENPACK_CRSP_FILTER", default="none", cast=str)
 
-# Dates mentioned in the paper: Oct 2021 to May 2024
-START_DATE = datetime.strptime("2021-10-01", "%Y-%m-%d")
-END_DATE = datetime.strptime("2024-05-31", "%Y-%m-%d")
+# Same window as pull_CRSP_stock.py; raise END_DATE to let an incremental refresh pull newer rows
+START_DATE = config("START_DATE", cast=pd.Timestamp)
+END_DATE = config("END_DATE", cast=pd.Timestamp)
+
+RAVENPACK_SCHEMA_NAME = "ravenpack_dj"
+MANIFEST_NAME = "_manifest.json"
+
+MAPPING_SCHEMA = "ravenpack_common"
+MAPPING_TABLE = "wrds_rpa_company_mappings"
+RP_COLUMNS = [
+    "rp_entity_id",
+    "rpa_date_utc",
+    "timestamp_utc",
+    "headline",
+    "relevance",
+    "event_similarity_key",
+    "event_similarity_days",
+    "news_type",
+    "category",
+    '"group"',
+]
+DATE_COLS = ["rpa_date_utc", "timestamp_utc"]
+# Output columns of the pull query plus the ET columns added by
+# `time_tools.add_et_columns`, fixed up front so streamed chunks agree
+RAVENPACK_SCHEMA = pa.schema(
+    [
+        ("rp_entity_id", pa.string()),
+        ("rpa_date_utc", pa.timestamp("ns")),
+        ("timestamp_utc", pa.timestamp("ns")),
+        ("map_ticker", pa.string()),
+        ("entity_name", pa.string()),
+        ("headline", pa.string()),
+        *ET_SCHEMA_FIELDS,
+    ]
+)
 
 
 def _pick_first_existing_column(db: wrds.Connection, schema: str, table: str, candidates: list[str]) -> str | None:
     """
     Return the first column in `candidates` that exists in schema.table, else None.
     """
-    q = f"""
-    SELECT column_name
-    FROM information_schema.columns
-    WHERE table_schema = '{schema}'
-      AND table_name = '{table}'
-    """
-    cols = set(db.raw_sql(q)["column_name"].tolist())
+    cols = set(get_table_columns(db, schema, table))
     for c in candidates:
         if c in cols:
             return c
     return None
 
 
-# Two main steps to filter with SQL:
-# - keep only relevance = 100 per the paper
-# - remove duplicate news stories tagged with same event similarity key (via ROW_NUMBER)
-def pull_ravenpack(wrds_username: str = WRDS_USERNAME) -> pd.DataFrame:
-    print("Pulling Ravenpack data from WRDS...", flush=True)
-
-    start = START_DATE.strftime("%Y-%m-%d")
-    end = END_DATE.strftime("%Y-%m-%d")
-
-    db = wrds.Connection(wrds_username=wrds_username)
-
-    # --- Find a usable "entity name" column from the mappings table (WRDS schema can vary) ---
-    mapping_schema = "ravenpack_common"
-    mapping_table = "wrds_rpa_company_mappings"
-
+def _entity_name_select(db: wrds.Connection) -> str:
+    """
+    Find a usable "entity name" column from the mappings table (WRDS schema can vary)
+    and return the SELECT expression for it.
+    """
     entity_name_candidates = [
         "entity_name",
         "company_name",
@@ -57,89 +104,172 @@ def pull_ravenpack(wrds_username: str = WRDS_USERNAME) -> pd.DataFrame:
     ]
     entity_name_col = _pick_first_existing_column(
         db,
-        schema=mapping_schema,
-        table=mapping_table,
+        schema=MAPPING_SCHEMA,
+        table=MAPPING_TABLE,
         candidates=entity_name_candidates,
     )
 
     if entity_name_col is None:
         # Minimal-change fallback: still pull data; downstream can fall back to ticker as "name"
         print(
-            f"WARNING: Could not find an entity name column in {mapping_schema}.{mapping_table}. "
+            f"WARNING: Could not find an entity name column in {MAPPING_SCHEMA}.{MAPPING_TABLE}. "
             f"Tried: {entity_name_candidates}. Proceeding without entity_name.",
             flush=True,
         )
-        entity_name_select = "NULL::text AS entity_name"
-    else:
-        entity_name_select = f"{entity_name_col}::text AS entity_name"
-        print(f"Using entity name column from mappings: {mapping_schema}.{mapping_table}.{entity_name_col}", flush=True)
+        return "NULL::text AS entity_name"
+    print(f"Using entity name column from mappings: {MAPPING_SCHEMA}.{MAPPING_TABLE}.{entity_name_col}", flush=True)
+    return f"{entity_name_col}::text AS entity_name"
 
-    # NOTE:
-    # - We REMOVE rp.entity_id (it is not present in at least some yearly tables on WRDS).
-    # - We ADD entity_name from the mappings table to support your OpenAI prompting step.
-    # - UNION ALL branches are kept identical across years for stability.
-    query = f"""
-    WITH id AS (
+
+def ravenpack_years(start_date, end_date, db: wrds.Connection | None = None) -> list[int]:
+    """
+    Years of the yearly ravenpack_dj.rpa_djpr_equities_YYYY tables that cover
+    start_date..end_date. With `db`, years whose table does not exist on WRDS
+    (yet) are dropped with a warning.
+    """
+    years = list(range(pd.Timestamp(start_date).year, pd.Timestamp(end_date).year + 1))
+    if db is None:
+        return years
+
+    existing = set(get_schema_tables(db, RAVENPACK_SCHEMA_NAME))
+    missing = [y for y in years if f"rpa_djpr_equities_{y}" not in existing]
+    if missing:
+        print(
+            f"WARNING: No {RAVENPACK_SCHEMA_NAME}.rpa_djpr_equities_YYYY table for years {missing}; skipping them.",
+            flush=True,
+        )
+    return [y for y in years if y not in missing]
+
+
+def _prior_years(years, first_year: int, lookback: int = RAVENPACK_PRIOR_YEARS) -> list[int]:
+    """
+    Years in `years` before `first_year` whose tables are checked for event
+    similarity keys seen earlier; all of them when `lookback` is 0, else at
+    most the `lookback` years before `first_year`.
+    """
+    return [y for y in years if y < first_year and (lookback <= 0 or y >= first_year - lookback)]
+
+
+def _union_yearly_tables(years, columns) -> str:
+    """UNION ALL of `columns` across the yearly rpa_djpr_equities_YYYY tables."""
+    select_list = ",\n        ".join(columns)
+    return "\n      UNION ALL\n".join(
+        f"""      SELECT
+        {select_list}
+      FROM {RAVENPACK_SCHEMA_NAME}.rpa_djpr_equities_{year}"""
+        for year in years
+    )
+
+
+def _row_filters(alias: str, start: str, end: str) -> str:
+    """Row-level filters from the paper, applied before the event similarity dedupe."""
+    return f"""{alias}.rpa_date_utc BETWEEN '{start}'::date AND '{end}'::date
+        AND {alias}.relevance = 100
+        AND {alias}.event_similarity_days > 90
+        AND {alias}.news_type IN ('PRESS-RELEASE', 'FULL-ARTICLE')
+        AND ({alias}.category IS NULL OR {alias}.category NOT IN ('stock-gain', 'stock-loss'))
+        AND ({alias}."group" IS NULL OR {alias}."group" <> 'stock-prices')
+        AND {alias}.headline IS NOT NULL
+        AND {alias}.timestamp_utc IS NOT NULL"""
+
+
+def _crsp_ticker_cte(crsp_filter: str, start: str, end: str) -> str:
+    """
+    CTE `crsp_tickers(ticker)` holding the CRSP ticker universe, or "" when
+    `crsp_filter` is "none". Tickers are normalized the same way as
+    `clean_ravenpack._norm_ticker_series`.
+    """
+    if crsp_filter == "none":
+        return ""
+    if crsp_filter == "upload":
+        tickers = load_crsp_unique_tickers(DATA_DIR)["ticker"].dropna()
+        tickers = sorted(set(tickers.astype(str).str.upper().str.replace(r"\s+", "", regex=True)) - {""})
+        if not tickers:
+            raise ValueError("CRSP_unique_tickers.parquet has no tickers to filter on")
+        values = ",\n        ".join("('" + t.replace("'", "''") + "')" for t in tickers)
+        return f"""
+    crsp_tickers (ticker) AS (
+      VALUES
+        {values}
+    ),"""
+    if crsp_filter == "join":
+        return f"""
+    crsp_tickers AS (
+      SELECT DISTINCT UPPER(REGEXP_REPLACE(ticker, '\\s+', '', 'g')) AS ticker
+      FROM CRSPM.DSF_V2
+      WHERE primaryexch IN ('N', 'A', 'Q')
+        AND conditionaltype = 'RW'
+        AND tradingstatusflg = 'A'
+        AND dlycaldt BETWEEN '{start}'::date AND '{end}'::date
+        AND ticker IS NOT NULL
+    ),"""
+    raise ValueError(
+        f"Unknown RAVENPACK_CRSP_FILTER {crsp_filter!r}; expected 'none', 'upload' or 'join'"
+    )
+
+
+def _build_ravenpack_query(
+    years,
+    start: str,
+    end: str,
+    entity_name_select: str,
+    prior_years=(),
+    prior_start: str | None = None,
+    prior_end: str | None = None,
+    crsp_filter: str = RAVENPACK_CRSP_FILTER,
+) -> str:
+    """
+    Build the RavenPack pull query over the yearly tables in `years`.
+
+    When `prior_years` is given, stories whose (rp_entity_id, event_similarity_key)
+    already passed the filters in one of those earlier tables are excluded, so a
+    query per year keeps the same rows as one ROW_NUMBER over all years.
+    `prior_start`/`prior_end` set the date window of those earlier stories and
+    default to `start`/`end`. Every table in `prior_years` is scanned in full by
+    the query, so callers bound the list with `_prior_years()`.
+
+    `crsp_filter` ("none", "upload" or "join") restricts the mapped tickers in
+    the `id` CTE to the CRSP universe, so rows clean_ravenpack would drop never
+    leave WRDS.
+    """
+    crsp_cte = _crsp_ticker_cte(crsp_filter, prior_start or start, end)
+    crsp_where = ""
+    if crsp_cte:
+        crsp_where = """
+        AND UPPER(REGEXP_REPLACE(ticker, '\\s+', '', 'g')) IN (SELECT ticker FROM crsp_tickers)"""
+
+    prior_cte = ""
+    prior_filter = ""
+    if prior_years:
+        prior_cte = f"""
+    prior AS (
+      SELECT rp_entity_id, event_similarity_key
+      FROM (
+{_union_yearly_tables(prior_years, RP_COLUMNS)}
+      ) p
+      WHERE {_row_filters("p", prior_start or start, prior_end or end)}
+    ),"""
+        prior_filter = """
+        AND NOT EXISTS (
+          SELECT 1
+          FROM prior
+          WHERE prior.rp_entity_id = rp.rp_entity_id
+            AND prior.event_similarity_key IS NOT DISTINCT FROM rp.event_similarity_key
+        )"""
+
+    return f"""
+    WITH{crsp_cte}
+    id AS (
       SELECT
         rp_entity_id,
         ticker,
         {entity_name_select}
-      FROM {mapping_schema}.{mapping_table}
-      WHERE entity_type = 'COMP'
+      FROM {MAPPING_SCHEMA}.{MAPPING_TABLE}
+      WHERE entity_type = 'COMP'{crsp_where}
     ),
     rp AS (
-      SELECT
-        rp_entity_id,
-        rpa_date_utc,
-        timestamp_utc,
-        headline,
-        relevance,
-        event_similarity_key,
-        event_similarity_days,
-        news_type,
-        category,
-        "group"
-      FROM ravenpack_dj.rpa_djpr_equities_2021
-      UNION ALL
-      SELECT
-        rp_entity_id,
-        rpa_date_utc,
-        timestamp_utc,
-        headline,
-        relevance,
-        event_similarity_key,
-        event_similarity_days,
-        news_type,
-        category,
-        "group"
-      FROM ravenpack_dj.rpa_djpr_equities_2022
-      UNION ALL
-      SELECT
-        rp_entity_id,
-        rpa_date_utc,
-        timestamp_utc,
-        headline,
-        relevance,
-        event_similarity_key,
-        event_similarity_days,
-        news_type,
-        category,
-        "group"
-      FROM ravenpack_dj.rpa_djpr_equities_2023
-      UNION ALL
-      SELECT
-        rp_entity_id,
-        rpa_date_utc,
-        timestamp_utc,
-        headline,
-        relevance,
-        event_similarity_key,
-        event_similarity_days,
-        news_type,
-        category,
-        "group"
-      FROM ravenpack_dj.rpa_djpr_equities_2024
-    ),
+{_union_yearly_tables(years, RP_COLUMNS)}
+    ),{prior_cte}
     ranked AS (
       SELECT
         rp.rp_entity_id,
@@ -154,15 +284,8 @@ def pull_ravenpack(wrds_username: str = WRDS_USERNAME) -> pd.DataFrame:
         ) AS rn
       FROM rp
       LEFT JOIN id ON rp.rp_entity_id = id.rp_entity_id
-      WHERE rp.rpa_date_utc BETWEEN '{start}'::date AND '{end}'::date
-        AND rp.relevance = 100
-        AND rp.event_similarity_days > 90
-        AND rp.news_type IN ('PRESS-RELEASE', 'FULL-ARTICLE')
-        AND (rp.category IS NULL OR rp.category NOT IN ('stock-gain', 'stock-loss'))
-        AND (rp."group" IS NULL OR rp."group" <> 'stock-prices')
-        AND id.rp_entity_id IS NOT NULL
-        AND rp.headline IS NOT NULL
-        AND rp.timestamp_utc IS NOT NULL
+      WHERE {_row_filters("rp", start, end)}
+        AND id.rp_entity_id IS NOT NULL{prior_filter}
     )
     SELECT
       rp_entity_id,
@@ -175,19 +298,360 @@ def pull_ravenpack(wrds_username: str = WRDS_USERNAME) -> pd.DataFrame:
     WHERE rn = 1;
     """
 
-    df = db.raw_sql(query, date_cols=["rpa_date_utc", "timestamp_utc"])
+
+# Two main steps to filter with SQL:
+# - keep only relevance = 100 per the paper
+# - remove duplicate news stories tagged with same event similarity key (via ROW_NUMBER)
+def pull_ravenpack(wrds_username: str = WRDS_USERNAME) -> pd.DataFrame:
+    print("Pulling Ravenpack data from WRDS...", flush=True)
+
+    start = START_DATE.strftime("%Y-%m-%d")
+    end = END_DATE.strftime("%Y-%m-%d")
+
+    db = connect_wrds(wrds_username=wrds_username)
+    entity_name_select = _entity_name_select(db)
+
+    # NOTE:
+    # - We REMOVE rp.entity_id (it is not present in at least some yearly tables on WRDS).
+    # - We ADD entity_name from the mappings table to support your OpenAI prompting step.
+    # - UNION ALL branches are kept identical across years for stability.
+    query = _build_ravenpack_query(
+        years=ravenpack_years(START_DATE, END_DATE, db),
+        start=start,
+        end=end,
+        entity_name_select=entity_name_select,
+    )
+
+    df = db.raw_sql(query, date_cols=DATE_COLS)
+    db.close()
+    return add_et_columns(df)
+
+
+def pull_ravenpack_streaming(
+    path: Path = DATA_DIR / "RAVENPACK.parquet",
+    chunk_rows: int = PULL_CHUNK_ROWS,
+    wrds_username: str = WRDS_USERNAME,
+) -> dict:
+    """
+    Same query as `pull_ravenpack()`, but fetched from a server-side cursor in
+    chunks of `chunk_rows` rows and appended to `path` as parquet row groups,
+    so client memory is bounded by the chunk size instead of the result size.
+
+    Returns:
+    - dict: Row count, rows/sec and peak RSS of the pull.
+    """
+    print("Streaming Ravenpack data from WRDS...", flush=True)
+
+    start = START_DATE.strftime("%Y-%m-%d")
+    end = END_DATE.strftime("%Y-%m-%d")
+
+    db = connect_wrds(wrds_username=wrds_username)
+    query = _build_ravenpack_query(
+        years=ravenpack_years(START_DATE, END_DATE, db),
+        start=start,
+        end=end,
+        entity_name_select=_entity_name_select(db),
+    )
+
+    path = Path(path)
+    if path.is_dir():
+        shutil.rmtree(path)
+    try:
+        return stream_query_to_parquet(
+            db,
+            query,
+            path,
+            schema=RAVENPACK_SCHEMA,
+            chunk_rows=chunk_rows,
+            date_cols=DATE_COLS,
+            transform=add_et_columns,
+            label="ravenpack",
+        )
+    finally:
+        db.close()
+
+
+def pull_ravenpack_partitioned(
+    years=None,
+    data_dir: Path = DATA_DIR,
+    max_workers: int = RAVENPACK_PULL_WORKERS,
+    retries: int = 1,
+    chunk_rows: int = PULL_CHUNK_ROWS,
+    wrds_username: str = WRDS_USERNAME,
+) -> Path:
+    """
+    Pull each yearly RavenPack table concurrently over a small pool of WRDS
+    connections and write every year as its own partition of a hive-partitioned
+    dataset at `data_dir/RAVENPACK.parquet/year=YYYY/part-0.parquet`.
+
+    Each year's query excludes event similarity keys already seen in an earlier
+    year of the window, so the result matches the single UNION ALL query of
+    `pull_ravenpack()`. Years already recorded in the dataset manifest for the
+    same date window are skipped, so a rerun after a dropped connection only
+    pulls what is missing. Each year is streamed to its partition in chunks
+    of `chunk_rows` rows.
+
+    Parameters:
+    - years (iterable of int): Yearly tables to pull. Defaults to the tables
+      covering START_DATE..END_DATE.
+    - data_dir (str or Path): Directory holding RAVENPACK.parquet.
+    - max_workers (int): Number of concurrent queries / pooled connections.
+    - retries (int): Extra attempts per year, each on a fresh connection.
+    - chunk_rows (int): Rows fetched per chunk / written per row group.
+    - wrds_username (str): WRDS username.
+
+    Returns:
+    - Path: The dataset directory.
+    """
+    start = START_DATE.strftime("%Y-%m-%d")
+    end = END_DATE.strftime("%Y-%m-%d")
+    if years is None:
+        years = ravenpack_years(START_DATE, END_DATE)
+    years = sorted(years)
+
+    path = Path(data_dir) / "RAVENPACK.parquet"
+    if path.is_file():
+        path.unlink()
+    manifest = _read_manifest(path) if path.is_dir() else {}
+    if manifest.get("start") != start or manifest.get("end") != end:
+        # Partitions from a different date window are stale
+        if path.is_dir():
+            shutil.rmtree(path)
+        manifest = {"start": start, "end": end, "years": {}}
+    path.mkdir(parents=True, exist_ok=True)
+    todo = [
+        y
+        for y in years
+        if str(y) not in manifest["years"] or not _partition_file(path, y).exists()
+    ]
+    skipped = [y for y in years if y not in todo]
+    if skipped:
+        print(f"Years already pulled for this window, skipping: {skipped}", flush=True)
+    if not todo:
+        return path
+
+    print(
+        f"Pulling Ravenpack years {todo} with {max_workers} WRDS connection(s)...",
+        flush=True,
+    )
+
+    with WRDSConnectionPool(size=max_workers, wrds_username=wrds_username) as pool:
+        with pool.connection() as db:
+            entity_name_select = _entity_name_select(db)
+            available = set(ravenpack_years(f"{years[0]}-01-01", f"{years[-1]}-12-31", db))
+        years = [y for y in years if y in available]
+        todo = [y for y in todo if y in available]
+
+        def _pull_year(year):
+            prior_years = _prior_years(years, year)
+            query = _build_ravenpack_query(
+                years=[year],
+                start=start,
+                end=end,
+                entity_name_select=entity_name_select,
+                prior_years=prior_years,
+            )
+            for attempt in range(retries + 1):
+                try:
+                    with pool.connection() as db:
+                        stats = stream_query_to_parquet(
+                            db,
+                            query,
+                            _partition_file(path, year),
+                            schema=RAVENPACK_SCHEMA,
+                            chunk_rows=chunk_rows,
+                            date_cols=DATE_COLS,
+                            transform=add_et_columns,
+                            label=f"ravenpack year={year}",
+                        )
+                    return year, stats["rows"]
+                except Exception as e:
+                    if attempt == retries:
+                        raise
+                    print(f"Year {year} failed ({e!r}); retrying on a new connection...", flush=True)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(_pull_year, y) for y in todo]
+            for future in as_completed(futures):
+                year, n_rows = future.result()
+                manifest["years"][str(year)] = n_rows
+                _write_manifest(path, manifest)
+                print(f"Saved year={year}: {n_rows:,} rows", flush=True)
+
+    return path
+
+
+def pull_ravenpack_incremental(
+    data_dir: Path = DATA_DIR,
+    overlap_days: int = RAVENPACK_OVERLAP_DAYS,
+    wrds_username: str = WRDS_USERNAME,
+) -> Path:
+    """
+    Refresh RAVENPACK.parquet with only the rows newer than what it already holds.
+
+    The watermark is the latest `timestamp_utc` on disk. Rows are re-pulled from
+    `overlap_days` before the watermark date through END_DATE (from settings, so
+    a daily refresh advances END_DATE in .env or on the command line), which
+    picks up stories that arrived late for days already pulled. Stories whose event
+    similarity key already passed the filters before that window are excluded
+    in SQL, so the ROW_NUMBER dedupe gives the same rows as a full pull. The
+    re-pulled window replaces the matching rows in the year partitions; a
+    single-file RAVENPACK.parquet is converted to the partitioned layout first.
+    Falls back to `pull_ravenpack_partitioned()` when nothing is on disk yet.
+
+    Parameters:
+    - data_dir (str or Path): Directory holding RAVENPACK.parquet.
+    - overlap_days (int): Days before the watermark date to pull again.
+    - wrds_username (str): WRDS username.
+
+    Returns:
+    - Path: The dataset directory.
+    """
+    path = Path(data_dir) / "RAVENPACK.parquet"
+    if not path.exists():
+        print("No existing RavenPack data found; running a full pull.", flush=True)
+        return pull_ravenpack_partitioned(data_dir=data_dir, wrds_username=wrds_username)
+
+    if path.is_file():
+        _convert_to_partitioned(path)
+
+    watermark = _read_watermark(path)
+    if watermark is None:
+        print("Existing RavenPack data is empty; running a full pull.", flush=True)
+        shutil.rmtree(path)
+        return pull_ravenpack_partitioned(data_dir=data_dir, wrds_username=wrds_username)
+
+    window_start = max(watermark.normalize() - timedelta(days=overlap_days), pd.Timestamp(START_DATE))
+    if window_start > pd.Timestamp(END_DATE):
+        print(f"RavenPack data is current through {watermark}; nothing to pull.", flush=True)
+        return path
+
+    start = START_DATE.strftime("%Y-%m-%d")
+    end = END_DATE.strftime("%Y-%m-%d")
+    window = window_start.strftime("%Y-%m-%d")
+    history_end = (window_start - timedelta(days=1)).strftime("%Y-%m-%d")
+
+    print(
+        f"Incremental Ravenpack pull: watermark {watermark}, re-pulling {window} to {end}...",
+        flush=True,
+    )
+
+    db = connect_wrds(wrds_username=wrds_username)
+    years = ravenpack_years(window_start, END_DATE, db)
+    # The window's own year is always checked; RAVENPACK_PRIOR_YEARS bounds the ones before it
+    history = ravenpack_years(START_DATE, window_start, db)
+    prior_years = _prior_years(history, window_start.year) + [y for y in history if y == window_start.year]
+    query = _build_ravenpack_query(
+        years=years,
+        start=window,
+        end=end,
+        entity_name_select=_entity_name_select(db),
+        prior_years=prior_years if window > start else (),
+        prior_start=start,
+        prior_end=history_end,
+    )
+    new = add_et_columns(db.raw_sql(query, date_cols=DATE_COLS))
     db.close()
-    return df
+
+    manifest = _read_manifest(path)
+    manifest.setdefault("years", {})
+    new_year = new["rpa_date_utc"].dt.year
+    for year in sorted(set(new_year.unique()) | {y for y in years if _partition_file(path, y).exists()}):
+        out = _partition_file(path, year)
+        if out.exists():
+            old = ensure_et_columns(pd.read_parquet(out))
+            old = old[old["rpa_date_utc"] < window_start]
+        else:
+            old = new.iloc[0:0]
+        merged = pd.concat([old, new[new_year == year]], ignore_index=True)
+        merged = merged.sort_values("timestamp_utc", kind="stable").reset_index(drop=True)
+        _write_partition(path, year, merged)
+        manifest["years"][str(year)] = len(merged)
+
+    manifest["start"] = start
+    manifest["end"] = end
+    _write_manifest(path, manifest)
+
+    n_new = int((new["timestamp_utc"] > watermark).sum())
+    print(f"Merged {len(new):,} rows from the refresh window ({n_new:,} newer than the watermark).", flush=True)
+    return path
+
+
+def _read_watermark(path: Path) -> pd.Timestamp | None:
+    """Latest `timestamp_utc` in the RavenPack dataset at `path`, or None if empty."""
+    table = ds.dataset(path, format="parquet", partitioning="hive").to_table(columns=["timestamp_utc"])
+    if table.num_rows == 0:
+        return None
+    watermark = pd.Series(table.column("timestamp_utc").to_pandas()).max()
+    return None if pd.isna(watermark) else pd.Timestamp(watermark)
+
+
+def _convert_to_partitioned(path: Path) -> None:
+    """Rewrite a single-file RAVENPACK.parquet in place as year partitions."""
+    print(f"Converting {path} to year partitions...", flush=True)
+    df = ensure_et_columns(pd.read_parquet(path))
+    path.unlink()
+    path.mkdir(parents=True)
+    years = {}
+    for year, part in df.groupby(df["rpa_date_utc"].dt.year, sort=True):
+        _write_partition(path, int(year), part)
+        years[str(int(year))] = len(part)
+    manifest = {"start": START_DATE.strftime("%Y-%m-%d"), "end": None, "years": years}
+    if len(df):
+        manifest["end"] = df["rpa_date_utc"].max().strftime("%Y-%m-%d")
+    _write_manifest(path, manifest)
+
+
+def _write_partition(path: Path, year: int, df: pd.DataFrame) -> None:
+    out = _partition_file(path, year)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out.with_name(f"_{out.name}.tmp")
+    df.to_parquet(tmp, index=False)
+    os.replace(tmp, out)
+
+
+def _partition_file(path: Path, year: int) -> Path:
+    return path / f"year={year}" / "part-0.parquet"
+
+
+def _read_manifest(path: Path) -> dict:
+    manifest_path = path / MANIFEST_NAME
+    if not manifest_path.exists():
+        return {}
+    return json.loads(manifest_path.read_text(encoding="utf-8"))
+
+
+def _write_manifest(path: Path, manifest: dict) -> None:
+    (path / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
 
 
 def load_ravenpack(data_dir: Path = DATA_DIR) -> pd.DataFrame:
+    """
+    Load RavenPack data saved either as a single parquet file or as the
+    year-partitioned dataset written by `pull_ravenpack_partitioned()`.
+    """
     path = Path(data_dir) / "RAVENPACK.parquet"
+    if path.is_dir():
+        df = pd.read_parquet(path)
+        return df.drop(columns=["year"], errors="ignore")
     return pd.read_parquet(path)
 
 
 if __name__ == "__main__":
-    df = pull_ravenpack()
-    print("Saving Ravenpack data to parquet file...", flush=True)
     path = Path(DATA_DIR) / "RAVENPACK.parquet"
-    df.to_parquet(path, index=False)
-    print(f"Saved: {path}")
\ No newline at end of file
+    if RAVENPACK_INCREMENTAL:
+        pull_ravenpack_incremental()
+        print(f"Saved: {path}")
+    elif RAVENPACK_PULL_WORKERS > 1:
+        pull_ravenpack_partitioned()
+        print(f"Saved: {path}")
+    elif STREAMING_PULL:
+        pull_ravenpack_streaming(path)
+        print(f"Saved: {path}")
+    else:
+        df = pull_ravenpack()
+        print("Saving Ravenpack data to parquet file...", flush=True)
+        if path.is_dir():
+            shutil.rmtree(path)
+        df.to_parquet(path, index=False)
+        print(f"Saved: {path}")
\ No newline at end of file
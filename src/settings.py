@@ -183,6 +183,22 @@ defaults = {
 }
 
 
+def cast_bool(value):
+    """Cast a config value such as "True", "1", "yes" or "off" to a bool.
+
+    Use as `config("SOME_FLAG", default=False, cast=cast_bool)`. The plain
+    `bool` cast would treat any non-empty string, including "False", as True.
+    """
+    if isinstance(value, bool):
+        return value
+    value = str(value).strip().lower()
+    if value in {"1", "true", "t", "yes", "y", "on"}:
+        return True
+    if value in {"0", "false", "f", "no", "n", "off", ""}:
+        return False
+    raise ValueError(f"Cannot interpret {value!r} as a boolean")
+
+
 def config(
     var_name,
     default=None,
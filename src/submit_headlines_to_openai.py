@@ -1,11 +1,24 @@
+import hashlib
 import json
+import os
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from zoneinfo import ZoneInfo
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 from openai import OpenAI
+from openai_response_cache import OPENAI_RESPONSE_CACHE, ResponseCache, response_cache_key
 from settings import config
+from time_tools import ET_COLUMNS, ensure_et_columns
+
+try:
+    import orjson
+except ImportError:  # falls back to the standard json encoder
+    orjson = None
 
 DATA_DIR = Path(config("DATA_DIR"))
 OUTPUT_DIR = Path(config("OUTPUT_DIR"))
@@ -18,9 +31,40 @@ SCORES_PARQUET = DATA_DIR / "daily_headline_polarity.parquet"
 
 BATCH_OUTPUT_JSONL = OUTPUT_DIR / "openai_headline_batch_output.jsonl"
 BATCH_ERROR_JSONL = OUTPUT_DIR / "openai_headline_batch_errors.jsonl"
+# Responses answered from the cache, in the same line format as the batch output
+CACHED_OUTPUT_JSONL = OUTPUT_DIR / "openai_headline_cached_output.jsonl"
 METADATA_JSON = OUTPUT_DIR / "openai_headline_batch_metadata.json"
-ID_ROW_JSON = OUTPUT_DIR / "id_to_row_mapping.json"
+ID_ROW_PARQUET = OUTPUT_DIR / "id_to_row_mapping.parquet"
+REQUESTS_SHARD_DIR = DATA_DIR / "openai_headline_requests"
+BATCH_SHARD_DIR = OUTPUT_DIR / "openai_headline_batches"
+BATCH_MANIFEST_JSON = OUTPUT_DIR / "openai_headline_batch_manifest.json"
+
+# Per-batch limits of the OpenAI Batch API: 50,000 requests and a 200 MB input file
+OPENAI_BATCH_MAX_REQUESTS = config("OPENAI_BATCH_MAX_REQUESTS", default=50_000, cast=int)
+OPENAI_BATCH_MAX_BYTES = config("OPENAI_BATCH_MAX_BYTES", default=200 * 1024**2, cast=int)
+# Concurrent uploads / batch creations / downloads
+OPENAI_BATCH_WORKERS = config("OPENAI_BATCH_WORKERS", default=8, cast=int)
+# > 0 submits only the first N cleaned headlines (for trial runs)
+OPENAI_HEADLINE_LIMIT = config("OPENAI_HEADLINE_LIMIT", default=0, cast=int)
+# Input rows read from the cleaned parquet and rendered into requests at a time
+REQUEST_BATCH_ROWS = config("REQUEST_BATCH_ROWS", default=100_000, cast=int)
+TERMINAL_BATCH_STATES = {"completed", "failed", "expired", "cancelled"}
+# Shards whose batch ended in one of these are submitted again on the next run
+RETRY_BATCH_STATES = {"failed", "expired", "cancelled"}
+
+INPUT_COLUMNS = ["timestamp_utc", "map_ticker", "entity_name", "headline", *ET_COLUMNS]
+# One row per source headline; rows that share a prompt share its custom_id
+ID_ROW_SCHEMA = pa.schema(
+    [
+        ("custom_id", pa.string()),
+        ("ticker", pa.string()),
+        ("date", pa.date32()),
+        ("entity_name", pa.string()),
+        ("cache_key", pa.string()),
+    ]
+)
 
+TEMPERATURE = 0
 SYSTEM_PROMPT = (
     "Forget all your previous instructions. Pretend you are a financial expert. "
     "You are a financial expert with stock recommendation experience. "
@@ -58,129 +102,320 @@ def pick_column(df: pd.DataFrame, options: list[str], required: bool = True) ->
     return None
 
 
-def make_requests_jsonl(df: pd.DataFrame, model: str) -> dict[str, dict[str, str]]:
-    """Helper method to create the JSONL file of requests for OpenAI batch, and build the id to row mapping.
+def _dumps(obj) -> bytes:
+    """JSON-encode `obj` to compact bytes, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def iter_headline_batches(source: Path | pd.DataFrame, batch_rows: int = REQUEST_BATCH_ROWS, max_rows: int = 0):
+    """Helper method to yield the headlines input in slices of at most `batch_rows` rows.
+
+    A parquet path is read one record batch at a time, and only the columns the
+    requests need, so the whole cleaned file is never held in memory.
 
     Args:
-        df (pd.DataFrame): DataFrame containing the RavenPack headlines data.
-        model (str): The OpenAI model to specify in the request body.
+        source (Path | pd.DataFrame): Cleaned RavenPack parquet, or an already loaded DataFrame.
+        batch_rows (int): Rows per slice.
+        max_rows (int): > 0 stops after this many input rows.
 
-    Returns:
-        dict[str, dict[str, str]]: A mapping of custom_id to original row data (ticker, date, entity_name) for later reference.
+    Yields:
+        pd.DataFrame: The next slice of input rows.
     """
-    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    if isinstance(source, pd.DataFrame):
+        batches = (source.iloc[start : start + batch_rows] for start in range(0, len(source), batch_rows))
+    else:
+        parquet_file = pq.ParquetFile(source)
+        columns = [c for c in INPUT_COLUMNS if c in parquet_file.schema_arrow.names]
+        batches = (
+            batch.to_pandas() for batch in parquet_file.iter_batches(batch_size=batch_rows, columns=columns)
+        )
+
+    remaining = max_rows if max_rows > 0 else None
+    for df in batches:
+        if remaining is not None:
+            df = df.iloc[:remaining]
+            remaining -= len(df)
+        if len(df):
+            yield df
+        if remaining == 0:
+            return
 
+
+def render_headlines(df: pd.DataFrame) -> pd.DataFrame:
+    """Helper method to clean one slice of headlines and render its user messages with vectorized string operations.
+
+    Args:
+        df (pd.DataFrame): Slice of the cleaned RavenPack data.
+
+    Returns:
+        pd.DataFrame: DataFrame with columns [ticker, date, entity_name, user_message], where
+            date is the ET calendar date; rows without a date or with an empty headline are dropped.
+    """
     timestamp_col = pick_column(df, ["timestamp_utc"])
     ticker_col = pick_column(df, ["map_ticker"])
     entity_name_col = pick_column(df, ["entity_name"])
     headline_col = pick_column(df, ["headline"])
-    timestamp_et_col = 'timestamp_et'
-    date_col = 'date'
-    
-    # Maybe we do this part of ravenpack data cleaning?
-    ts = pd.to_datetime(df[timestamp_col], errors='coerce')
-    if ts.dt.tz is None:
-        ts = ts.dt.tz_localize('UTC')
-
-    timestamp_et = ts.dt.tz_convert(ZoneInfo('America/New_York'))
-    date_series = timestamp_et.dt.date
-
-    headlines_df = df[[ticker_col, entity_name_col, headline_col]].copy()
-    headlines_df[date_col] = date_series
-    headlines_df[timestamp_et_col] = timestamp_et
-    headlines_df = headlines_df.rename(
-        columns={
-            date_col: "date",
-            ticker_col: "ticker",
-            entity_name_col: "entity_name",
-            headline_col: "headline",
+
+    # ET columns are written by the RavenPack pull; only older files need them derived here
+    df = ensure_et_columns(df, timestamp_col)
+
+    # basic cleaning, but should be done prior.. we can remove this later
+    headlines_df = pd.DataFrame(
+        {
+            "ticker": df[ticker_col].astype(str).str.upper().str.strip(),
+            "date": df["date_et"],
+            "entity_name": df[entity_name_col].astype(str).str.strip(),
+            "headline": df[headline_col].astype(str).str.strip(),
         }
     )
+    headlines_df = headlines_df[headlines_df["date"].notna() & (headlines_df["headline"] != "")]
 
-    # basic cleaning, but should be done prior.. we can remove this later
-    headlines_df["ticker"] = headlines_df["ticker"].astype(str).str.upper().str.strip()
-    headlines_df["entity_name"] = headlines_df["entity_name"].astype(str).str.strip()
-    headlines_df["headline"] = headlines_df["headline"].astype(str).str.strip()
-    headlines_df = headlines_df.dropna(subset=["date"])
-    headlines_df = headlines_df[headlines_df["headline"] != ""]
-    headlines_df = headlines_df.reset_index(drop=True)
-
-    id_to_row: dict[str, dict[str, str]] = {}
-    with REQUESTS_JSONL.open("w", encoding="utf-8") as f:
-        for idx, row in headlines_df.iterrows():
-            custom_id = f"rp-{idx}"
-            id_to_row[custom_id] = {
-                "ticker": str(row["ticker"]),
-                "date": str(row["date"]),
-                "entity_name": str(row["entity_name"]),
-            }
-
-            request_obj = {
-                "custom_id": custom_id,
-                "method": "POST",
-                "url": "/v1/chat/completions",
-                "body": {
-                    "model": model,
-                    "temperature": 0,
-                    "messages": [
-                        {
-                            "role": "system",
-                            "content": SYSTEM_PROMPT,
-                        },
-                        {
-                            "role": "user",
-                            "content": (
-                                f"Is this headline good or bad for the stock price of {row['entity_name']} in the short term?\n"
-                                f"Headline: {row['headline']}"
-                            ),
-                        },
-                    ],
-                },
-            }
-            f.write(json.dumps(request_obj) + "\n")
+    user_message = (
+        "Is this headline good or bad for the stock price of "
+        + headlines_df["entity_name"]
+        + " in the short term?\nHeadline: "
+        + headlines_df["headline"]
+    )
+    return headlines_df.drop(columns="headline").assign(user_message=user_message).reset_index(drop=True)
+
+
+def make_requests_jsonl(
+    source: Path | pd.DataFrame,
+    model: str,
+    cache: ResponseCache | None = None,
+    batch_rows: int = REQUEST_BATCH_ROWS,
+    max_rows: int = 0,
+) -> dict[str, int]:
+    """Helper method to create the JSONL file of requests for OpenAI batch, and write the id to row mapping.
+
+    The input is streamed in slices of `batch_rows` rows: each slice is cleaned
+    and rendered, its new prompts are written as requests, and its source rows
+    are appended to ID_ROW_PARQUET, so memory does not grow with the input
+    beyond one entry per distinct prompt.
+
+    Rows that render to the same user message (syndicated stories, repeated
+    mapping rows) share one request and custom_id, across slices too. Prompts
+    whose request is already in `cache` are not queued; their stored responses
+    go to CACHED_OUTPUT_JSONL instead, under the same custom_id scheme.
+
+    Args:
+        source (Path | pd.DataFrame): Cleaned RavenPack parquet, or an already loaded DataFrame.
+        model (str): The OpenAI model to specify in the request body.
+        cache (ResponseCache | None): Response cache to consult; None sends every headline.
+        batch_rows (int): Input rows rendered per slice.
+        max_rows (int): > 0 uses only the first N input rows.
+
+    Returns:
+        dict[str, int]: Counts of source rows, distinct prompts, queued requests and cache hits.
+    """
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+
+    # custom_id number of every prompt seen so far, by cache key
+    prompt_ids: dict[str, int] = {}
+    counts = {"rows": 0, "prompts": 0, "queued": 0, "cached": 0}
+    id_map_tmp = ID_ROW_PARQUET.with_name(ID_ROW_PARQUET.name + ".tmp")
+
+    with (
+        REQUESTS_JSONL.open("wb") as f,
+        CACHED_OUTPUT_JSONL.open("wb") as hits,
+        pq.ParquetWriter(id_map_tmp, ID_ROW_SCHEMA) as id_map,
+    ):
+        for df in iter_headline_batches(source, batch_rows=batch_rows, max_rows=max_rows):
+            headlines_df = render_headlines(df)
+            if headlines_df.empty:
+                continue
+
+            # Hash each distinct message of the slice once, then number the ones not seen before
+            prompt_codes, prompts = pd.factorize(headlines_df["user_message"])
+            cache_keys = [response_cache_key(model, SYSTEM_PROMPT, message, TEMPERATURE) for message in prompts]
+            new = [i for i, key in enumerate(cache_keys) if key not in prompt_ids]
+            for i in new:
+                prompt_ids[cache_keys[i]] = len(prompt_ids)
+            custom_ids = np.array([f"rp-{prompt_ids[key]}" for key in cache_keys], dtype=object)
+            cached = cache.get_many([cache_keys[i] for i in new]) if cache is not None and new else {}
+
+            for i in new:
+                custom_id, cache_key = custom_ids[i], cache_keys[i]
+                if cache_key in cached:
+                    hits.write(b'{"custom_id":' + _dumps(custom_id) + b',"response":')
+                    hits.write(cached[cache_key].encode("utf-8") + b"}\n")
+                    counts["cached"] += 1
+                    continue
+
+                request_obj = {
+                    "custom_id": custom_id,
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": {
+                        "model": model,
+                        "temperature": TEMPERATURE,
+                        "messages": [
+                            {
+                                "role": "system",
+                                "content": SYSTEM_PROMPT,
+                            },
+                            {
+                                "role": "user",
+                                "content": prompts[i],
+                            },
+                        ],
+                    },
+                }
+                f.write(_dumps(request_obj) + b"\n")
+                counts["queued"] += 1
+
+            id_map.write_table(
+                pa.table(
+                    {
+                        "custom_id": custom_ids[prompt_codes],
+                        "ticker": headlines_df["ticker"],
+                        "date": headlines_df["date"].to_numpy(dtype="datetime64[D]"),
+                        "entity_name": headlines_df["entity_name"],
+                        "cache_key": np.array(cache_keys, dtype=object)[prompt_codes],
+                    },
+                    schema=ID_ROW_SCHEMA,
+                )
+            )
+            counts["rows"] += len(headlines_df)
+    os.replace(id_map_tmp, ID_ROW_PARQUET)
+    counts["prompts"] = len(prompt_ids)
 
     print(f"Wrote requests jsonl: {REQUESTS_JSONL}")
-    print(f"Number of headlines queued: {len(id_to_row):,}")
-    with ID_ROW_JSON.open("w", encoding="utf-8") as f:
-        json.dump(id_to_row, f, indent=2)
-    print(f"Wrote id to row mapping json: {ID_ROW_JSON}")
-    return id_to_row
+    print(
+        f"Headlines: {counts['rows']:,} rows, {counts['prompts']:,} distinct prompts "
+        f"({counts['rows'] - counts['prompts']:,} requests saved by deduplication)"
+    )
+    print(f"Number of requests queued: {counts['queued']:,} (plus {counts['cached']:,} answered from the cache)")
+    if cache is not None:
+        cache.report()
+    print(f"Wrote id to row mapping parquet: {ID_ROW_PARQUET}")
+    return counts
+
+
+def cache_batch_output(
+    cache: ResponseCache, model: str, path: Path = BATCH_OUTPUT_JSONL, id_map_path: Path = ID_ROW_PARQUET
+) -> int:
+    """Helper method to store the successful responses of a downloaded batch output in the cache.
 
+    Args:
+        cache (ResponseCache): The response cache to fill.
+        model (str): The OpenAI model the requests were sent to.
+        path (Path): The combined batch output JSONL.
+        id_map_path (Path): Id to row mapping from `make_requests_jsonl`, holding each request's cache key.
 
-def upload_batch_file(client: OpenAI) -> str:
-    """Helper method to upload the JSONL file of requests to OpenAI and return the file ID.
+    Returns:
+        int: Number of responses stored.
+    """
+    if not path.exists():
+        return 0
+    id_map = pd.read_parquet(id_map_path, columns=["custom_id", "cache_key"]).drop_duplicates("custom_id")
+    cache_keys = dict(zip(id_map["custom_id"], id_map["cache_key"]))
+    items = []
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            obj = json.loads(line)
+            cache_key = cache_keys.get(obj.get("custom_id"))
+            response = obj.get("response") or {}
+            if cache_key is None or response.get("status_code") != 200:
+                continue
+            choices = (response.get("body") or {}).get("choices") or []
+            if choices and (choices[0].get("message") or {}).get("content"):
+                items.append((cache_key, model, json.dumps(response)))
+    cache.put_many(items)
+    print(f"Cached {len(items):,} new responses")
+    return len(items)
+
+
+def shard_requests_jsonl(
+    path: Path = REQUESTS_JSONL,
+    out_dir: Path = REQUESTS_SHARD_DIR,
+    max_requests: int = OPENAI_BATCH_MAX_REQUESTS,
+    max_bytes: int = OPENAI_BATCH_MAX_BYTES,
+) -> list[Path]:
+    """Helper method to split the requests JSONL into files that each fit in one OpenAI batch.
+
+    Lines are copied as raw bytes, so a shard starts a new file as soon as the next
+    request would take it over `max_requests` lines or `max_bytes` bytes.
+
+    Args:
+        path (Path): The full requests JSONL written by `make_requests_jsonl`.
+        out_dir (Path): Directory for the shard files; old shards in it are removed.
+        max_requests (int): Maximum requests per shard.
+        max_bytes (int): Maximum bytes per shard file.
+
+    Returns:
+        list[Path]: The shard files, in request order.
+    """
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for old in out_dir.glob("requests-*.jsonl"):
+        old.unlink()
+
+    shards: list[Path] = []
+    out = None
+    n_requests = n_bytes = 0
+    try:
+        with path.open("rb") as f:
+            for line in f:
+                if len(line) > max_bytes:
+                    raise ValueError(f"A single request is {len(line):,} bytes, over the {max_bytes:,} byte limit")
+                if out is None or n_requests == max_requests or n_bytes + len(line) > max_bytes:
+                    if out is not None:
+                        out.close()
+                    shards.append(out_dir / f"requests-{len(shards):05d}.jsonl")
+                    out = shards[-1].open("wb")
+                    n_requests = n_bytes = 0
+                out.write(line)
+                n_requests += 1
+                n_bytes += len(line)
+    finally:
+        if out is not None:
+            out.close()
+
+    print(f"Split {path.name} into {len(shards)} batch file(s) in {out_dir}")
+    return shards
+
+
+def upload_batch_file(client: OpenAI, path: Path = REQUESTS_JSONL) -> str:
+    """Helper method to upload a JSONL file of requests to OpenAI and return the file ID.
 
     Args:
         client (OpenAI): An instance of the OpenAI client.
+        path (Path): The requests JSONL file to upload.
 
     Returns:
         str: The file ID of the uploaded batch file.
     """
-    with REQUESTS_JSONL.open("rb") as fp:
+    with path.open("rb") as fp:
         uploaded = client.files.create(
             file=fp,
             purpose="batch",
         )
     file_id = uploaded.id
-    print(f"Uploaded batch file: {file_id}")
+    print(f"Uploaded batch file {path.name}: {file_id}")
     return file_id
 
 
-def create_batch_job(client: OpenAI, input_file_id: str) -> str:
+def create_batch_job(client: OpenAI, input_file_id: str, shard: str | None = None) -> str:
     """Helper method to create an OpenAI batch job with the given input file ID.
 
     Args:
         client (OpenAI): An instance of the OpenAI client.
         input_file_id (str): The file ID of the uploaded batch file containing the requests.
+        shard (str | None): Shard name recorded in the batch metadata, if sharded.
 
     Returns:
         str: The batch job ID of the created batch job.
     """
+    metadata = {"job_name": "ravenpack_headline_scoring"}
+    if shard is not None:
+        metadata["shard"] = shard
     batch = client.batches.create(
         input_file_id=input_file_id,
         endpoint="/v1/chat/completions",
         completion_window="24h",
-        metadata={"job_name": "ravenpack_headline_scoring"},
+        metadata=metadata,
     )
     batch_id = batch.id
     print(f"Created batch job: {batch_id}")
@@ -199,16 +434,259 @@ def poll_for_batch_job(client: OpenAI, batch_id: str, poll_seconds: int = 15):
     Returns:
         Batch: The retrieved batch data when it reaches a terminal state.
     """
-    terminal_states = {"completed", "failed", "expired", "cancelled"}
     while True:
         data = client.batches.retrieve(batch_id)
         status = data.status
         print(f"Batch status: {status}")
-        if status in terminal_states:
+        if status in TERMINAL_BATCH_STATES:
             return data
         time.sleep(poll_seconds)
 
 
+def cancel_stale_batch(client: OpenAI | None, shard: str, entry: dict, reason: str) -> bool:
+    """Helper method to cancel the batch of a manifest entry that is being replaced, if it may still be running.
+
+    Args:
+        client (OpenAI | None): An instance of the OpenAI client; None only logs a warning.
+        shard (str): Name of the shard the entry belonged to.
+        entry (dict): The replaced manifest entry.
+        reason (str): Why the entry is replaced, for the log message.
+
+    Returns:
+        bool: True if a cancel request was sent.
+    """
+    batch_id = entry.get("batch_id")
+    if not batch_id or entry.get("status") in TERMINAL_BATCH_STATES:
+        return False
+    if client is None:
+        print(f"WARNING: Batch {batch_id} of {shard} may still be running but {reason}; cancel it manually.")
+        return False
+    try:
+        client.batches.cancel(batch_id)
+    except Exception as e:
+        print(f"WARNING: Could not cancel batch {batch_id} of {shard} ({e!r}); cancel it manually.")
+        return False
+    print(f"Cancelled batch {batch_id} of {shard} because {reason}")
+    return True
+
+
+class BatchManifest:
+    """Per-shard progress of the OpenAI batches (input file id, batch id, status,
+    output/error file ids), saved to JSON after every change so that a rerun of
+    `main()` can reattach to batches already submitted instead of paying again.
+
+    Args:
+        path (Path | None): JSON file to persist to; None keeps the manifest in memory only.
+    """
+
+    def __init__(self, path: Path | None = BATCH_MANIFEST_JSON):
+        self.path = path
+        self.shards: dict[str, dict] = {}
+        self._lock = threading.Lock()
+        if path is not None and path.exists():
+            self.shards = json.loads(path.read_text(encoding="utf-8")).get("shards", {})
+
+    def entry(self, shard_path: Path, client: OpenAI | None = None) -> dict:
+        """Return a copy of the shard's entry, starting a fresh one if the shard's content changed.
+
+        A batch still running for the old content is cancelled through `client`
+        (or reported, without a client) so it does not keep running unseen.
+        """
+        digest = hashlib.sha256(shard_path.read_bytes()).hexdigest()
+        stale = None
+        with self._lock:
+            entry = self.shards.get(shard_path.stem)
+            if entry is None or entry.get("sha256") != digest:
+                stale = entry
+                entry = self.shards[shard_path.stem] = {"sha256": digest}
+                self._save()
+            entry = dict(entry)
+        if stale is not None:
+            cancel_stale_batch(client, shard_path.stem, stale, "its requests changed")
+        return entry
+
+    def update(self, shard: str, **fields) -> None:
+        """Set fields of a shard's entry and save."""
+        with self._lock:
+            self.shards[shard].update(fields)
+            self._save()
+
+    def shard_for_batch(self, batch_id: str) -> str | None:
+        """Name of the shard submitted as `batch_id`, if any."""
+        for name, entry in self.shards.items():
+            if entry.get("batch_id") == batch_id:
+                return name
+        return None
+
+    def retain(self, shards: list[str], client: OpenAI | None = None) -> None:
+        """Drop entries of shards that are no longer part of the run, cancelling their running batches."""
+        with self._lock:
+            dropped = {name: entry for name, entry in self.shards.items() if name not in shards}
+            self.shards = {name: self.shards[name] for name in shards if name in self.shards}
+            self._save()
+        for name, entry in dropped.items():
+            cancel_stale_batch(client, name, entry, "it is no longer part of the run")
+
+    def _save(self) -> None:
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f"_{self.path.name}.tmp")
+        tmp.write_text(json.dumps({"shards": self.shards}, indent=2), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+
+def submit_batch_shards(
+    client: OpenAI,
+    shard_paths: list[Path],
+    max_workers: int = OPENAI_BATCH_WORKERS,
+    manifest: BatchManifest | None = None,
+) -> list[str]:
+    """Helper method to upload each shard and create its batch job, several shards at a time.
+
+    Shards that the manifest already has a live or completed batch for are reattached
+    without any API call, and an input file that was uploaded before a crash is reused.
+    Batches of shards whose content changed or that were dropped are cancelled.
+
+    Args:
+        client (OpenAI): An instance of the OpenAI client.
+        shard_paths (list[Path]): Shard files from `shard_requests_jsonl`.
+        max_workers (int): Number of shards uploaded and created concurrently.
+        manifest (BatchManifest | None): Progress record to resume from and update.
+
+    Returns:
+        list[str]: Batch job IDs, in the same order as `shard_paths`.
+    """
+    manifest = manifest if manifest is not None else BatchManifest(path=None)
+    manifest.retain([path.stem for path in shard_paths], client=client)
+
+    def _submit(path: Path) -> str:
+        entry = manifest.entry(path, client=client)
+        if entry.get("batch_id") and entry.get("status") not in RETRY_BATCH_STATES:
+            print(f"Reattaching {path.stem} to batch {entry['batch_id']} ({entry.get('status')})")
+            return entry["batch_id"]
+        input_file_id = entry.get("input_file_id")
+        if not input_file_id:
+            input_file_id = upload_batch_file(client, path)
+            manifest.update(path.stem, input_file_id=input_file_id)
+        batch_id = create_batch_job(client, input_file_id, shard=path.stem)
+        manifest.update(
+            path.stem,
+            batch_id=batch_id,
+            status="validating",
+            output_file_id=None,
+            error_file_id=None,
+            downloaded=False,
+        )
+        return batch_id
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(_submit, shard_paths))
+
+
+def poll_batch_jobs(
+    client: OpenAI,
+    batch_ids: list[str],
+    poll_seconds: int = 15,
+    manifest: BatchManifest | None = None,
+) -> list:
+    """Helper method to poll a set of OpenAI batch jobs together until all reach a terminal state.
+
+    Args:
+        client (OpenAI): An instance of the OpenAI client.
+        batch_ids (list[str]): The batch job IDs to poll for.
+        poll_seconds (int): The number of seconds to wait between polling rounds.
+        manifest (BatchManifest | None): Progress record to update with each batch's status.
+
+    Returns:
+        list[Batch]: The final batch data, in the same order as `batch_ids`.
+    """
+    done: dict[str, object] = {}
+    while True:
+        pending = [b for b in batch_ids if b not in done]
+        with ThreadPoolExecutor(max_workers=OPENAI_BATCH_WORKERS) as executor:
+            for data in executor.map(client.batches.retrieve, pending):
+                shard = manifest.shard_for_batch(data.id) if manifest is not None else None
+                if shard is not None:
+                    manifest.update(
+                        shard,
+                        status=data.status,
+                        output_file_id=getattr(data, "output_file_id", None),
+                        error_file_id=getattr(data, "error_file_id", None),
+                    )
+                if data.status in TERMINAL_BATCH_STATES:
+                    done[data.id] = data
+        statuses = {}
+        for data in done.values():
+            statuses[data.status] = statuses.get(data.status, 0) + 1
+        n_requests = sum(getattr(d.request_counts, "completed", 0) or 0 for d in done.values())
+        print(
+            f"Batches finished: {len(done)}/{len(batch_ids)} {statuses} "
+            f"({n_requests:,} requests completed)",
+            flush=True,
+        )
+        if len(done) == len(batch_ids):
+            return [done[b] for b in batch_ids]
+        time.sleep(poll_seconds)
+
+
+def download_batch_results(
+    client: OpenAI,
+    batches: list,
+    out_dir: Path = BATCH_SHARD_DIR,
+    max_workers: int = OPENAI_BATCH_WORKERS,
+    manifest: BatchManifest | None = None,
+) -> None:
+    """Helper method to download every batch's output and error files in parallel and
+    concatenate them, in shard order, into BATCH_OUTPUT_JSONL and BATCH_ERROR_JSONL.
+
+    Args:
+        client (OpenAI): An instance of the OpenAI client.
+        batches (list[Batch]): Final batch data from `poll_batch_jobs`.
+        out_dir (Path): Directory for the per-shard output and error files.
+        max_workers (int): Number of files downloaded concurrently.
+        manifest (BatchManifest | None): Progress record; shards it marks as downloaded
+            are not fetched again if their files are still on disk.
+    """
+    jobs = {"output": [], "error": []}
+    for i, data in enumerate(batches):
+        if data.output_file_id:
+            jobs["output"].append((data.id, data.output_file_id, out_dir / f"output-{i:05d}.jsonl"))
+        elif data.status == "completed":
+            print(f"Batch {data.id} completed but output_file_id is missing.")
+        if data.error_file_id:
+            jobs["error"].append((data.id, data.error_file_id, out_dir / f"errors-{i:05d}.jsonl"))
+
+    def _shard(batch_id: str) -> str | None:
+        return manifest.shard_for_batch(batch_id) if manifest is not None else None
+
+    todo = [
+        job
+        for job in jobs["output"] + jobs["error"]
+        if not (_shard(job[0]) and manifest.shards[_shard(job[0])].get("downloaded") and job[2].exists())
+    ]
+    if len(todo) < len(jobs["output"]) + len(jobs["error"]):
+        print(f"Reusing {len(jobs['output']) + len(jobs['error']) - len(todo)} file(s) downloaded by an earlier run")
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        list(executor.map(lambda job: download_file_content(client, job[1], job[2]), todo))
+    for batch_id in {job[0] for job in todo}:
+        if _shard(batch_id):
+            manifest.update(_shard(batch_id), downloaded=True)
+
+    for kind, combined in [("output", BATCH_OUTPUT_JSONL), ("error", BATCH_ERROR_JSONL)]:
+        combined.unlink(missing_ok=True)
+        # The output file is written even when empty (e.g. every headline was cached)
+        if not jobs[kind] and kind == "error":
+            continue
+        combined.parent.mkdir(parents=True, exist_ok=True)
+        with combined.open("wb") as out:
+            for _, _, path in jobs[kind]:
+                with path.open("rb") as f:
+                    for chunk in iter(lambda: f.read(1 << 20), b""):
+                        out.write(chunk)
+        print(f"Combined {len(jobs[kind])} {kind} file(s) into: {combined}")
+
+
 def download_file_content(client: OpenAI, file_id: str, out_path: Path) -> None:
     """Helper method to download the content of a file from OpenAI given its file ID, and save it to the specified path.
 
@@ -247,37 +725,32 @@ def main():
     print(f"Using input parquet: {input_path}")
     print(f"Using model: {OPENAI_MODEL}")
 
-    full_df = pd.read_parquet(input_path)
-    df = full_df.iloc[500:510]  # for testing, remove this later
-    # TEH TODO: create jsonl per 50,000 rows
-    id_to_row = make_requests_jsonl(df, model=OPENAI_MODEL)
+    cache = ResponseCache() if OPENAI_RESPONSE_CACHE else None
+    counts = make_requests_jsonl(input_path, model=OPENAI_MODEL, cache=cache, max_rows=OPENAI_HEADLINE_LIMIT)
 
-    input_file_id = upload_batch_file(openai_client)
-    batch_id = create_batch_job(openai_client, input_file_id)
-    batch_data = poll_for_batch_job(openai_client, batch_id)
+    # Rerunning after a crash reattaches to the batches recorded here
+    manifest = BatchManifest()
+    shard_paths = shard_requests_jsonl()
+    batch_ids = submit_batch_shards(openai_client, shard_paths, manifest=manifest)
+    batches = poll_batch_jobs(openai_client, batch_ids, manifest=manifest)
 
     METADATA_JSON.parent.mkdir(parents=True, exist_ok=True)
     METADATA_JSON.write_text(
-        json.dumps(batch_data.model_dump(), indent=2, default=str),
+        json.dumps([data.model_dump() for data in batches], indent=2, default=str),
         encoding="utf-8",
     )
     print(f"Saved batch metadata to: {METADATA_JSON}")
 
-    status = batch_data.status
-    if status != "completed":
-        raise RuntimeError(f"Batch job did not complete successfully. Status: {status}")
+    download_batch_results(openai_client, batches, manifest=manifest)
+    if cache is not None:
+        cache_batch_output(cache, model=OPENAI_MODEL)
+        cache.close()
 
-    output_file_id = batch_data.output_file_id
-    error_file_id = batch_data.error_file_id
-    if not output_file_id:
-        print("Batch completed but output_file_id is missing.")
-    else:
-        download_file_content(openai_client, output_file_id, BATCH_OUTPUT_JSONL)
-        
-    if error_file_id:
-        download_file_content(openai_client, error_file_id, BATCH_ERROR_JSONL)
-    
-    return id_to_row
+    failed = {data.id: data.status for data in batches if data.status != "completed"}
+    if failed:
+        raise RuntimeError(f"{len(failed)} of {len(batches)} batch jobs did not complete successfully: {failed}")
+
+    return counts
 
 
 if __name__ == "__main__":
@@ -0,0 +1,231 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import clean_ravenpack
+from clean_ravenpack import (
+    incremental_osa_dedupe_mask,
+    keep_masks_from_edges,
+    osa_dedupe_mask,
+    osa_keep_mask,
+    osa_similarity_edges,
+    window_near_duplicate_mask,
+)
+from time_tools import overnight_mask
+
+
+def test_osa_keep_mask_greedy_against_kept_only():
+    # "b" is close to "a" and dropped; "c" is close to "b" but not to "a", so kept
+    headlines = ["apple shares rise", "apple shares rose", "apple share rose!", ""]
+    stats = {}
+    result = osa_keep_mask(headlines, threshold=0.85, stats=stats)
+    assert result.tolist() == [True, False, True, False]
+    assert stats["pairs_considered"] == 2
+    assert stats["pairs_computed"] + stats["pairs_pruned_length"] + stats["pairs_pruned_bag"] == 2
+    assert (stats["kept"], stats["dropped"]) == (2, 2)
+
+
+def test_osa_keep_mask_length_bound_prunes_without_computing():
+    stats = {}
+    result = osa_keep_mask(["short", "a much much longer headline"], stats=stats)
+    assert result.tolist() == [True, True]
+    assert stats["pairs_pruned_length"] == 1 and stats["pairs_computed"] == 0
+
+
+def test_osa_dedupe_mask_ranks_by_relevance_within_firm_day():
+    df = pd.DataFrame(
+        {
+            "rp_entity_id": ["A", "A", "A", "B", None],
+            "rpa_date_utc": pd.to_datetime(["2022-01-03"] * 5),
+            "timestamp_utc": pd.to_datetime(
+                ["2022-01-03 10:00", "2022-01-03 09:00", "2022-01-03 11:00",
+                 "2022-01-03 09:00", "2022-01-03 09:00"]
+            ),
+            "event_relevance": [50, 100, 90, 100, 100],
+            "headline": ["Acme beats earnings", "Acme beats earnings!", "CEO quits", "", ""],
+        },
+        index=[10, 11, 12, 13, 14],
+    )
+    result = osa_dedupe_mask(df)
+    assert result.index.equals(df.index)
+    assert np.array_equal(result.to_numpy(), [False, True, True, True, True])
+
+
+def _random_headlines(n=2_000, seed=0):
+    rng = np.random.default_rng(seed)
+    words = ["acme", "beats", "earnings", "shares", "rise", "fall", "ceo", "quits"]
+    return pd.DataFrame(
+        {
+            "rp_entity_id": rng.choice([f"E{i}" for i in range(20)], n),
+            "rpa_date_utc": pd.Timestamp("2022-01-01") + pd.to_timedelta(rng.integers(0, 10, n), "D"),
+            "timestamp_utc": pd.Timestamp("2022-01-01") + pd.to_timedelta(rng.integers(0, 10**6, n), "s"),
+            "event_relevance": rng.choice([100, 90, 50], n),
+            "headline": [" ".join(rng.choice(words, rng.integers(0, 5))) for _ in range(n)],
+        }
+    )
+
+
+def test_osa_dedupe_mask_process_pool_matches_serial():
+    df = _random_headlines()
+    n = len(df)
+    serial = osa_dedupe_mask(df)
+    parallel = osa_dedupe_mask(df, workers=2)
+    assert 0 < serial.sum() < n
+    pd.testing.assert_series_equal(parallel, serial)
+
+
+def test_threshold_sweep_from_edges_matches_direct_dedupe():
+    df = _random_headlines(seed=1)
+    edges = osa_similarity_edges(df, floor=0.40)
+    masks = keep_masks_from_edges(df, edges, [0.5, 0.6, 0.8])
+    for t, keep in masks.items():
+        assert np.array_equal(keep, osa_dedupe_mask(df, threshold=t).to_numpy())
+
+
+def test_window_dedupe_catches_repeat_across_midnight():
+    df = pd.DataFrame(
+        {
+            "rp_entity_id": ["A", "A", "B", "A", "A"],
+            "timestamp_utc": pd.to_datetime(
+                ["2022-01-03 23:50", "2022-01-04 00:10", "2022-01-04 00:20",
+                 "2022-01-04 01:00", "2022-01-06 00:00"],
+                utc=True,
+            ),
+            "headline": [
+                "Acme Corp raises full-year guidance",
+                "ACME Corp raises full year guidance",
+                "Acme Corp raises full-year guidance",
+                "Acme CEO to step down",
+                "Acme Corp raises full-year guidance",
+            ],
+        }
+    )
+    stats = {}
+    result = window_near_duplicate_mask(df, window=pd.Timedelta(hours=24), stats=stats)
+    # Row 2 is another entity; row 4 is outside the 24h window
+    assert result.tolist() == [True, False, True, True, True]
+    assert stats["window_dropped"] == 1
+
+
+def test_incremental_dedupe_only_redoes_changed_firm_days(tmp_path):
+    state = tmp_path / "state.parquet"
+    df = _random_headlines(seed=2)
+    first = {}
+    incremental_osa_dedupe_mask(df, state_path=state, stats=first)
+
+    changed = df.copy()
+    day = changed["rpa_date_utc"] == changed["rpa_date_utc"].min()
+    firm_day = day & (changed["rp_entity_id"] == "E0")
+    changed.loc[firm_day, "headline"] = changed.loc[firm_day, "headline"] + " again"
+    changed = pd.concat([changed, changed[firm_day].head(1)], ignore_index=True)
+
+    second = {}
+    result = incremental_osa_dedupe_mask(changed, state_path=state, stats=second)
+    pd.testing.assert_series_equal(result, osa_dedupe_mask(changed))
+    assert second["firm_days_deduped"] == 1
+    assert second["firm_days_reused"] == first["firm_days_deduped"] - 1
+
+
+def _write_clean_inputs(tmp_path, monkeypatch):
+    rp = _random_headlines(seed=3)
+    rp["map_ticker"] = rp["rp_entity_id"].str.replace("E", " t") + np.where(rp.index % 7 == 0, "", " ")
+    rp["timestamp_utc"] = rp["timestamp_utc"].dt.tz_localize("UTC")
+    rp.to_parquet(tmp_path / "RAVENPACK.parquet", index=False)
+    pd.DataFrame({"ticker": [f"T{i}" for i in range(0, 20, 2)]}).to_parquet(
+        tmp_path / "CRSP_unique_tickers.parquet"
+    )
+    monkeypatch.setattr(clean_ravenpack, "DATA_DIR", tmp_path)
+    monkeypatch.setattr(clean_ravenpack, "CRSP_TICKERS_FILE", tmp_path / "CRSP_unique_tickers.parquet")
+    monkeypatch.setattr(clean_ravenpack, "RAVENPACK_FILE", tmp_path / "RAVENPACK.parquet")
+    monkeypatch.setattr(clean_ravenpack, "OUTPUT_FILE", tmp_path / "pandas.parquet")
+    return rp
+
+
+def test_polars_engine_matches_pandas_engine(tmp_path, monkeypatch):
+    rp = _write_clean_inputs(tmp_path, monkeypatch)
+    clean_ravenpack.main()
+    clean_ravenpack.clean_ravenpack_polars(data_dir=tmp_path, output_file=tmp_path / "polars.parquet")
+
+    expected = pd.read_parquet(tmp_path / "pandas.parquet")
+    result = pd.read_parquet(tmp_path / "polars.parquet")
+    assert 0 < len(result) < len(rp)
+    pd.testing.assert_frame_equal(result, expected)
+
+
+def test_out_of_core_engine_matches_pandas_engine(tmp_path, monkeypatch):
+    _write_clean_inputs(tmp_path, monkeypatch)
+    clean_ravenpack.main()
+    counts = clean_ravenpack.clean_ravenpack_out_of_core(
+        data_dir=tmp_path, output_file=tmp_path / "streaming.parquet", n_buckets=4, batch_rows=300
+    )
+
+    key = ["rp_entity_id", "timestamp_utc", "headline"]
+    expected = pd.read_parquet(tmp_path / "pandas.parquet").sort_values(key).reset_index(drop=True)
+    result = pd.read_parquet(tmp_path / "streaming.parquet").sort_values(key).reset_index(drop=True)
+    assert counts["rows_after_timing"] == len(expected)
+    pd.testing.assert_frame_equal(result, expected)
+
+
+def test_main_rejects_unknown_engine_and_streaming_sweep(tmp_path, monkeypatch):
+    _write_clean_inputs(tmp_path, monkeypatch)
+    monkeypatch.setattr(clean_ravenpack, "CLEAN_ENGINE", "stream")
+    with pytest.raises(ValueError, match="CLEAN_ENGINE"):
+        clean_ravenpack.main()
+    monkeypatch.setattr(clean_ravenpack, "CLEAN_ENGINE", "streaming")
+    monkeypatch.setattr(clean_ravenpack, "OSA_SWEEP_THRESHOLDS", [0.6])
+    with pytest.raises(ValueError, match="OSA_SWEEP_THRESHOLDS"):
+        clean_ravenpack.main()
+    assert not (tmp_path / "pandas.parquet").exists()
+
+
+def test_threshold_sweep_columns_do_not_collide(tmp_path, monkeypatch):
+    monkeypatch.setattr(clean_ravenpack, "EDGES_FILE", tmp_path / "edges.parquet")
+    monkeypatch.setattr(clean_ravenpack, "SWEEP_OUTPUT_FILE", tmp_path / "sweep.parquet")
+    df = _random_headlines(seed=4)
+    out = clean_ravenpack.run_threshold_sweep(df, [0.61, 0.605, 0.61])
+    assert [c for c in out.columns if c.startswith("kept_at_")] == ["kept_at_0.605", "kept_at_0.61"]
+    assert np.array_equal(
+        out["kept_at_0.605"].to_numpy(), osa_dedupe_mask(df, threshold=0.605).to_numpy()[overnight_mask(df)]
+    )
+
+
+def _step2_log(text):
+    return text[text.index("=== Step 2:") : text.index("=== Step 3:")]
+
+
+def test_polars_engine_reports_same_dedupe_stats(tmp_path, monkeypatch, capsys):
+    _write_clean_inputs(tmp_path, monkeypatch)
+    monkeypatch.setattr(clean_ravenpack, "OSA_WINDOW_HOURS", 24.0)
+    clean_ravenpack.main()
+    expected = _step2_log(capsys.readouterr().out)
+    clean_ravenpack.clean_ravenpack_polars(data_dir=tmp_path, output_file=tmp_path / "polars.parquet")
+    result = _step2_log(capsys.readouterr().out)
+
+    assert "Step 2b" in expected and "pruned by length bound" in expected
+    assert result == expected
+
+
+def test_out_of_core_engine_reports_same_dedupe_stats(tmp_path, monkeypatch, capsys):
+    _write_clean_inputs(tmp_path, monkeypatch)
+    monkeypatch.setattr(clean_ravenpack, "OSA_WINDOW_HOURS", 24.0)
+    clean_ravenpack.main()
+    expected = _step2_log(capsys.readouterr().out)
+    clean_ravenpack.clean_ravenpack_out_of_core(
+        data_dir=tmp_path, output_file=tmp_path / "streaming.parquet", n_buckets=4, batch_rows=300
+    )
+    assert _step2_log(capsys.readouterr().out) == expected
+
+
+def test_out_of_core_engine_honours_incremental_dedupe(tmp_path, monkeypatch):
+    _write_clean_inputs(tmp_path, monkeypatch)
+    monkeypatch.setattr(clean_ravenpack, "OSA_INCREMENTAL", True)
+    monkeypatch.setattr(clean_ravenpack, "OSA_STATE_FILE", tmp_path / "osa_state.parquet")
+    run = {"data_dir": tmp_path, "output_file": tmp_path / "streaming.parquet", "n_buckets": 4, "batch_rows": 300}
+    first = clean_ravenpack.clean_ravenpack_out_of_core(**run)
+    expected = pd.read_parquet(tmp_path / "streaming.parquet")
+    assert len(list(tmp_path.glob("osa_state_bucket=*_of_4.parquet"))) == 4
+
+    second = clean_ravenpack.clean_ravenpack_out_of_core(**run)
+    assert second["firm_days_deduped"] == 0
+    assert second["firm_days_reused"] == first["firm_days_deduped"] > 0
+    pd.testing.assert_frame_equal(pd.read_parquet(tmp_path / "streaming.parquet"), expected)
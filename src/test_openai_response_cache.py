@@ -0,0 +1,48 @@
+import time
+
+from openai_response_cache import ResponseCache, response_cache_key
+
+
+def test_cache_key_covers_every_request_field():
+    key = response_cache_key("m", "system", "user", 0)
+    assert key == response_cache_key("m", "system", "user", 0)
+    others = [
+        response_cache_key("m2", "system", "user", 0),
+        response_cache_key("m", "system2", "user", 0),
+        response_cache_key("m", "system", "user2", 0),
+        response_cache_key("m", "system", "user", 0.5),
+    ]
+    assert key not in others and len(set(others)) == 4
+
+
+def test_get_many_put_many_and_counters_persist(tmp_path):
+    path = tmp_path / "cache.sqlite"
+    cache = ResponseCache(path)
+    assert cache.get_many(["a", "b"]) == {}
+    cache.put_many([("a", "m", '{"status_code": 200}')])
+    assert cache.get_many(["a", "a", "b"]) == {"a": '{"status_code": 200}'}
+    assert (cache.hits, cache.misses) == (2, 3)
+    cache.close()
+
+    reopened = ResponseCache(path)
+    assert reopened.get_many(["a"]) == {"a": '{"status_code": 200}'}
+    stats = reopened.stats()
+    assert (stats["entries"], stats["hits"], stats["total_hits"], stats["total_misses"]) == (1, 1, 3, 3)
+    reopened.close()
+
+
+def test_eviction_drops_least_recently_used_first(tmp_path):
+    response = "x" * 1000
+    # Room for two responses
+    cache = ResponseCache(tmp_path / "cache.sqlite", max_gb=2500 / 1024**3)
+    cache.put_many([("a", "m", response)])
+    time.sleep(0.01)
+    cache.put_many([("b", "m", response)])
+    time.sleep(0.01)
+    cache.get_many(["a"])  # "b" is now the least recently used
+    time.sleep(0.01)
+    cache.put_many([("c", "m", response)])
+
+    assert set(cache.get_many(["a", "b", "c"])) == {"a", "c"}
+    assert cache.stats()["bytes"] == 2000
+    cache.close()
@@ -0,0 +1,121 @@
+import shutil
+
+import duckdb
+import pandas as pd
+
+import local_wrds
+import pull_CRSP_stock
+import wrds_tools
+
+
+def test_crsp_streaming_pull_matches_in_memory_pull(local_backend):
+    expected = pull_CRSP_stock.pull_crsp_daily_file(
+        start_date="2022-01-01", end_date="2022-12-31"
+    )
+    path = local_backend / "CRSP_stock_daily.parquet"
+    stats = pull_CRSP_stock.pull_crsp_daily_file_streaming(
+        path, start_date="2022-01-01", end_date="2022-12-31", chunk_rows=1_000
+    )
+    result = pd.read_parquet(path)
+
+    assert stats["rows"] == len(expected)
+    pd.testing.assert_frame_equal(
+        result.reset_index(drop=True),
+        expected.reset_index(drop=True),
+        check_dtype=False,
+    )
+
+
+def test_crsp_sharded_pull_matches_in_memory_pull(local_backend, monkeypatch):
+    permnos = list(range(10_000, 10_040))
+    monkeypatch.setattr(pull_CRSP_stock, "PERMNO_TEMP_TABLE_MIN", 10)
+    expected = pull_CRSP_stock.pull_crsp_daily_file(
+        start_date="2022-01-15", end_date="2022-04-10", permnos=permnos
+    )
+    pull_CRSP_stock.pull_crsp_daily_sharded(
+        data_dir=local_backend,
+        start_date="2022-01-15",
+        end_date="2022-04-10",
+        permnos=permnos,
+        max_workers=2,
+    )
+    result = pull_CRSP_stock.load_crsp_daily_file(
+        local_backend, start_date="2022-02-01", end_date="2022-03-31"
+    )
+
+    key = ["permno", "dlycaldt"]
+    expected = expected[expected["dlycaldt"].between("2022-02-01", "2022-03-31")]
+    assert len(result) > 0
+    pd.testing.assert_frame_equal(
+        result.sort_values(key).reset_index(drop=True),
+        expected.sort_values(key).reset_index(drop=True),
+        check_dtype=False,
+    )
+
+
+def test_adjusted_prices_restart_per_permno():
+    df = pd.DataFrame(
+        {
+            "permno": [2, 1, 2, 1, 1],
+            "dlycaldt": pd.to_datetime(
+                ["2022-01-03", "2022-01-04", "2022-01-04", "2022-01-03", "2022-01-05"]
+            ),
+            "dlyfacprc": [2.0, 3.0, 5.0, 0.5, None],
+            **{c: [10.0, 20.0, 30.0, 40.0, 50.0] for c in pull_CRSP_stock.PRICE_COLS},
+        }
+    )
+    result = pull_CRSP_stock.add_adjusted_prices(df, initial_factors={2: 10.0})
+
+    assert result["permno"].tolist() == [1, 1, 1, 2, 2]
+    factor = result["daily_cum_price_adj_factor"].tolist()
+    assert factor[:2] == [0.5, 1.5] and pd.isna(factor[2])
+    assert factor[3:] == [20.0, 100.0]
+    assert result["dlyclose_adj"].tolist()[:2] == [40.0 * 0.5, 20.0 * 1.5]
+
+
+def test_crsp_streaming_carry_skips_nan_factor_at_chunk_end(local_backend, local_db, monkeypatch):
+    db_path = local_backend / "nan_factors.duckdb"
+    shutil.copy(local_db, db_path)
+    con = duckdb.connect(str(db_path))
+    # A split early in the window, then a run of missing factors long enough
+    # that some chunk of 7 rows ends inside it
+    con.execute(
+        "UPDATE CRSPM.DSF_V2 SET dlyfacprc = 2 WHERE permno = 10001 AND dlycaldt = DATE '2022-01-03'"
+    )
+    con.execute(
+        "UPDATE CRSPM.DSF_V2 SET dlyfacprc = NULL "
+        "WHERE permno = 10001 AND dlycaldt BETWEEN DATE '2022-02-01' AND DATE '2022-03-15'"
+    )
+    con.close()
+    monkeypatch.setattr(local_wrds, "LOCAL_WRDS_DB", db_path)
+
+    window = {"start_date": "2022-01-01", "end_date": "2022-06-30", "permnos": [10000, 10001, 10002]}
+    expected = pull_CRSP_stock.pull_crsp_daily_file(**window)
+    path = local_backend / "CRSP_stock_daily.parquet"
+    pull_CRSP_stock.pull_crsp_daily_file_streaming(path, chunk_rows=7, **window)
+    result = pd.read_parquet(path)
+
+    after = expected[(expected["permno"] == 10001) & (expected["dlycaldt"] > "2022-03-15")]
+    assert (after["daily_cum_price_adj_factor"] >= 2).all()
+    pd.testing.assert_frame_equal(
+        result.reset_index(drop=True), expected.reset_index(drop=True), check_dtype=False
+    )
+
+
+def test_cached_sharded_crsp_pull_does_not_connect(local_backend, monkeypatch):
+    monkeypatch.setattr(wrds_tools, "WRDS_QUERY_CACHE", True)
+    monkeypatch.setattr(wrds_tools, "QUERY_CACHE_DIR", local_backend / "queries")
+    monkeypatch.setattr(pull_CRSP_stock, "PERMNO_TEMP_TABLE_MIN", 10)
+    window = {"start_date": "2022-01-15", "end_date": "2022-04-10", "permnos": list(range(10_000, 10_040))}
+    first = pull_CRSP_stock.pull_crsp_daily_sharded(data_dir=local_backend / "first", max_workers=2, **window)
+
+    def offline(*args, **kwargs):
+        raise AssertionError("connected to WRDS on a fully cached run")
+
+    monkeypatch.setattr(wrds_tools, "_open_backend", offline)
+    second = pull_CRSP_stock.pull_crsp_daily_sharded(
+        data_dir=local_backend / "second", max_workers=2, retries=0, **window
+    )
+    pd.testing.assert_frame_equal(
+        pull_CRSP_stock.load_crsp_daily_file(second.parent), pull_CRSP_stock.load_crsp_daily_file(first.parent)
+    )
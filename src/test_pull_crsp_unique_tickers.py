@@ -0,0 +1,23 @@
+import pandas as pd
+
+import pull_crsp_unique_tickers
+
+
+def test_single_pass_tickers_match_distinct_query(local_backend):
+    window = {"start_date": "2022-03-01", "end_date": "2022-08-31"}
+    expected = pull_crsp_unique_tickers.pull_crsp_unique_tickers(**window)
+    streamed = pull_crsp_unique_tickers.pull_crsp_daily_and_tickers(
+        data_dir=local_backend,
+        daily_start_date="2022-01-01",
+        daily_end_date="2022-12-31",
+        chunk_rows=1_000,
+        **window,
+    )
+    derived = pull_crsp_unique_tickers.derive_crsp_unique_tickers(local_backend, **window)
+
+    assert len(expected) > 0
+    pd.testing.assert_frame_equal(streamed, expected)
+    pd.testing.assert_frame_equal(derived, expected)
+    assert pull_crsp_unique_tickers.derive_crsp_unique_tickers(
+        local_backend, start_date="2021-12-01", end_date="2022-08-31"
+    ) is None
@@ -0,0 +1,81 @@
+import pandas as pd
+import pytest
+
+import local_wrds
+import pull_crsp_unique_tickers
+import pull_ravenpack
+
+KEY = ["rp_entity_id", "timestamp_utc", "headline"]
+
+
+def _sorted(df):
+    return df[KEY].sort_values(KEY).reset_index(drop=True)
+
+
+def test_partitioned_pull_matches_serial_pull(local_backend):
+    serial = pull_ravenpack.pull_ravenpack()
+    pull_ravenpack.pull_ravenpack_partitioned(data_dir=local_backend, max_workers=2)
+    partitioned = pull_ravenpack.load_ravenpack(local_backend)
+
+    assert len(serial) > 0
+    pd.testing.assert_frame_equal(_sorted(serial), _sorted(partitioned), check_dtype=False)
+
+
+def test_incremental_pull_matches_full_pull(local_backend, monkeypatch):
+    monkeypatch.setattr(pull_ravenpack, "END_DATE", pd.Timestamp("2022-11-15"))
+    pull_ravenpack.pull_ravenpack_partitioned(data_dir=local_backend)
+    # Each refresh moves END_DATE forward and must pick up the rows after the last one
+    for end in ["2023-02-20", "2023-06-30"]:
+        watermark = pull_ravenpack.load_ravenpack(local_backend)["timestamp_utc"].max()
+        monkeypatch.setattr(pull_ravenpack, "END_DATE", pd.Timestamp(end))
+        pull_ravenpack.pull_ravenpack_incremental(data_dir=local_backend, overlap_days=3)
+
+        result = pull_ravenpack.load_ravenpack(local_backend)
+        assert (result["timestamp_utc"] > watermark).any()
+        assert result["rpa_date_utc"].max() <= pd.Timestamp(end)
+        expected = pull_ravenpack.pull_ravenpack()
+        pd.testing.assert_frame_equal(_sorted(result), _sorted(expected), check_dtype=False)
+
+
+def test_prior_years_lookback():
+    years = [2019, 2020, 2021, 2022, 2023]
+    assert pull_ravenpack._prior_years(years, 2022, lookback=0) == [2019, 2020, 2021]
+    assert pull_ravenpack._prior_years(years, 2022, lookback=1) == [2021]
+
+
+def _query_ravenpack(crsp_filter, start="2022-01-01", end="2022-12-31"):
+    db = local_wrds.LocalWRDSConnection()
+    query = pull_ravenpack._build_ravenpack_query(
+        years=pull_ravenpack.ravenpack_years(start, end, db),
+        start=start,
+        end=end,
+        entity_name_select=pull_ravenpack._entity_name_select(db),
+        crsp_filter=crsp_filter,
+    )
+    df = db.raw_sql(query, date_cols=pull_ravenpack.DATE_COLS)
+    db.close()
+    return df
+
+
+def test_crsp_filter_modes_keep_same_rows(local_backend, monkeypatch):
+    tickers = pull_crsp_unique_tickers.pull_crsp_unique_tickers(start_date="2022-01-01", end_date="2022-12-31")
+    tickers.to_parquet(local_backend / "CRSP_unique_tickers.parquet")
+    monkeypatch.setattr(pull_ravenpack, "DATA_DIR", local_backend)
+
+    unfiltered = _query_ravenpack("none")
+    universe = set(tickers["ticker"].str.upper().str.replace(r"\s+", "", regex=True))
+    in_crsp = unfiltered["map_ticker"].str.upper().str.replace(r"\s+", "", regex=True).isin(universe)
+    expected = _sorted(unfiltered[in_crsp])
+
+    assert 0 < len(expected) < len(unfiltered)
+    pd.testing.assert_frame_equal(_sorted(_query_ravenpack("upload")), expected)
+    pd.testing.assert_frame_equal(_sorted(_query_ravenpack("join")), expected)
+    with pytest.raises(ValueError):
+        _query_ravenpack("bogus")
+
+
+def test_ravenpack_years_drops_missing_tables(local_backend):
+    assert pull_ravenpack.ravenpack_years("2020-06-01", "2024-01-31") == [2020, 2021, 2022, 2023, 2024]
+    db = local_wrds.LocalWRDSConnection()
+    assert pull_ravenpack.ravenpack_years("2020-06-01", "2024-01-31", db) == [2021, 2022, 2023]
+    db.close()
@@ -0,0 +1,289 @@
+import itertools
+import json
+import threading
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+import process_openai_responses as process
+import submit_headlines_to_openai as submit
+from openai_response_cache import ResponseCache
+
+
+class FakeClient:
+    """In-memory stand-in for the files and batches endpoints of the OpenAI client.
+
+    A batch is "in_progress" on its first retrieve and "completed" on the next,
+    answering YES to every user message that contains "beats" and NO otherwise.
+    """
+
+    def __init__(self):
+        self.stored = {}
+        self.jobs = {}
+        self.polls = {}
+        self.cancelled = []
+        self.calls = {"upload": 0, "create": 0}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self.files = SimpleNamespace(create=self._upload, content=self._content)
+        self.batches = SimpleNamespace(create=self._create, retrieve=self._retrieve, cancel=self._cancel)
+
+    def _next_id(self, prefix):
+        with self._lock:
+            return f"{prefix}-{next(self._ids)}"
+
+    def _upload(self, file, purpose):
+        self.calls["upload"] += 1
+        file_id = self._next_id("file")
+        self.stored[file_id] = file.read()
+        return SimpleNamespace(id=file_id)
+
+    def _content(self, file_id):
+        return SimpleNamespace(content=self.stored[file_id])
+
+    def _create(self, input_file_id, endpoint, completion_window, metadata):
+        self.calls["create"] += 1
+        batch_id = self._next_id("batch")
+        self.jobs[batch_id] = input_file_id
+        self.polls[batch_id] = 0
+        return SimpleNamespace(id=batch_id)
+
+    def _cancel(self, batch_id):
+        self.cancelled.append(batch_id)
+
+    def _retrieve(self, batch_id):
+        self.polls[batch_id] += 1
+        if self.polls[batch_id] < 2:
+            return SimpleNamespace(
+                id=batch_id, status="in_progress", request_counts=SimpleNamespace(completed=0)
+            )
+        lines = []
+        for line in self.stored[self.jobs[batch_id]].decode("utf-8").splitlines():
+            request = json.loads(line)
+            message = request["body"]["messages"][1]["content"]
+            content = "YES\nGood news." if "beats" in message else "NO\nBad news."
+            response = {"status_code": 200, "body": {"choices": [{"message": {"content": content}}]}}
+            lines.append(json.dumps({"custom_id": request["custom_id"], "response": response}) + "\n")
+        output_file_id = f"file-out-{batch_id}"
+        self.stored[output_file_id] = "".join(lines).encode("utf-8")
+        return SimpleNamespace(
+            id=batch_id,
+            status="completed",
+            output_file_id=output_file_id,
+            error_file_id=None,
+            request_counts=SimpleNamespace(completed=len(lines)),
+        )
+
+
+def _request_line(custom_id, message):
+    messages = [{"role": "system", "content": ""}, {"role": "user", "content": message}]
+    body = {"model": "test-model", "messages": messages}
+    return json.dumps({"custom_id": custom_id, "body": body}) + "\n"
+
+
+def test_changed_or_dropped_shard_cancels_its_running_batch(tmp_path):
+    client = FakeClient()
+    manifest_path = tmp_path / "manifest.json"
+    shard = tmp_path / "requests-00000.jsonl"
+    shard.write_text(_request_line("rp-0", "Acme beats"), encoding="utf-8")
+    [old] = submit.submit_batch_shards(client, [shard], manifest=submit.BatchManifest(manifest_path))
+
+    shard.write_text(_request_line("rp-0", "Acme misses"), encoding="utf-8")
+    [new] = submit.submit_batch_shards(client, [shard], manifest=submit.BatchManifest(manifest_path))
+    assert new != old
+    assert client.cancelled == [old]
+
+    submit.submit_batch_shards(client, [], manifest=submit.BatchManifest(manifest_path))
+    assert client.cancelled == [old, new]
+    assert submit.BatchManifest(manifest_path).shards == {}
+
+
+def test_shards_respect_limits_and_resume_reattaches(tmp_path, monkeypatch):
+    monkeypatch.setattr(submit, "BATCH_OUTPUT_JSONL", tmp_path / "output.jsonl")
+    monkeypatch.setattr(submit, "BATCH_ERROR_JSONL", tmp_path / "errors.jsonl")
+    requests = tmp_path / "requests.jsonl"
+    lines = [_request_line(f"rp-{i}", f"Acme beats {i}" if i % 2 else f"Acme misses {i}") for i in range(7)]
+    requests.write_text("".join(lines), encoding="utf-8")
+    line_bytes = len(requests.read_bytes()) // 7 + 1
+    shards = submit.shard_requests_jsonl(
+        requests, tmp_path / "shards", max_requests=3, max_bytes=2 * line_bytes
+    )
+    assert [len(p.read_text(encoding="utf-8").splitlines()) for p in shards] == [2, 2, 2, 1]
+    assert b"".join(p.read_bytes() for p in shards) == requests.read_bytes()
+
+    client = FakeClient()
+    manifest_path = tmp_path / "manifest.json"
+    batch_ids = submit.submit_batch_shards(client, shards, manifest=submit.BatchManifest(manifest_path))
+    assert client.calls == {"upload": 4, "create": 4}
+
+    # A rerun (e.g. after a crash while polling) reattaches instead of submitting again
+    manifest = submit.BatchManifest(manifest_path)
+    assert submit.submit_batch_shards(client, shards, manifest=manifest) == batch_ids
+    assert client.calls == {"upload": 4, "create": 4}
+    batches = submit.poll_batch_jobs(client, batch_ids, poll_seconds=0, manifest=manifest)
+    submit.download_batch_results(client, batches, out_dir=tmp_path / "out", manifest=manifest)
+
+    output = [json.loads(line) for line in submit.BATCH_OUTPUT_JSONL.read_text(encoding="utf-8").splitlines()]
+    assert [obj["custom_id"] for obj in output] == [f"rp-{i}" for i in range(7)]
+    assert all(entry["status"] == "completed" and entry["downloaded"] for entry in manifest.shards.values())
+
+
+def _headlines():
+    return pd.DataFrame(
+        {
+            "timestamp_utc": pd.to_datetime(
+                [
+                    "2022-06-01 02:00", "2022-06-01 03:00", "2022-06-02 22:00",
+                    "2022-06-03 01:00", "2022-06-03 02:00",
+                ]
+            ),
+            "map_ticker": ["acme ", "ACME", "BOLT", "ACME", "BOLT"],
+            "entity_name": ["Acme Corp", "Acme Corp", "Bolt Inc", "Acme Corp", "Bolt Inc"],
+            "headline": ["Acme beats estimates", "Acme beats estimates", "Bolt misses", "  ", "Bolt beats"],
+        }
+    )
+
+
+def _redirect_outputs(tmp_path, monkeypatch):
+    for name in [
+        "REQUESTS_JSONL", "CACHED_OUTPUT_JSONL", "ID_ROW_PARQUET", "BATCH_OUTPUT_JSONL", "BATCH_ERROR_JSONL"
+    ]:
+        monkeypatch.setattr(submit, name, tmp_path / getattr(submit, name).name)
+    monkeypatch.setattr(submit, "OUTPUT_DIR", tmp_path)
+
+
+def _run_batches(client, tmp_path):
+    shards = submit.shard_requests_jsonl(submit.REQUESTS_JSONL, tmp_path / "shards")
+    manifest = submit.BatchManifest(tmp_path / "manifest.json")
+    batch_ids = submit.submit_batch_shards(client, shards, manifest=manifest)
+    batches = submit.poll_batch_jobs(client, batch_ids, poll_seconds=0, manifest=manifest)
+    submit.download_batch_results(client, batches, out_dir=tmp_path / "out", manifest=manifest)
+
+
+def test_cached_prompts_are_not_requested_again(tmp_path, monkeypatch):
+    _redirect_outputs(tmp_path, monkeypatch)
+    client = FakeClient()
+    cache = ResponseCache(tmp_path / "cache.sqlite")
+
+    first = submit.make_requests_jsonl(_headlines(), model="m", cache=cache)
+    _run_batches(client, tmp_path)
+    assert submit.cache_batch_output(
+        cache, model="m", path=submit.BATCH_OUTPUT_JSONL, id_map_path=submit.ID_ROW_PARQUET
+    ) == first["queued"] == 3
+
+    second = submit.make_requests_jsonl(_headlines(), model="m", cache=cache)
+    assert (second["queued"], second["cached"]) == (0, 3)
+    assert submit.REQUESTS_JSONL.read_bytes() == b""
+    fresh = [json.loads(line) for line in submit.BATCH_OUTPUT_JSONL.read_text(encoding="utf-8").splitlines()]
+    cached = [json.loads(line) for line in submit.CACHED_OUTPUT_JSONL.read_text(encoding="utf-8").splitlines()]
+    assert cached == fresh
+    cache.close()
+
+
+def test_duplicate_prompts_send_one_request_and_fan_labels_out(tmp_path, monkeypatch):
+    _redirect_outputs(tmp_path, monkeypatch)
+    for name in ["BATCH_OUTPUT_JSONL", "CACHED_OUTPUT_JSONL", "ID_ROW_PARQUET"]:
+        monkeypatch.setattr(process, name, getattr(submit, name))
+
+    counts = submit.make_requests_jsonl(_headlines(), model="m")
+    # The two Acme rows render the same prompt; the blank headline is dropped
+    assert (counts["rows"], counts["prompts"], counts["queued"]) == (4, 3, 3)
+    _run_batches(FakeClient(), tmp_path)
+
+    scores = process.build_scores_df(process.load_source_rows())
+    assert scores.to_dict("records") == [
+        {"ticker": "ACME", "date": pd.Timestamp("2022-05-31").date(), "n_headlines": 2, "score_sum": 2},
+        {"ticker": "BOLT", "date": pd.Timestamp("2022-06-02").date(), "n_headlines": 2, "score_sum": 0},
+    ]
+
+
+def test_source_rows_accepts_both_json_mapping_formats():
+    rows = process.source_rows_df(
+        {
+            "rp-0": [{"ticker": "ACME", "date": "2022-05-31"}, {"ticker": "ACME", "date": "2022-06-01"}],
+            "rp-1": {"ticker": "BOLT", "date": "2022-06-02"},
+        }
+    )
+    assert rows.values.tolist() == [
+        ["rp-0", "ACME", "2022-05-31"], ["rp-0", "ACME", "2022-06-01"], ["rp-1", "BOLT", "2022-06-02"]
+    ]
+
+
+def _many_headlines(n=600, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(
+        {
+            "timestamp_utc": pd.Timestamp("2022-01-03") + pd.to_timedelta(rng.integers(0, 10**7, n), "s"),
+            "map_ticker": rng.choice(["acme ", "BOLT", "Crane"], n),
+            "entity_name": rng.choice(["Acme Corp", "Bolt Inc"], n),
+            "headline": [f"Story {i} – beats" if i % 3 else " " for i in rng.integers(0, 150, n)],
+        }
+    )
+
+
+def _in_memory_build(df, model):
+    """The pre-streaming builder: whole frame at once, one request per distinct prompt."""
+    rows = pd.DataFrame(
+        {
+            "ticker": df["map_ticker"].astype(str).str.upper().str.strip(),
+            "date": df["timestamp_utc"].dt.tz_localize("UTC").dt.tz_convert("America/New_York").dt.date,
+            "entity_name": df["entity_name"].astype(str).str.strip(),
+            "headline": df["headline"].astype(str).str.strip(),
+        }
+    )
+    rows = rows[rows["headline"] != ""].reset_index(drop=True)
+    messages = [
+        f"Is this headline good or bad for the stock price of {entity_name} in the short term?\n"
+        f"Headline: {headline}"
+        for entity_name, headline in zip(rows["entity_name"], rows["headline"])
+    ]
+    codes, prompts = pd.factorize(pd.Series(messages))
+    requests = [
+        {
+            "custom_id": f"rp-{k}",
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {
+                "model": model,
+                "temperature": submit.TEMPERATURE,
+                "messages": [
+                    {"role": "system", "content": submit.SYSTEM_PROMPT},
+                    {"role": "user", "content": message},
+                ],
+            },
+        }
+        for k, message in enumerate(prompts)
+    ]
+    id_map = rows[["ticker", "date", "entity_name"]].assign(custom_id=[f"rp-{k}" for k in codes])
+    return requests, id_map
+
+
+def test_streamed_builder_matches_in_memory_builder(tmp_path, monkeypatch):
+    _redirect_outputs(tmp_path, monkeypatch)
+    df = _many_headlines()
+    df.to_parquet(tmp_path / "headlines.parquet")
+    expected_requests, expected_map = _in_memory_build(df, "m")
+
+    counts = submit.make_requests_jsonl(tmp_path / "headlines.parquet", model="m", batch_rows=37)
+    streamed = submit.REQUESTS_JSONL.read_bytes()
+    id_map = pd.read_parquet(submit.ID_ROW_PARQUET)
+    assert [json.loads(line) for line in streamed.splitlines()] == expected_requests
+    assert counts["prompts"] == len(expected_requests) < counts["rows"] == len(expected_map)
+    columns = ["custom_id", "ticker", "date", "entity_name"]
+    pd.testing.assert_frame_equal(id_map[columns], expected_map[columns])
+
+    # One in-memory slice and the standard json fallback write the same bytes
+    monkeypatch.setattr(submit, "orjson", None)
+    submit.make_requests_jsonl(df, model="m", batch_rows=len(df))
+    assert submit.REQUESTS_JSONL.read_bytes() == streamed
+    pd.testing.assert_frame_equal(pd.read_parquet(submit.ID_ROW_PARQUET), id_map)
+
+
+def test_streamed_builder_stops_after_max_rows(tmp_path, monkeypatch):
+    _redirect_outputs(tmp_path, monkeypatch)
+    df = _many_headlines()
+    df.to_parquet(tmp_path / "headlines.parquet")
+    counts = submit.make_requests_jsonl(tmp_path / "headlines.parquet", model="m", batch_rows=37, max_rows=100)
+    _, expected_map = _in_memory_build(df.iloc[:100], "m")
+    assert counts["rows"] == len(expected_map) == len(pd.read_parquet(submit.ID_ROW_PARQUET))
@@ -0,0 +1,72 @@
+import pandas as pd
+import polars as pl
+
+from time_tools import (
+    ET_COLUMNS,
+    add_et_columns,
+    classify_sessions,
+    ensure_et_columns,
+    ensure_et_columns_polars,
+    overnight_mask,
+)
+
+
+def _timestamps():
+    # Around both 2022 DST switches (06:00 / 07:00 UTC), the open and the close
+    return pd.DataFrame(
+        {
+            "timestamp_utc": pd.to_datetime(
+                [
+                    "2022-03-13 06:59:59", "2022-03-13 07:00:00", "2022-11-06 05:59:59",
+                    "2022-11-06 06:00:00", "2022-06-01 12:59:00", "2022-06-01 13:30:00",
+                    "2022-06-01 20:00:00", "2022-12-01 04:30:00", None,
+                ]
+            )
+        }
+    )
+
+
+def test_add_et_columns_matches_tz_convert():
+    df = _timestamps()
+    result = add_et_columns(df)
+
+    ts_et = df["timestamp_utc"].dt.tz_localize("UTC").dt.tz_convert("America/New_York")
+    valid = ts_et.notna()
+    pd.testing.assert_series_equal(result["timestamp_et"], ts_et, check_names=False)
+    assert (result["date_et"][valid] == ts_et[valid].dt.tz_localize(None).dt.normalize()).all()
+    minute = ts_et.dt.hour * 60 + ts_et.dt.minute
+    assert (result["minute_of_day_et"][valid] == minute[valid]).all()
+    assert result["is_overnight"].tolist() == [True, True, True, True, True, False, True, True, False]
+    assert result["date_et"].isna().tolist() == (~valid).tolist()
+
+
+def test_ensure_et_columns_reuses_existing_and_polars_agrees():
+    df = _timestamps().dropna()
+    enriched = add_et_columns(df)
+    assert ensure_et_columns(enriched) is enriched
+
+    result = ensure_et_columns_polars(pl.from_pandas(df).lazy()).collect().to_pandas()
+    pd.testing.assert_frame_equal(result[ET_COLUMNS], enriched[ET_COLUMNS].reset_index(drop=True))
+
+
+def test_classify_sessions_uses_nyse_open_early_close_and_holidays():
+    df = add_et_columns(
+        pd.DataFrame(
+            {
+                "timestamp_utc": pd.to_datetime(
+                    [
+                        "2022-06-01 13:29", "2022-06-01 13:30", "2022-06-01 20:00",
+                        "2022-11-25 17:59", "2022-11-25 18:00",  # day after Thanksgiving, 1pm close
+                        "2022-11-24 15:00", "2022-11-26 15:00",  # Thanksgiving, Saturday
+                    ]
+                )
+            }
+        )
+    )
+    sessions = classify_sessions(df["date_et"], df["minute_of_day_et"])
+    assert list(sessions) == [
+        "pre_open", "regular", "post_close", "regular", "post_close",
+        "non_trading_day", "non_trading_day",
+    ]
+    assert overnight_mask(df, rule="calendar").tolist() == [True, False, True, False, True, True, True]
+    assert overnight_mask(df, rule="clock").tolist() == [False, False, True, False, False, False, False]
@@ -0,0 +1,42 @@
+import pandas as pd
+
+import local_wrds
+import wrds_tools
+
+
+def test_query_cache_hit_skips_connection(local_backend):
+    opened = []
+
+    def connect():
+        opened.append(1)
+        return local_wrds.LocalWRDSConnection()
+
+    query = "SELECT ticker FROM ravenpack_common.wrds_rpa_company_mappings ORDER BY ticker"
+    cache_dir = local_backend / "queries"
+    first = wrds_tools.CachedWRDSConnection(connect, cache_dir=cache_dir)
+    expected = first.raw_sql(query)
+    first.close()
+
+    second = wrds_tools.CachedWRDSConnection(connect, cache_dir=cache_dir)
+    result = second.raw_sql("  " + query.replace(" ", "\n    ") + " ;")
+    second.close()
+
+    assert len(opened) == 1
+    pd.testing.assert_frame_equal(result, expected)
+
+
+def test_schema_cache_reused_within_ttl(tmp_path):
+    class CountingDB:
+        calls = 0
+
+        def raw_sql(self, query):
+            self.calls += 1
+            return pd.DataFrame({"table_name": ["a", "b"]})
+
+    db = CountingDB()
+    cache_file = tmp_path / "information_schema.json"
+    for _ in range(2):
+        assert wrds_tools.get_schema_tables(db, "s", ttl_hours=1, cache_file=cache_file) == ["a", "b"]
+    assert db.calls == 1
+    wrds_tools.get_schema_tables(db, "s", ttl_hours=0, cache_file=cache_file)
+    assert db.calls == 2
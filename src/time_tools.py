@@ -0,0 +1,224 @@
+"""
+US/Eastern enrichment of the UTC news timestamps.
+
+`add_et_columns()` derives `timestamp_et`, `date_et`, `minute_of_day_et` and
+`is_overnight` in one vectorized pass. Instead of converting every row through
+the time zone database, it builds the UTC offset of each UTC hour spanned by
+the data (a few thousand entries per year) and adds the looked-up offset to
+the raw int64 nanoseconds. DST switches happen on a UTC hour boundary, so the
+hourly lookup is exact. The pull writes these columns into RAVENPACK.parquet
+and clean_ravenpack, submit_headlines_to_openai and plot_ravenpack_data reuse
+them through `ensure_et_columns()`.
+
+`classify_sessions()` labels rows against the NYSE calendar (9:30 open, early
+closes, weekends and holidays) from a per-date table of open/close minutes,
+and `overnight_mask()` picks the clock or calendar definition of overnight.
+"""
+
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+import pandas_market_calendars as mcal
+import polars as pl
+import pyarrow as pa
+
+from settings import config
+
+ET_TZ = "America/New_York"
+# Overnight = before the 9:00 open or from the 16:00 close onward, in ET minutes
+MARKET_OPEN_MINUTE = 9 * 60
+MARKET_CLOSE_MINUTE = 16 * 60
+
+# "clock" keeps the paper's 9:00-16:00 cutoffs (`is_overnight`); "calendar"
+# treats everything outside the NYSE regular session as overnight
+OVERNIGHT_RULE = config("OVERNIGHT_RULE", default="clock", cast=str)
+EXCHANGE_CALENDAR = "NYSE"
+SESSION_LABELS = ["pre_open", "regular", "post_close", "non_trading_day"]
+
+ET_COLUMNS = ["timestamp_et", "date_et", "minute_of_day_et", "is_overnight"]
+ET_SCHEMA_FIELDS = [
+    pa.field("timestamp_et", pa.timestamp("ns", tz=ET_TZ)),
+    pa.field("date_et", pa.timestamp("ns")),
+    pa.field("minute_of_day_et", pa.int16()),
+    pa.field("is_overnight", pa.bool_()),
+]
+
+MINUTE_NS = 60 * 10**9
+HOUR_NS = 60 * MINUTE_NS
+DAY_NS = 24 * HOUR_NS
+
+
+def utc_offset_lookup(start_ns: int, end_ns: int, tz: str = ET_TZ) -> tuple[int, np.ndarray]:
+    """
+    UTC offset of `tz` for every UTC hour from `start_ns` to `end_ns`.
+
+    Parameters:
+    - start_ns, end_ns (int): First and last UTC instants to cover, in epoch nanoseconds.
+    - tz (str): Target time zone.
+
+    Returns:
+    - tuple: (epoch ns of the first hour, int64 offsets in ns indexed by hours since it).
+    """
+    first = start_ns // HOUR_NS * HOUR_NS
+    hours = pd.date_range(
+        pd.Timestamp(first, tz="UTC"), pd.Timestamp(end_ns, tz="UTC"), freq="h"
+    ).as_unit("ns")
+    local = hours.tz_convert(tz).tz_localize(None)
+    return first, local.asi8 - hours.asi8
+
+
+def add_et_columns(df: pd.DataFrame, timestamp_col: str = "timestamp_utc") -> pd.DataFrame:
+    """
+    Return `df` with the ET columns derived from `timestamp_col`.
+
+    Naive timestamps are taken as UTC. Rows with a missing timestamp get NaT
+    dates and `is_overnight=False`.
+
+    Parameters:
+    - df (pd.DataFrame): Frame holding the UTC timestamp column.
+    - timestamp_col (str): Name of that column.
+
+    Returns:
+    - pd.DataFrame: A copy of `df` with `ET_COLUMNS` set.
+    """
+    ts = pd.to_datetime(df[timestamp_col], errors="coerce", utc=True).dt.as_unit("ns")
+    valid = ts.notna().to_numpy()
+    utc_ns = ts.to_numpy(dtype="datetime64[ns]").view("int64")
+
+    local_ns = np.zeros(len(utc_ns), dtype="int64")
+    if valid.any():
+        first, offsets = utc_offset_lookup(int(utc_ns[valid].min()), int(utc_ns[valid].max()))
+        local_ns[valid] = utc_ns[valid] + offsets[(utc_ns[valid] - first) // HOUR_NS]
+
+    minute = ((local_ns % DAY_NS) // MINUTE_NS).astype("int16")
+    date_et = (local_ns - local_ns % DAY_NS).view("datetime64[ns]")
+    date_et[~valid] = np.datetime64("NaT")
+    if valid.all():
+        minute_of_day = pd.Series(minute, index=df.index)
+    else:
+        minute_of_day = pd.Series(pd.array(minute, dtype="Int16"), index=df.index).mask(~valid)
+
+    return df.assign(
+        timestamp_et=ts.dt.tz_convert(ET_TZ),
+        date_et=pd.Series(date_et, index=df.index),
+        minute_of_day_et=minute_of_day,
+        is_overnight=valid & ((minute < MARKET_OPEN_MINUTE) | (minute >= MARKET_CLOSE_MINUTE)),
+    )
+
+
+def ensure_et_columns(df: pd.DataFrame, timestamp_col: str = "timestamp_utc") -> pd.DataFrame:
+    """`df` as is if it already carries the ET columns, else `add_et_columns(df)`."""
+    if all(c in df.columns for c in ET_COLUMNS):
+        return df
+    return add_et_columns(df, timestamp_col)
+
+
+def ensure_et_columns_polars(lf: pl.LazyFrame, timestamp_col: str = "timestamp_utc") -> pl.LazyFrame:
+    """
+    Polars version of `ensure_et_columns` for lazy frames. When the columns are
+    missing, the timestamp range is collected first to size the offset lookup.
+    """
+    schema = lf.collect_schema()
+    if all(c in schema for c in ET_COLUMNS):
+        return lf
+
+    ts = pl.col(timestamp_col)
+    if getattr(schema[timestamp_col], "time_zone", None) is None:
+        ts = ts.dt.replace_time_zone("UTC")
+    utc_ns = ts.dt.epoch("ns")
+    bounds = lf.select(utc_ns.min().alias("lo"), utc_ns.max().alias("hi")).collect()
+    lo, hi = bounds["lo"][0], bounds["hi"][0]
+    first, offsets = utc_offset_lookup(lo or 0, hi or 0)
+
+    local_ns = utc_ns + pl.lit(pl.Series(offsets)).gather((utc_ns - first) // HOUR_NS)
+    minute = ((local_ns % DAY_NS) // MINUTE_NS).cast(pl.Int16)
+    return lf.with_columns(
+        ts.dt.convert_time_zone(ET_TZ).dt.cast_time_unit("ns").alias("timestamp_et"),
+        (local_ns - local_ns % DAY_NS).cast(pl.Datetime("ns")).alias("date_et"),
+        minute.alias("minute_of_day_et"),
+        ((minute < MARKET_OPEN_MINUTE) | (minute >= MARKET_CLOSE_MINUTE))
+        .fill_null(False)
+        .alias("is_overnight"),
+    )
+
+
+@lru_cache(maxsize=None)
+def session_table(
+    first_year: int, last_year: int, calendar: str = EXCHANGE_CALENDAR
+) -> tuple[int, np.ndarray, np.ndarray]:
+    """
+    ET open and close minute of every calendar day in whole years of `calendar`.
+
+    Non-trading days have open = close = -1, so no minute falls in their session.
+
+    Returns:
+    - tuple: (epoch day number of Jan 1 of `first_year`, open minutes, close minutes).
+    """
+    start = pd.Timestamp(f"{first_year}-01-01")
+    end = pd.Timestamp(f"{last_year}-12-31")
+    schedule = mcal.get_calendar(calendar).schedule(start_date=start, end_date=end)
+    first_day = start.value // DAY_NS
+    n_days = end.value // DAY_NS - first_day + 1
+    day = schedule.index.as_unit("ns").asi8 // DAY_NS - first_day
+
+    minutes = []
+    for col in ["market_open", "market_close"]:
+        local = schedule[col].dt.tz_convert(ET_TZ)
+        table = np.full(n_days, -1, dtype="int16")
+        table[day] = local.dt.hour * 60 + local.dt.minute
+        minutes.append(table)
+    return first_day, minutes[0], minutes[1]
+
+
+def classify_sessions(date_et: pd.Series, minute_of_day_et: pd.Series) -> pd.Categorical:
+    """
+    Label each row "pre_open", "regular", "post_close" or "non_trading_day".
+
+    The ET date indexes straight into the per-day arrays of `session_table()`,
+    and the minute of day is compared with that day's open and close. Missing
+    dates get a missing label.
+
+    Parameters:
+    - date_et (pd.Series): ET calendar dates (midnight), as from `add_et_columns`.
+    - minute_of_day_et (pd.Series): ET minutes since midnight.
+
+    Returns:
+    - pd.Categorical: Session labels with categories `SESSION_LABELS`.
+    """
+    day_ns = pd.to_datetime(date_et).to_numpy(dtype="datetime64[ns]").view("int64")
+    valid = pd.notna(date_et).to_numpy()
+    codes = np.full(len(day_ns), -1, dtype="int8")
+    if valid.any():
+        day = day_ns[valid] // DAY_NS
+        first_day, open_minute, close_minute = session_table(
+            pd.Timestamp(day.min() * DAY_NS).year, pd.Timestamp(day.max() * DAY_NS).year
+        )
+        day -= first_day
+        minute = pd.to_numeric(minute_of_day_et).to_numpy()[valid]
+        codes[valid] = np.select(
+            [open_minute[day] < 0, minute < open_minute[day], minute < close_minute[day]],
+            [SESSION_LABELS.index(label) for label in ["non_trading_day", "pre_open", "regular"]],
+            SESSION_LABELS.index("post_close"),
+        )
+    return pd.Categorical.from_codes(codes, categories=SESSION_LABELS)
+
+
+def overnight_mask(df: pd.DataFrame, rule: str = OVERNIGHT_RULE) -> np.ndarray:
+    """
+    Boolean array of the rows counted as overnight news under `rule`.
+
+    Parameters:
+    - df (pd.DataFrame): Frame with the ET columns (derived if missing).
+    - rule (str): "clock" for `is_overnight`, "calendar" for outside the NYSE regular session.
+
+    Returns:
+    - np.ndarray: One flag per row of `df`.
+    """
+    df = ensure_et_columns(df)
+    if rule == "clock":
+        return df["is_overnight"].to_numpy(dtype=bool)
+    if rule == "calendar":
+        sessions = classify_sessions(df["date_et"], df["minute_of_day_et"])
+        return np.asarray(pd.notna(sessions) & (sessions != "regular"))
+    raise ValueError(f"OVERNIGHT_RULE must be 'clock' or 'calendar', got {rule!r}")
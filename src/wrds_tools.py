@@ -0,0 +1,579 @@
+"""
+Helpers shared by the WRDS pull scripts (pull_ravenpack, pull_CRSP_stock,
+pull_crsp_unique_tickers).
+
+"""
+
+import hashlib
+import json
+import os
+import queue
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import wrds
+from settings import cast_bool, config
+
+DATA_DIR = Path(config("DATA_DIR"))
+WRDS_USERNAME = config("WRDS_USERNAME")
+# "wrds" for the live WRDS database, "local" for the DuckDB stand-in in local_wrds.py
+WRDS_BACKEND = config("WRDS_BACKEND", default="wrds", cast=str)
+# Fetch query results in fixed-size chunks and append them to parquet as row groups
+STREAMING_PULL = config("STREAMING_PULL", default=False, cast=cast_bool)
+PULL_CHUNK_ROWS = config("PULL_CHUNK_ROWS", default=250_000, cast=int)
+# information_schema lookups are cached on disk for this long
+SCHEMA_CACHE_TTL_HOURS = config("SCHEMA_CACHE_TTL_HOURS", default=168, cast=float)
+SCHEMA_CACHE_FILE = DATA_DIR / "_cache" / "information_schema.json"
+
+# Cache raw_sql results as parquet, keyed by a hash of the normalized SQL
+WRDS_QUERY_CACHE = config("WRDS_QUERY_CACHE", default=False, cast=cast_bool)
+QUERY_CACHE_TTL_HOURS = config("QUERY_CACHE_TTL_HOURS", default=24, cast=float)
+QUERY_CACHE_MAX_GB = config("QUERY_CACHE_MAX_GB", default=5, cast=float)
+QUERY_CACHE_DIR = DATA_DIR / "_cache" / "queries"
+
+_schema_cache_lock = threading.Lock()
+_query_cache_lock = threading.Lock()
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def _open_backend(wrds_username, backend):
+    if backend == "wrds":
+        return wrds.Connection(wrds_username=wrds_username)
+    if backend == "local":
+        from local_wrds import LocalWRDSConnection
+
+        return LocalWRDSConnection()
+    raise ValueError(f"Unknown WRDS_BACKEND {backend!r}; expected 'wrds' or 'local'")
+
+
+def connect_wrds(wrds_username=WRDS_USERNAME, backend=None, use_cache=None):
+    """
+    Open a connection to the backend named by `backend` (default: WRDS_BACKEND).
+
+    Both backends expose `raw_sql(query, date_cols=...)` and `close()`. With
+    `use_cache` (default: WRDS_QUERY_CACHE) the connection is wrapped in a
+    `CachedWRDSConnection`, which only connects on a cache miss.
+    """
+    backend = backend or WRDS_BACKEND
+    use_cache = WRDS_QUERY_CACHE if use_cache is None else use_cache
+    if use_cache:
+        return CachedWRDSConnection(
+            lambda: _open_backend(wrds_username, backend), backend=backend
+        )
+    return _open_backend(wrds_username, backend)
+
+
+def normalize_sql(sql):
+    """Collapse whitespace outside string literals and drop trailing semicolons."""
+    parts = re.split(r"('(?:[^']|'')*')", sql)
+    for i in range(0, len(parts), 2):
+        parts[i] = re.sub(r"\s+", " ", parts[i])
+    return "".join(parts).strip().rstrip(";").strip()
+
+
+def query_cache_key(sql, params=None, date_cols=None, backend=None):
+    """Content hash of a query: normalized SQL, parameters, date columns and backend."""
+    payload = json.dumps(
+        {
+            "backend": backend or WRDS_BACKEND,
+            "sql": normalize_sql(sql),
+            "params": params,
+            "date_cols": date_cols,
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CachedWRDSConnection:
+    """
+    Wraps a WRDS (or local) connection and caches `raw_sql` results as parquet
+    files under `cache_dir`, named by `query_cache_key`.
+
+    The wrapped connection is opened on the first cache miss, so a run whose
+    queries are all cached never connects to WRDS. Entries older than
+    `ttl_hours` are treated as misses; reading an entry marks it as recently
+    used, and the least recently used entries are evicted once the cache
+    grows past `max_gb`.
+    """
+
+    def __init__(
+        self,
+        connect,
+        backend=None,
+        cache_dir=None,
+        ttl_hours=None,
+        max_gb=None,
+    ):
+        self._connect = connect
+        self._db = None
+        self.backend = backend or WRDS_BACKEND
+        self.cache_dir = Path(cache_dir or QUERY_CACHE_DIR)
+        self.ttl_hours = QUERY_CACHE_TTL_HOURS if ttl_hours is None else ttl_hours
+        self.max_gb = QUERY_CACHE_MAX_GB if max_gb is None else max_gb
+
+    @property
+    def db(self):
+        """The wrapped connection, opened on first use."""
+        if self._db is None:
+            self._db = self._connect()
+        return self._db
+
+    def _lookup(self, path):
+        if not path.exists():
+            return False
+        created_at = (pq.read_metadata(path).metadata or {}).get(b"query_cache_created_at")
+        if created_at is None or time.time() - float(created_at) > self.ttl_hours * 3600:
+            return False
+        os.utime(path)  # mtime is the LRU clock
+        return True
+
+    def _path(self, sql, params=None, date_cols=None):
+        key = query_cache_key(sql, params=params, date_cols=date_cols, backend=self.backend)
+        return key, self.cache_dir / f"{key}.parquet"
+
+    def is_cached(self, sql, date_cols=None, params=None):
+        """Whether `raw_sql` with these arguments would be answered from the cache."""
+        return self._lookup(self._path(sql, params=params, date_cols=date_cols)[1])
+
+    def raw_sql(self, sql, date_cols=None, params=None, chunksize=500000, return_iter=False, **kwargs):
+        """`raw_sql` of the wrapped connection, answered from the cache when possible."""
+        key, path = self._path(sql, params=params, date_cols=date_cols)
+
+        if self._lookup(path):
+            print(f"Query cache hit: {key[:12]}", flush=True)
+            if return_iter and chunksize is not None:
+                return (
+                    batch.to_pandas()
+                    for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize)
+                )
+            return pd.read_parquet(path)
+
+        print(f"Query cache miss: {key[:12]}", flush=True)
+        if return_iter and chunksize is not None:
+            return self._iter_and_store(sql, path, date_cols, params, chunksize)
+        df = self.db.raw_sql(sql, date_cols=date_cols, params=params, **kwargs)
+        self._store(path, pa.Table.from_pandas(df, preserve_index=False))
+        return df
+
+    def _iter_and_store(self, sql, path, date_cols, params, chunksize):
+        """
+        Yield chunks from the wrapped connection while writing them to the cache.
+        A chunk that cannot be cached (e.g. a schema change between chunks) only
+        stops the caching, never the pull.
+        """
+        tmp_path = path.with_name(f"_{path.name}.{threading.get_ident()}.tmp")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        writer = None
+        caching = True
+        try:
+            if params is None:
+                chunks = iter_sql_chunks(self.db, sql, chunk_rows=chunksize, date_cols=date_cols)
+            else:
+                chunks = self.db.raw_sql(
+                    sql, date_cols=date_cols, params=params, chunksize=chunksize, return_iter=True
+                )
+            for chunk in chunks:
+                if caching:
+                    try:
+                        table = pa.Table.from_pandas(chunk, preserve_index=False)
+                        if writer is None:
+                            writer = pq.ParquetWriter(tmp_path, self._stamp(table.schema))
+                        writer.write_table(table.cast(writer.schema))
+                    except (pa.ArrowException, ValueError) as e:
+                        print(f"Not caching query result: {e}", flush=True)
+                        caching = False
+                yield chunk
+            if caching and writer is not None:
+                writer.close()
+                writer = None
+                self._commit(tmp_path, path)
+        finally:
+            if writer is not None:
+                writer.close()
+            if tmp_path.exists():
+                tmp_path.unlink()
+
+    @staticmethod
+    def _stamp(schema):
+        metadata = dict(schema.metadata or {})
+        metadata[b"query_cache_created_at"] = str(time.time()).encode()
+        return schema.with_metadata(metadata)
+
+    def _store(self, path, table):
+        tmp_path = path.with_name(f"_{path.name}.{threading.get_ident()}.tmp")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        pq.write_table(table.replace_schema_metadata(self._stamp(table.schema).metadata), tmp_path)
+        self._commit(tmp_path, path)
+
+    def _commit(self, tmp_path, path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(tmp_path, path)
+        evict_query_cache(self.cache_dir, max_gb=self.max_gb, ttl_hours=self.ttl_hours)
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+def evict_query_cache(cache_dir=None, max_gb=None, ttl_hours=None):
+    """
+    Delete expired query cache entries, then the least recently used ones
+    until the cache is no larger than `max_gb`.
+    """
+    cache_dir = Path(cache_dir or QUERY_CACHE_DIR)
+    max_bytes = (QUERY_CACHE_MAX_GB if max_gb is None else max_gb) * 1024**3
+    ttl_seconds = (QUERY_CACHE_TTL_HOURS if ttl_hours is None else ttl_hours) * 3600
+    now = time.time()
+
+    with _query_cache_lock:
+        entries = []
+        for path in cache_dir.glob("*.parquet"):
+            try:
+                stat = path.stat()
+                created_at = (pq.read_metadata(path).metadata or {}).get(b"query_cache_created_at")
+            except (FileNotFoundError, OSError):
+                continue
+            if created_at is None or now - float(created_at) > ttl_seconds:
+                path.unlink(missing_ok=True)
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+
+def execute_sql(db, sql):
+    """
+    Run a statement that returns no rows (DDL, INSERT) in the session of `db`,
+    where later `raw_sql` calls on the same connection can see its effects
+    (e.g. temp tables). On a `CachedWRDSConnection` this opens the wrapped
+    connection.
+    """
+    if isinstance(db, CachedWRDSConnection):
+        db = db.db
+    conn = db.connection
+    if hasattr(conn, "exec_driver_sql"):
+        conn.exec_driver_sql(sql)
+    else:
+        conn.execute(sql)
+
+
+def is_query_cached(db, sql, date_cols=None, params=None):
+    """True when `db` is a `CachedWRDSConnection` holding a fresh result for the query."""
+    return isinstance(db, CachedWRDSConnection) and db.is_cached(sql, date_cols=date_cols, params=params)
+
+
+def upload_temp_int_table(db, name, column, values, batch_size=10_000):
+    """
+    Create temp table `name(column bigint)` on `db`'s session holding `values`.
+
+    Used in place of long `IN (...)` literal lists. The table is created once per
+    connection; calling again with the same name is a no-op. On a
+    `CachedWRDSConnection` this opens the wrapped connection, so callers only
+    upload when the query that needs the table is not cached.
+    """
+    if isinstance(db, CachedWRDSConnection):
+        db = db.db
+    created = getattr(db, "_temp_tables", None)
+    if created is None:
+        created = set()
+        db._temp_tables = created
+    if name in created:
+        return name
+
+    values = sorted({int(v) for v in values})
+    execute_sql(db, f"DROP TABLE IF EXISTS {name}")
+    execute_sql(db, f"CREATE TEMP TABLE {name} ({column} bigint)")
+    for i in range(0, len(values), batch_size):
+        rows = ", ".join(f"({v})" for v in values[i : i + batch_size])
+        execute_sql(db, f"INSERT INTO {name} ({column}) VALUES {rows}")
+    created.add(name)
+    return name
+
+
+class WRDSConnectionPool:
+    """
+    Small thread-safe pool of WRDS connections.
+
+    Connections are opened lazily, up to `size` of them, and handed out one
+    at a time through `connection()`. A connection that raises while borrowed
+    is closed and dropped from the pool so the next borrower gets a fresh one.
+
+    Usage:
+    ```
+    with WRDSConnectionPool(size=4) as pool:
+        with pool.connection() as db:
+            df = db.raw_sql("SELECT 1")
+    ```
+    """
+
+    def __init__(self, size=4, wrds_username=WRDS_USERNAME):
+        if size < 1:
+            raise ValueError(f"Pool size must be at least 1, got {size}")
+        self.size = size
+        self.wrds_username = wrds_username
+        self._idle = queue.LifoQueue()
+        self._n_open = 0
+        self._lock = threading.Lock()
+
+    def _open(self):
+        return connect_wrds(wrds_username=self.wrds_username)
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._n_open < self.size:
+                self._n_open += 1
+                open_new = True
+            else:
+                open_new = False
+        if not open_new:
+            return self._idle.get()
+        try:
+            return self._open()
+        except Exception:
+            with self._lock:
+                self._n_open -= 1
+            raise
+
+    def _discard(self, db):
+        try:
+            db.close()
+        except Exception:
+            pass
+        with self._lock:
+            self._n_open -= 1
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for the duration of the `with` block."""
+        db = self._acquire()
+        try:
+            yield db
+        except Exception:
+            self._discard(db)
+            raise
+        else:
+            self._idle.put(db)
+
+    def close(self):
+        """Close every idle connection in the pool."""
+        while True:
+            try:
+                db = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(db)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, or None where unsupported."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    if sys.platform == "darwin":
+        return peak / 1024**2
+    return peak / 1024
+
+
+def iter_sql_chunks(db, query, chunk_rows=PULL_CHUNK_ROWS, date_cols=None):
+    """
+    Yield the result of `query` as DataFrames of at most `chunk_rows` rows.
+
+    On a live WRDS connection the query runs on a server-side cursor
+    (`stream_results=True`), so only one chunk is held on the client at a time.
+    The cursor needs a transaction, which the AUTOCOMMIT connection that
+    `raw_sql` uses cannot provide, so a separate connection is checked out of
+    the WRDS engine for the duration of the stream. Connections without an
+    engine fall back to `raw_sql(..., return_iter=True)`.
+    """
+    engine = getattr(db, "engine", None)
+    if engine is None:
+        yield from db.raw_sql(
+            query, date_cols=date_cols, chunksize=chunk_rows, return_iter=True
+        )
+        return
+
+    with engine.connect() as conn:
+        conn = conn.execution_options(
+            isolation_level="READ COMMITTED",
+            stream_results=True,
+            max_row_buffer=chunk_rows,
+        )
+        with conn.begin():
+            yield from pd.read_sql_query(
+                query,
+                conn,
+                parse_dates=date_cols,
+                chunksize=chunk_rows,
+                dtype_backend="numpy_nullable",
+            )
+
+
+def stream_query_to_parquet(
+    db,
+    query,
+    path,
+    schema=None,
+    chunk_rows=PULL_CHUNK_ROWS,
+    date_cols=None,
+    transform=None,
+    label="query",
+):
+    """
+    Stream the result of `query` into a parquet file, one row group per chunk.
+
+    The file is written to a temporary sibling and moved into place once the
+    query finishes, so a failed pull never leaves a truncated file behind.
+
+    Parameters:
+    - db: An open WRDS (or compatible) connection.
+    - query (str): SQL to run.
+    - path (str or Path): Destination parquet file.
+    - schema (pyarrow.Schema): Output schema. If None, it is taken from the
+      first chunk, so pass it explicitly when early chunks may be all-null.
+    - chunk_rows (int): Rows fetched per chunk / written per row group.
+    - date_cols (list of str): Columns to parse as dates.
+    - transform (callable): Optional function applied to each chunk DataFrame.
+    - label (str): Name used in the progress output.
+
+    Returns:
+    - dict: rows, seconds, rows_per_sec and peak_rss_mb of the pull.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"_{path.name}.tmp")
+
+    start = time.perf_counter()
+    n_rows = 0
+    writer = None
+    try:
+        for chunk in iter_sql_chunks(db, query, chunk_rows=chunk_rows, date_cols=date_cols):
+            if transform is not None:
+                chunk = transform(chunk)
+            table = pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+            if writer is None:
+                schema = table.schema
+                writer = pq.ParquetWriter(tmp_path, schema)
+            writer.write_table(table)
+            n_rows += len(chunk)
+            elapsed = time.perf_counter() - start
+            print(
+                f"[{label}] {n_rows:,} rows, {n_rows / max(elapsed, 1e-9):,.0f} rows/sec",
+                flush=True,
+            )
+        if writer is None:
+            # Empty result: still write a file with the expected columns
+            if schema is None:
+                raise ValueError(f"[{label}] query returned no rows and no schema was given")
+            writer = pq.ParquetWriter(tmp_path, schema)
+        writer.close()
+        writer = None
+        os.replace(tmp_path, path)
+    finally:
+        if writer is not None:
+            writer.close()
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+    elapsed = time.perf_counter() - start
+    stats = {
+        "rows": n_rows,
+        "seconds": elapsed,
+        "rows_per_sec": n_rows / max(elapsed, 1e-9),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    peak = "n/a" if stats["peak_rss_mb"] is None else f"{stats['peak_rss_mb']:,.0f} MB"
+    print(
+        f"[{label}] done: {n_rows:,} rows in {elapsed:,.1f}s "
+        f"({stats['rows_per_sec']:,.0f} rows/sec), peak RSS {peak}",
+        flush=True,
+    )
+    return stats
+
+
+def _cached_schema_lookup(key, fetch, ttl_hours, cache_file):
+    """
+    Return the cached list stored under `key` in `cache_file` if it is younger
+    than `ttl_hours`; otherwise call `fetch()` and cache its result. Defaults
+    are SCHEMA_CACHE_FILE and SCHEMA_CACHE_TTL_HOURS.
+    """
+    cache_file = Path(cache_file or SCHEMA_CACHE_FILE)
+    ttl_hours = SCHEMA_CACHE_TTL_HOURS if ttl_hours is None else ttl_hours
+    # Cache the live and local backends separately
+    key = f"{WRDS_BACKEND}:{key}"
+    with _schema_cache_lock:
+        cache = {}
+        if cache_file.exists():
+            try:
+                cache = json.loads(cache_file.read_text(encoding="utf-8"))
+            except json.JSONDecodeError:
+                cache = {}
+        entry = cache.get(key)
+        if entry is not None and time.time() - entry["fetched_at"] < ttl_hours * 3600:
+            return entry["values"]
+
+        values = fetch()
+        cache[key] = {"fetched_at": time.time(), "values": values}
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = cache_file.with_name(f"_{cache_file.name}.tmp")
+        tmp_file.write_text(json.dumps(cache, indent=2), encoding="utf-8")
+        os.replace(tmp_file, cache_file)
+        return values
+
+
+def get_table_columns(db, schema, table, ttl_hours=None, cache_file=None):
+    """Column names of schema.table from information_schema.columns, cached on disk."""
+
+    def _fetch():
+        q = f"""
+        SELECT column_name
+        FROM information_schema.columns
+        WHERE table_schema = '{schema}'
+          AND table_name = '{table}'
+        """
+        return db.raw_sql(q)["column_name"].tolist()
+
+    return _cached_schema_lookup(f"columns:{schema}.{table}", _fetch, ttl_hours, cache_file)
+
+
+def get_schema_tables(db, schema, ttl_hours=None, cache_file=None):
+    """Table names in `schema` from information_schema.tables, cached on disk."""
+
+    def _fetch():
+        q = f"""
+        SELECT table_name
+        FROM information_schema.tables
+        WHERE table_schema = '{schema}'
+        """
+        return db.raw_sql(q)["table_name"].tolist()
+
+    return _cached_schema_lookup(f"tables:{schema}", _fetch, ttl_hours, cache_file)